@@ -5,140 +5,42 @@
 """
 
 import csv
-import re
 from pathlib import Path
 from collections import defaultdict
 
+from apartment_snapshot import load_index, load_snapshot
+from binning import AREA_BINNING, FLOOR_CLASSES
 
-def normalize_floor(floor):
-    """Нормализует этаж: первый (1) или не первый (>1)"""
-    try:
-        floor_num = int(float(str(floor)))
-        return "первый" if floor_num == 1 else "не первый"
-    except (ValueError, TypeError):
-        return "не первый"
 
-
-def normalize_rooms(rooms):
-    """Нормализует комнатность"""
-    if not rooms or str(rooms).strip() == '':
-        return None
-    rooms_str = str(rooms).strip().lower()
-    
-    # Обрабатываем студию как 1 комнату
-    if 'студи' in rooms_str:
-        return "1к"
-    
-    # Убираем все кроме цифр и "к"
-    rooms_str = re.sub(r'[^\dк]', '', rooms_str)
-    # Извлекаем число комнат
-    match = re.search(r'(\d+)', rooms_str)
-    if match:
-        return f"{match.group(1)}к"
-    return rooms_str
-
-
-def normalize_view(view):
-    """Нормализует вид из окон: во двор или на улицу"""
-    if not view or str(view).strip() == '':
-        return None
-    view_str = str(view).strip().lower()
-    
-    # Если содержит "во двор" и не содержит "на улицу" - во двор
-    if "во двор" in view_str and "на улицу" not in view_str:
-        return "во двор"
-    # Если содержит "на улицу" - на улицу
-    elif "на улицу" in view_str:
-        return "на улицу"
-    # Если содержит оба варианта - на улицу (приоритет)
-    elif "во двор" in view_str:
-        return "на улицу"
-    else:
-        return "на улицу"  # По умолчанию
-
-
-def normalize_area(area):
-    """Нормализует площадь и группирует с шагом 10 м² (например, 40-50)"""
-    if not area or str(area).strip() == '':
-        return None
-    try:
-        # Заменяем запятую на точку для парсинга
-        area_str = str(area).replace(',', '.')
-        area_float = float(area_str)
-        # Определяем нижнюю границу диапазона (например, 50.5 -> 50, 55.2 -> 50, 65.8 -> 60)
-        lower_bound = int(area_float // 10) * 10
-        upper_bound = lower_bound + 10
-        return f"{lower_bound}-{upper_bound}"
-    except (ValueError, TypeError):
-        return None
-
-
-def normalize_price(price):
-    """Нормализует стоимость"""
-    if not price or str(price).strip() == '':
-        return None
-    try:
-        # Убираем все пробелы (разделители тысяч) и другие нечисловые символы, кроме точки и запятой
-        price_str = str(price).strip().replace(' ', '').replace('\xa0', '')  # \xa0 - неразрывный пробел
-        # Заменяем запятую на точку для парсинга
-        price_str = price_str.replace(',', '.')
-        return int(float(price_str))
-    except (ValueError, TypeError):
-        return None
+# Снимок нормализованных квартир (apartment_snapshot): ключ и исходные поля для записей
+SNAPSHOT_KEY = 'apartment_analyzer'
+SNAPSHOT_FIELDS = ('floor', 'rooms', 'view', 'area')
+RECORD_KEYS = [
+    'Этаж', 'Комнатность', 'Вид из окон', 'Площадь', 'Стоимость_норм',
+    'Этаж_норм', 'Комнатность_норм', 'Вид_норм', 'Площадь_норм',
+]
 
 
 def load_and_normalize_csv(file_path):
-    """Загружает CSV файл и нормализует данные"""
-    apartments = []
-    
-    encodings = ['utf-8', 'cp1251', 'windows-1251']
-    
-    for encoding in encodings:
-        try:
-            with open(file_path, 'r', encoding=encoding) as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    # Нормализуем названия колонок (убираем пробелы в начале и конце)
-                    normalized_row = {k.strip(): v for k, v in row.items()}
-                    
-                    # Нормализуем данные
-                    floor_norm = normalize_floor(normalized_row.get('Этаж', ''))
-                    rooms_norm = normalize_rooms(normalized_row.get('Комнатность', ''))
-                    
-                    # Поддержка альтернативных названий колонок
-                    view_norm = normalize_view(
-                        normalized_row.get('Вид из окон', '') or 
-                        normalized_row.get('Вид из окна', '')
-                    )
-                    area_norm = normalize_area(
-                        normalized_row.get('Общая площадь (м.кв.)', '') or 
-                        normalized_row.get('Общая площадь', '')
-                    )
-                    price_norm = normalize_price(normalized_row.get('Стоимость', ''))
-                    
-                    # Пропускаем строки с пустыми критическими полями
-                    if not all([floor_norm, rooms_norm, view_norm, area_norm is not None, price_norm is not None]):
-                        continue
-                    
-                    apartments.append({
-                        'Этаж': normalized_row.get('Этаж', ''),
-                        'Комнатность': normalized_row.get('Комнатность', ''),
-                        'Вид из окон': normalized_row.get('Вид из окон', '') or normalized_row.get('Вид из окна', ''),
-                        'Площадь': normalized_row.get('Общая площадь (м.кв.)', '') or normalized_row.get('Общая площадь', ''),
-                        'Стоимость_норм': price_norm,
-                        'Этаж_норм': floor_norm,
-                        'Комнатность_норм': rooms_norm,
-                        'Вид_норм': view_norm,
-                        'Площадь_норм': area_norm
-                    })
-            break
-        except UnicodeDecodeError:
-            continue
-        except Exception as e:
-            print(f"Ошибка при чтении файла {file_path}: {e}")
-            return []
-    
-    return apartments
+    """Загружает CSV файл и нормализует данные (повторно — из снимка рядом с файлом)"""
+    snapshot = load_snapshot(file_path, SNAPSHOT_KEY, SNAPSHOT_FIELDS)
+    if snapshot is None:
+        return []
+    # Классы этажей и диапазоны площади — сразу для всего столбца
+    floor_codes = FLOOR_CLASSES.codes(snapshot.column('floor_value'))
+    area_codes, area_bins = AREA_BINNING.assign(snapshot.column('area_value'))
+    columns = [
+        snapshot.values('floor'),
+        snapshot.values('rooms'),
+        snapshot.values('view'),
+        snapshot.values('area'),
+        snapshot.values('price_norm'),
+        [FLOOR_CLASSES.names[c] for c in floor_codes.tolist()],
+        snapshot.values('rooms_norm'),
+        snapshot.values('view_norm'),
+        [area_bins.labels[c] for c in area_codes.tolist()],
+    ]
+    return [dict(zip(RECORD_KEYS, row)) for row in zip(*columns)]
 
 
 def group_apartments(apartments, source_name):
@@ -169,6 +71,40 @@ def group_apartments(apartments, source_name):
     return groups
 
 
+def group_records(snapshot, rows, source_name):
+    """Квартиры группы (строки снимка rows) в формате group_apartments"""
+    return [
+        {
+            'Этаж': floor,
+            'Комнатность': rooms,
+            'Вид из окон': view,
+            'Площадь': area,
+            'Стоимость': price,
+            'Источник': source_name
+        }
+        for floor, rooms, view, area, price in zip(
+            snapshot.values('floor', rows),
+            snapshot.values('rooms', rows),
+            snapshot.values('view', rows),
+            snapshot.values('area', rows),
+            snapshot.values('price_norm', rows),
+        )
+    ]
+
+
+def load_groups(file_path, source_name):
+    """Группы квартир файла по индексу групп — то же, что group_apartments(load_and_normalize_csv(...)).
+
+    Индекс строится один раз на файл и сохраняется рядом со снимком;
+    квартиры внутри групп уже упорядочены по стоимости.
+    """
+    snapshot = load_snapshot(file_path, SNAPSHOT_KEY, SNAPSHOT_FIELDS)
+    if snapshot is None:
+        return {}
+    index = load_index(file_path, SNAPSHOT_KEY, snapshot)
+    return {key: group_records(snapshot, rows, source_name) for key, rows in index.items()}
+
+
 def get_floor_range(apartments):
     """Получает диапазон этажей в группе"""
     floors = []
@@ -199,9 +135,8 @@ def save_groups_summary_to_csv(all_groups_dict, output_path):
         # Сортируем группы для красивого вывода
         def sort_key(group_item):
             комнатность, этаж, вид, площадь = group_item[0]
-            # Извлекаем нижнюю границу площади для сортировки
-            area_lower = int(площадь.split('-')[0]) if '-' in площадь else 0
-            return (комнатность, этаж, вид, area_lower)
+            # Диапазон площади (binning.BinLabel) хранит числовую нижнюю границу
+            return (комнатность, этаж, вид, getattr(площадь, 'lower_bound', 0))
         
         sorted_groups = sorted(groups.items(), key=sort_key)
         
@@ -248,9 +183,8 @@ def print_groups(groups, source_name):
     # Сортируем группы для красивого вывода
     def sort_key(group_item):
         комнатность, этаж, вид, площадь = group_item[0]
-        # Извлекаем нижнюю границу площади для сортировки
-        area_lower = int(площадь.split('-')[0]) if '-' in площадь else 0
-        return (комнатность, этаж, вид, area_lower)
+        # Диапазон площади (binning.BinLabel) хранит числовую нижнюю границу
+        return (комнатность, этаж, вид, getattr(площадь, 'lower_bound', 0))
     
     sorted_groups = sorted(groups.items(), key=sort_key)
     
@@ -289,8 +223,7 @@ def main():
     # Обрабатываем основной ЖК
     if main_file.exists():
         print("Обработка основного ЖК: Мой ЖК")
-        apartments_main = load_and_normalize_csv(main_file)
-        groups_main = group_apartments(apartments_main, "Мой ЖК")
+        groups_main = load_groups(main_file, "Мой ЖК")
         print_groups(groups_main, "Мой ЖК (основной ЖК)")
         all_groups_dict["Мой ЖК"] = groups_main
     else:
@@ -303,24 +236,10 @@ def main():
         if comp_file.exists():
             comp_name = comp_file.stem
             print(f"\nОбработка конкурента: {comp_name}")
-            apartments_comp = load_and_normalize_csv(comp_file)
             
             # Объединяем группы конкурентов (не сохраняем отдельно)
-            for apt in apartments_comp:
-                group_key = (
-                    apt['Комнатность_норм'],
-                    apt['Этаж_норм'],
-                    apt['Вид_норм'],
-                    apt['Площадь_норм']
-                )
-                all_competitor_groups[group_key].append({
-                    'Этаж': apt['Этаж'],
-                    'Комнатность': apt['Комнатность'],
-                    'Вид из окон': apt['Вид из окон'],
-                    'Площадь': apt['Площадь'],
-                    'Стоимость': apt['Стоимость_норм'],
-                    'Источник': comp_name
-                })
+            for group_key, apartments in load_groups(comp_file, comp_name).items():
+                all_competitor_groups[group_key].extend(apartments)
         else:
             print(f"Файл не найден: {comp_file}")
     
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Нормализация квартир из CSV для снимков (price_snapshot) и индексов групп
+(group_index) — общая для CLI-скриптов apartment_analyzer, analyze_group,
+compare_groups и histogram_comparison.
+
+В снимке всегда есть нормализованные поля группировки (SNAPSHOT_SCHEMA);
+исходные значения столбцов (RAW_FIELDS), которые нужны скрипту для вывода,
+он перечисляет сам. Ключ снимка у каждого скрипта свой, поэтому снимки с
+разным набором полей не мешают друг другу.
+"""
+
+import math
+import re
+
+from binning import AREA_BINNING, FLOOR_CLASSES
+from group_index import BinnedKey, CategoryKey, ClassKey, load_group_index
+from price_snapshot import load_csv_snapshot
+
+
+def parse_floor(floor):
+    """Номер этажа числом (NaN, если этаж не разобрать)"""
+    try:
+        return float(int(float(str(floor))))
+    except (ValueError, TypeError):
+        return math.nan
+
+
+def normalize_floor(floor):
+    """Нормализует этаж по классам FLOOR_CLASSES: первый (1) или не первый (>1)"""
+    return FLOOR_CLASSES.classify(parse_floor(floor))
+
+
+def normalize_rooms(rooms):
+    """Нормализует комнатность"""
+    if not rooms or str(rooms).strip() == '':
+        return None
+    rooms_str = str(rooms).strip().lower()
+
+    # Обрабатываем студию как 1 комнату
+    if 'студи' in rooms_str:
+        return "1к"
+
+    # Убираем все кроме цифр и "к"
+    rooms_str = re.sub(r'[^\dк]', '', rooms_str)
+    # Извлекаем число комнат
+    match = re.search(r'(\d+)', rooms_str)
+    if match:
+        return f"{match.group(1)}к"
+    return rooms_str
+
+
+def normalize_view(view):
+    """Нормализует вид из окон: во двор или на улицу"""
+    if not view or str(view).strip() == '':
+        return None
+    view_str = str(view).strip().lower()
+
+    # Если содержит "во двор" и не содержит "на улицу" - во двор
+    if "во двор" in view_str and "на улицу" not in view_str:
+        return "во двор"
+    # Если содержит "на улицу" - на улицу
+    elif "на улицу" in view_str:
+        return "на улицу"
+    # Если содержит оба варианта - на улицу (приоритет)
+    elif "во двор" in view_str:
+        return "на улицу"
+    else:
+        return "на улицу"  # По умолчанию
+
+
+def parse_area(area):
+    """Площадь числом (None, если площадь пустая или не разбирается)"""
+    if not area or str(area).strip() == '':
+        return None
+    try:
+        # Заменяем запятую на точку для парсинга
+        area_float = float(str(area).replace(',', '.'))
+    except (ValueError, TypeError):
+        return None
+    return area_float if math.isfinite(area_float) else None
+
+
+def normalize_area(area):
+    """Нормализует площадь и группирует по AREA_BINNING — с шагом 10 м² (например, 40-50)"""
+    area_float = parse_area(area)
+    if area_float is None:
+        return None
+    return AREA_BINNING.label(area_float)
+
+
+def normalize_price(price):
+    """Нормализует стоимость"""
+    if not price or str(price).strip() == '':
+        return None
+    try:
+        # Убираем все пробелы (разделители тысяч) и другие нечисловые символы, кроме точки и запятой
+        price_str = str(price).strip().replace(' ', '').replace('\xa0', '')  # \xa0 - неразрывный пробел
+        # Заменяем запятую на точку для парсинга
+        price_str = price_str.replace(',', '.')
+        return int(float(price_str))
+    except (ValueError, TypeError):
+        return None
+
+
+# Нормализованные поля снимка — по ним строятся группы
+SNAPSHOT_SCHEMA = [
+    ('rooms_norm', 'str'),
+    ('floor_value', 'float'),
+    ('view_norm', 'str'),
+    ('area_value', 'float'),
+    ('price_norm', 'int'),
+]
+# Исходные значения, которые можно добавить в снимок: поле -> столбцы CSV (берётся первый непустой)
+RAW_FIELDS = {
+    'floor': ('Этаж',),
+    'rooms': ('Комнатность',),
+    'view': ('Вид из окон', 'Вид из окна'),
+    'area': ('Общая площадь (м.кв.)', 'Общая площадь'),
+}
+# Ключ группы: комнатность, класс этажа, вид, диапазон площади
+GROUP_KEYS = (
+    CategoryKey('rooms_norm'),
+    ClassKey('floor_value', FLOOR_CLASSES),
+    CategoryKey('view_norm'),
+    BinnedKey('area_value', AREA_BINNING, by='rooms_norm'),
+)
+
+
+def snapshot_schema(raw_fields=()):
+    """Схема снимка: SNAPSHOT_SCHEMA и затем исходные поля raw_fields (строки)"""
+    return SNAPSHOT_SCHEMA + [(field, 'str') for field in raw_fields]
+
+
+def normalize_row(row, raw_fields=()):
+    """Нормализует строку CSV: кортеж полей snapshot_schema(raw_fields) или None, если строку нужно пропустить"""
+    # Нормализуем названия колонок (убираем пробелы в начале и конце; None — лишние ячейки строки)
+    row = {k.strip(): v for k, v in row.items() if k is not None}
+
+    # Исходные значения с поддержкой альтернативных названий колонок
+    raw = {}
+    for field, columns in RAW_FIELDS.items():
+        value = row.get(columns[0], '')
+        for column in columns[1:]:
+            value = value or row.get(column, '')
+        raw[field] = value
+
+    # Нормализуем данные (этаж и площадь — числами, классы и диапазоны считаются по столбцам)
+    floor_value = parse_floor(raw['floor'])
+    rooms_norm = normalize_rooms(raw['rooms'])
+    view_norm = normalize_view(raw['view'])
+    area_value = parse_area(raw['area'])
+    price_norm = normalize_price(row.get('Стоимость', ''))
+
+    # Пропускаем строки с пустыми критическими полями
+    if not all([rooms_norm, view_norm, area_value is not None, price_norm is not None]):
+        return None
+
+    return (rooms_norm, floor_value, view_norm, area_value, price_norm) + tuple(raw[f] for f in raw_fields)
+
+
+def load_snapshot(file_path, key, raw_fields=()):
+    """Снимок нормализованных квартир файла под ключом скрипта key (None при ошибке чтения)"""
+    def normalize(row):
+        return normalize_row(row, raw_fields)
+
+    return load_csv_snapshot(file_path, key, snapshot_schema(raw_fields), normalize)
+
+
+def load_index(file_path, key, snapshot):
+    """Индекс групп снимка по GROUP_KEYS; внутри группы квартиры упорядочены по стоимости"""
+    return load_group_index(file_path, key, snapshot, GROUP_KEYS, 'price_norm')
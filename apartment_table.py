@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Колоночное хранение квартир для веб-приложения.
+
+Вместо списка словарей с кириллическими ключами квартиры хранятся столбцами:
+название объекта и тип площади — категориальные коды (int32) со списком
+категорий, площадь и стоимость — массивы NumPy. Дополнительные характеристики
+(застройщик, район, этажность и т.д.) тоже хранятся как категории, код -1
+означает пустое значение.
+"""
+
+from array import array
+
+import numpy as np
+
+
+# Основные поля записи квартиры (см. price_ingest.iter_apartments)
+CORE_FIELDS = ('Название объекта', 'Тип площади', 'Площадь общая', 'Стоимость')
+
+
+class _Categories:
+    """Словарь категорий при построении таблицы: значение -> код"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+
+def _remap(categories_list, codes_list):
+    """Объединяет наборы категорий и перекодирует массивы кодов в общий набор"""
+    merged = _Categories()
+    remapped = []
+    for categories, codes in zip(categories_list, codes_list):
+        lookup = np.array([merged.code(v) for v in categories] + [-1], dtype=np.int32)
+        # Код -1 (пустое значение) указывает на последний элемент lookup и остаётся -1
+        remapped.append(lookup[codes])
+    return merged.values, remapped
+
+
+class ApartmentTable:
+    """Таблица квартир в колоночном виде.
+
+    object_names / area_types — списки категорий, object_codes / area_type_codes —
+    коды категорий по строкам. areas (float64) и prices (int64) — значения по строкам.
+    extras — словарь: характеристика -> (список категорий, коды int32, -1 = пусто).
+    """
+
+    def __init__(self, object_names, object_codes, area_types, area_type_codes, areas, prices, extras=None):
+        self.object_names = list(object_names)
+        self.object_codes = np.asarray(object_codes, dtype=np.int32)
+        self.area_types = list(area_types)
+        self.area_type_codes = np.asarray(area_type_codes, dtype=np.int32)
+        self.areas = np.asarray(areas, dtype=np.float64)
+        self.prices = np.asarray(prices, dtype=np.int64)
+        self.extras = extras or {}
+
+    def __len__(self):
+        return len(self.prices)
+
+    @property
+    def nbytes(self):
+        """Примерный объём памяти, занимаемый таблицей (массивы и категории)"""
+        total = (self.object_codes.nbytes + self.area_type_codes.nbytes +
+                 self.areas.nbytes + self.prices.nbytes)
+        categories = list(self.object_names) + list(self.area_types)
+        for values, codes in self.extras.values():
+            total += codes.nbytes
+            categories.extend(values)
+        total += sum(len(str(v).encode('utf-8')) for v in categories)
+        return total
+
+    @classmethod
+    def empty(cls):
+        return cls([], [], [], [], [], [])
+
+    @classmethod
+    def from_records(cls, records):
+        """Строит таблицу из итератора записей квартир (словарей).
+
+        Записи обрабатываются потоково: подходит генератор price_ingest.iter_apartments.
+        """
+        objects = _Categories()
+        area_types = _Categories()
+        object_codes = array('i')
+        area_type_codes = array('i')
+        areas = array('d')
+        prices = array('q')
+        extra_categories = {}
+        extra_codes = {}
+
+        for row_index, record in enumerate(records):
+            object_codes.append(objects.code(record['Название объекта']))
+            area_type_codes.append(area_types.code(record['Тип площади']))
+            areas.append(record['Площадь общая'])
+            prices.append(record['Стоимость'])
+            for field, value in record.items():
+                if field in CORE_FIELDS:
+                    continue
+                codes = extra_codes.get(field)
+                if codes is None:
+                    # Характеристика впервые встретилась: для предыдущих строк она пустая
+                    extra_categories[field] = _Categories()
+                    codes = extra_codes[field] = array('i', [-1]) * row_index
+                codes.append(extra_categories[field].code(value))
+            # Характеристики, которых нет в этой записи, — пустые
+            for field, codes in extra_codes.items():
+                if len(codes) <= row_index:
+                    codes.append(-1)
+
+        extras = {
+            field: (extra_categories[field].values, np.frombuffer(codes, dtype=np.int32).copy())
+            for field, codes in extra_codes.items()
+        }
+        return cls(
+            objects.values, np.frombuffer(object_codes, dtype=np.int32).copy(),
+            area_types.values, np.frombuffer(area_type_codes, dtype=np.int32).copy(),
+            np.frombuffer(areas, dtype=np.float64).copy(),
+            np.frombuffer(prices, dtype=np.int64).copy(),
+            extras
+        )
+
+    @classmethod
+    def concat(cls, tables):
+        """Объединяет несколько таблиц в одну (категории сливаются)"""
+        tables = [t for t in tables if t is not None]
+        if not tables:
+            return cls.empty()
+        if len(tables) == 1:
+            return tables[0]
+
+        object_names, object_codes = _remap([t.object_names for t in tables], [t.object_codes for t in tables])
+        area_types, area_type_codes = _remap([t.area_types for t in tables], [t.area_type_codes for t in tables])
+
+        extras = {}
+        fields = []
+        for t in tables:
+            fields.extend(f for f in t.extras if f not in fields)
+        for field in fields:
+            categories_list = []
+            codes_list = []
+            for t in tables:
+                values, codes = t.extras.get(field, ([], np.full(len(t), -1, dtype=np.int32)))
+                categories_list.append(values)
+                codes_list.append(codes)
+            values, remapped = _remap(categories_list, codes_list)
+            extras[field] = (values, np.concatenate(remapped))
+
+        return cls(
+            object_names, np.concatenate(object_codes),
+            area_types, np.concatenate(area_type_codes),
+            np.concatenate([t.areas for t in tables]),
+            np.concatenate([t.prices for t in tables]),
+            extras
+        )
+
+    def take(self, indices):
+        """Подтаблица по индексам строк (категории общие с исходной таблицей)"""
+        indices = np.asarray(indices)
+        extras = {field: (values, codes[indices]) for field, (values, codes) in self.extras.items()}
+        return ApartmentTable(
+            self.object_names, self.object_codes[indices],
+            self.area_types, self.area_type_codes[indices],
+            self.areas[indices], self.prices[indices],
+            extras
+        )
+
+    def map_object_names(self, func):
+        """Переименовывает объекты функцией func (совпавшие имена сливаются в одну категорию)"""
+        merged = _Categories()
+        lookup = np.array([merged.code(func(name)) for name in self.object_names], dtype=np.int32)
+        codes = lookup[self.object_codes] if len(self.object_names) else self.object_codes
+        return ApartmentTable(
+            merged.values, codes,
+            self.area_types, self.area_type_codes,
+            self.areas, self.prices,
+            self.extras
+        )
+
+    def split_by_object(self):
+        """Разбивает таблицу по объектам: название -> подтаблица.
+
+        Порядок объектов — по первому появлению в таблице.
+        """
+        if not len(self):
+            return {}
+        order = np.argsort(self.object_codes, kind='stable')
+        codes_sorted = self.object_codes[order]
+        starts = np.flatnonzero(np.r_[True, codes_sorted[1:] != codes_sorted[:-1]])
+        bounds = np.r_[starts, len(order)]
+        parts = [(order[bounds[k]], order[bounds[k]:bounds[k + 1]]) for k in range(len(starts))]
+        parts.sort(key=lambda p: p[0])
+        return {self.object_names[self.object_codes[first]]: self.take(idx) for first, idx in parts}
+
+    def unique_values(self, field):
+        """Непустые значения характеристики, встречающиеся в таблице"""
+        if field not in self.extras:
+            return []
+        values, codes = self.extras[field]
+        used = np.unique(codes)
+        return [values[c] for c in used if c >= 0]
+
+    def records(self):
+        """Записи квартир в виде словарей (для отладки и совместимости)"""
+        result = []
+        for i in range(len(self)):
+            record = {
+                'Название объекта': self.object_names[self.object_codes[i]],
+                'Тип площади': self.area_types[self.area_type_codes[i]],
+                'Площадь общая': float(self.areas[i]),
+                'Стоимость': int(self.prices[i])
+            }
+            for field, (values, codes) in self.extras.items():
+                if codes[i] >= 0:
+                    record[field] = values[codes[i]]
+            result.append(record)
+        return result
@@ -5,42 +5,43 @@ Flask приложение для анализа и группировки кв
 """
 
 from flask import Flask, render_template, request, jsonify, url_for, Blueprint
-import csv
 import re
 import os
-import statistics
 from pathlib import Path
-from collections import defaultdict
-import base64
 import io
+import json
+import math
 
-# Для Render: matplotlib должен писать кэш во временную папку
-if 'MPLCONFIGDIR' not in os.environ:
-    os.environ['MPLCONFIGDIR'] = '/tmp/matplotlib'
-
-try:
-    import matplotlib
-    matplotlib.use('Agg')  # Backend без GUI (для сервера)
-    import matplotlib.pyplot as plt
-    import numpy as np
-    import matplotlib.patches as mpatches
-    MATPLOTLIB_AVAILABLE = True
-    plt.rcParams['font.family'] = 'DejaVu Sans'
-    plt.rcParams['axes.unicode_minus'] = False
-except ImportError:
-    MATPLOTLIB_AVAILABLE = False
-
-try:
-    import plotly.graph_objects as go
-    import plotly.express as px
-    PLOTLY_AVAILABLE = True
-except ImportError:
-    PLOTLY_AVAILABLE = False
+import numpy as np
+
+from price_ingest import ingest_csv, IngestStats, Diagnostics, report as report_ingest, report_diagnostics
+from apartment_table import ApartmentTable
+from group_stats import batch_statistics, pack_groups
+from upload_cache import UploadCache, file_digest, stream_digest
+from group_sessions import GroupSessionStore
+from area_types import normalize_area_type
+from number_parsing import parse_price as normalize_price
+from csv_sniff import SNIFF_BYTES, detect_delimiter, sniff_stream
+
+from charts import MATPLOTLIB_AVAILABLE, CHART_KINDS, plot_to_base64, create_boxplot, create_histogram, render_png
+from chart_pool import chart_pool
+from figure_cache import figure_cache, fingerprint
+from plotly_traces import PLOTLY_AVAILABLE, area_type_figure
 
 app = Flask(__name__, static_folder='static', static_url_path='/static')
 # Секрет для сессий (на Render задайте SECRET_KEY в Environment)
 app.config['SECRET_KEY'] = __import__('os').environ.get('SECRET_KEY', 'dev-secret-change-in-production')
 
+# Кэш разобранных файлов и результатов группировки (ключ — хэш содержимого файлов).
+# Объём задаётся в мегабайтах через UPLOAD_CACHE_MAX_MB
+upload_cache = UploadCache(int(os.environ.get('UPLOAD_CACHE_MAX_MB', '64')) * 1024 * 1024)
+
+# Результаты группировки для compare_groups (время жизни — GROUP_SESSION_TTL секунд)
+group_sessions = GroupSessionStore(int(os.environ.get('GROUP_SESSION_TTL', '3600')))
+
+# Время кэширования графиков в браузере, секунд
+CHART_MAX_AGE = 86400
+
 # Создаем Blueprint для Аквилона
 akvilon_bp = Blueprint('akvilon', __name__, url_prefix='/akvilon')
 
@@ -97,438 +98,89 @@ def normalize_area(area):
     except (ValueError, TypeError):
         return None
 
-def normalize_price(price):
-    """Нормализует стоимость"""
-    if not price or str(price).strip() == '':
-        return None
-    try:
-        # Убираем все пробелы (разделители тысяч), символы валют и другие нечисловые символы, кроме точки и запятой
-        price_str = str(price).strip()
-        # Убираем символы валют (₽, руб, руб., и т.д.)
-        price_str = price_str.replace('₽', '').replace('руб', '').replace('руб.', '').replace('RUB', '')
-        # Убираем все пробелы и неразрывные пробелы
-        price_str = price_str.replace(' ', '').replace('\xa0', '').replace('\u2009', '')  # \xa0 - неразрывный пробел, \u2009 - тонкий пробел
-        # Заменяем запятую на точку для парсинга
-        price_str = price_str.replace(',', '.')
-        # Убираем все оставшиеся нечисловые символы кроме точки и минуса
-        price_str = ''.join(c for c in price_str if c.isdigit() or c in '.-')
-        if not price_str or price_str in ['.', '-']:
-            return None
-        return int(float(price_str))
-    except (ValueError, TypeError):
-        return None
+def load_csv_from_string(csv_content, filename='', stats=None):
+    """Загружает CSV из строки с новым форматом (список словарей квартир).
 
-def normalize_area_type(area_type):
-    """Нормализует тип площади к единому формату"""
-    if not area_type:
-        return None
-    
-    area_type_str = str(area_type).strip()
-    area_type_lower = area_type_str.lower()
-    
-    # Нормализуем пробелы
-    area_type_lower = ' '.join(area_type_lower.split())
-    area_type_lower_no_spaces = area_type_lower.replace(' ', '')
-    
-    # 1. Студии -> "XS (Студия)"
-    if 'студи' in area_type_lower or area_type_lower == 'xs' or area_type_lower.startswith('xs'):
-        return 'XS (Студия)'
-    
-    # Исправляем опечатки: "З" (кириллическая) вместо "3" в "3Евро"
-    area_type_lower = area_type_lower.replace('зевро', '3евро').replace('зеuro', '3евро')
-    area_type_lower_no_spaces = area_type_lower.replace(' ', '')
-    
-    # 2. Евро-планировки (S, M, L) - только для 2, 3, 4 комнат
-    # Сначала проверяем форматы типа "2ккв (Евро)", "3ккв (Евро)", "4ккв (Евро)"
-    match_euro = re.search(r'(\d+)\s*[кkкквkv].*евро', area_type_lower)
-    if match_euro:
-        room_count = int(match_euro.group(1))
-        if room_count == 2:
-            return 'S (2Евро)'
-        elif room_count == 3:
-            return 'M (3Евро)'
-        elif room_count == 4:
-            return 'L (4Евро)'
-        # Для 5+ комнат с упоминанием евро - игнорируем "евро", это обычная квартира
-        elif room_count >= 5:
-            return f"{room_count}к"
-    
-    # S (2Евро) - 2 комнаты евро
-    if (area_type_lower.startswith('s') and 'евро' in area_type_lower) or '2евро' in area_type_lower_no_spaces:
-        return 'S (2Евро)'
-    
-    # M (3Евро) - 3 комнаты евро
-    # Если просто "M" или "M " (без цифр и без "к"), это евро-планировка
-    if area_type_lower.startswith('m'):
-        # Проверяем, что это не "м2" или что-то подобное
-        if len(area_type_lower) <= 2 or (not re.search(r'\d', area_type_lower) and 'к' not in area_type_lower):
-            return 'M (3Евро)'
-        # Или если есть упоминание евро
-        if 'евро' in area_type_lower or '3евро' in area_type_lower_no_spaces:
-            return 'M (3Евро)'
-    
-    # L (4Евро) - 4 комнаты евро
-    # Если просто "L" или "L " (без цифр и без "к"), это евро-планировка
-    if area_type_lower.startswith('l'):
-        # Проверяем, что это не "л2" или что-то подобное
-        if len(area_type_lower) <= 2 or (not re.search(r'\d', area_type_lower) and 'к' not in area_type_lower):
-            return 'L (4Евро)'
-        # Или если есть упоминание евро
-        if 'евро' in area_type_lower or '4евро' in area_type_lower_no_spaces:
-            return 'L (4Евро)'
-    
-    # 3. Обычные квартиры (1к, 2к, 3к, 4к, 5к, 6к и т.д.)
-    # Ищем паттерны: "1к", "1 к", "1ккв", "1 ккв", "1K", "1 K", "5ккв", "5 ккв" и т.д.
-    # Для 5+ комнат игнорируем упоминание "евро" - это всегда обычная квартира
-    match = re.search(r'(\d+)\s*[кkкквkv]', area_type_lower)
-    if match:
-        room_count = int(match.group(1))
-        # Возвращаем с кириллической "к"
-        return f"{room_count}к"
-    
-    # Если ничего не подошло, возвращаем оригинал с нормализованными пробелами
-    return area_type_str
-
-def load_csv_from_string(csv_content, filename=''):
-    """Загружает CSV из строки с новым форматом"""
-    apartments = []
-    required_fields = ['Название объекта', 'Тип площади', 'Площадь общая', 'Стоимость']
-    missing_fields = []
-    
+    Колонки сопоставляются один раз на файл (см. price_ingest), затем строки
+    обрабатываются потоково. Если передан stats (IngestStats), в него
+    записываются счётчики строк, причины пропусков и пропускная способность.
+    Сводка по файлу выводится один раз (см. price_ingest.report).
+    """
+    if stats is None:
+        stats = IngestStats(filename)
+    delimiter = detect_delimiter(csv_content[:SNIFF_BYTES], complete=len(csv_content) <= SNIFF_BYTES)
+    apartments, _ = ingest_csv(io.StringIO(csv_content), normalize_area_type, normalize_price, filename, stats,
+                               delimiter=delimiter)
+    report_ingest(stats)
+    return apartments
+
+def load_table_from_string(csv_content, filename='', stats=None):
+    """Загружает CSV из строки сразу в колоночную таблицу ApartmentTable"""
+    delimiter = detect_delimiter(csv_content[:SNIFF_BYTES], complete=len(csv_content) <= SNIFF_BYTES)
+    return load_table_from_text(io.StringIO(csv_content), filename, stats, delimiter)
+
+def load_table_from_text(text_stream, filename='', stats=None, delimiter=','):
+    """Загружает CSV из текстового потока в колоночную таблицу ApartmentTable"""
+    if stats is None:
+        stats = IngestStats(filename)
+    table, _ = ingest_csv(text_stream, normalize_area_type, normalize_price, filename, stats,
+                          collect=ApartmentTable.from_records, delimiter=delimiter)
+    report_ingest(stats)
+    return table
+
+def load_table_from_stream(stream, filename='', stats=None):
+    """Загружает CSV из потока байтов (загруженный файл) в ApartmentTable.
+
+    Кодировка (UTF-8, с BOM или без, либо cp1251) и разделитель определяются
+    по началу файла (csv_sniff). Байты декодируются по мере чтения кусками
+    (TextIOWrapper), поэтому файл не копируется в память ни как bytes, ни
+    как str: пиковый расход памяти определяется размером куска и самой таблицей.
+    """
+    text_stream, csv_format = sniff_stream(stream)
     try:
-        # Используем более гибкий парсер CSV с поддержкой многострочных полей
-        reader = csv.DictReader(io.StringIO(csv_content), quoting=csv.QUOTE_MINIMAL)
-        # Нормализуем названия колонок (убираем пробелы в начале и конце, невидимые символы, переносы строк)
-        original_fieldnames = reader.fieldnames if reader.fieldnames else []
-        # Сохраняем оригинальные названия, но также создаем нормализованные версии для поиска
-        # Убираем переносы строк внутри названий полей (могут быть из-за многострочных CSV)
-        fieldnames = []
-        for f in original_fieldnames:
-            if f:
-                # Убираем переносы строк, невидимые символы, нормализуем пробелы
-                normalized = f.replace('\n', ' ').replace('\r', ' ').replace('\ufeff', '').replace('\u200b', '')
-                normalized = ' '.join(normalized.split())  # Убираем множественные пробелы
-                fieldnames.append(normalized.strip())
-            else:
-                fieldnames.append('')
-        
-        # Создаем маппинг нормализованных названий к оригинальным
-        field_mapping = {}
-        for orig, norm in zip(original_fieldnames, fieldnames):
-            field_mapping[norm] = orig
-        
-        # Проверяем наличие всех обязательных полей (с учетом возможных вариаций)
-        found_fields = {}  # required_field -> оригинальное название из файла
-        for required_field in required_fields:
-            found = False
-            # Нормализуем требуемое поле: убираем все пробелы и переносы строк
-            normalized_required = required_field.strip().replace('\n', ' ').replace('\r', ' ')
-            normalized_required = ''.join(normalized_required.split()).lower()
-            
-            for i, field in enumerate(fieldnames):
-                if not field:
-                    continue
-                # Нормализуем поле для сравнения: убираем все пробелы, переносы строк, невидимые символы
-                normalized_field = field.strip().replace('\n', ' ').replace('\r', ' ')
-                normalized_field = normalized_field.replace('\ufeff', '').replace('\u200b', '').replace('\u00a0', ' ')
-                normalized_field = ''.join(normalized_field.split()).lower()  # Убираем все пробелы
-                
-                # Сравниваем нормализованные версии
-                if normalized_field == normalized_required:
-                    found_fields[required_field] = original_fieldnames[i]  # Сохраняем оригинальное название
-                    found = True
-                    break
-            if not found:
-                missing_fields.append(required_field)
-        
-        if missing_fields:
-            # Показываем доступные поля для отладки
-            available_fields = ', '.join(fieldnames) if fieldnames else 'нет полей'
-            # Также показываем оригинальные названия для отладки
-            original_fields = ', '.join([f for f in original_fieldnames if f]) if original_fieldnames else 'нет полей'
-            # Показываем найденные поля
-            found_fields_str = ', '.join([f"{k} -> {v}" for k, v in found_fields.items()])
-            error_msg = f"В файле '{filename}' отсутствуют обязательные поля: {', '.join(missing_fields)}. Найдены поля (нормализованные): {available_fields}. Оригинальные поля: {original_fields}. Маппинг найденных: {found_fields_str}"
-            raise ValueError(error_msg)
-        
-        # Проверяем, что все обязательные поля найдены
-        if len(found_fields) != len(required_fields):
-            missing = [f for f in required_fields if f not in found_fields]
-            error_msg = f"В файле '{filename}' не все обязательные поля найдены. Отсутствуют: {', '.join(missing)}"
-            raise ValueError(error_msg)
-
-        # Подготовим поиск дополнительных полей по нормализованным названиям,
-        # чтобы учитывать возможные пробелы/регистр.
-        extra_field_names = ['Застройщик', 'Район', 'Класс', 'Этажность', 'Срок сдачи', 'Тип дома', 'Отделка']
-        extra_field_mapping = {}  # extra_name -> (orig_key, norm_key)
-        for extra_name in extra_field_names:
-            # Базовое нормализованное имя (без пробелов и регистра)
-            normalized_required = ''.join(extra_name.strip().split()).lower()
-            # Для некоторых полей поддерживаем альтернативные названия колонок
-            # Например, "Этажность" в файлах может называться "Этажей"
-            alternative_required = None
-            if extra_name == 'Этажность':
-                alternative_required = 'этажей'
-            orig_key = None
-            norm_key = None
-            for i, field in enumerate(fieldnames):
-                if not field:
-                    continue
-                normalized_field = field.strip().replace('\n', ' ').replace('\r', ' ')
-                normalized_field = normalized_field.replace('\ufeff', '').replace('\u200b', '').replace('\u00a0', ' ')
-                normalized_field_comp = ''.join(normalized_field.split()).lower()
-                if (normalized_field_comp == normalized_required or
-                    (alternative_required is not None and normalized_field_comp == alternative_required)):
-                    orig_key = original_fieldnames[i]
-                    norm_key = field.strip()
-                    break
-            if orig_key:
-                extra_field_mapping[extra_name] = (orig_key, norm_key)
-        
-        for row_num, row in enumerate(reader, start=2):  # start=2, т.к. первая строка - заголовки
-            # Нормализуем ключи строки (убираем переносы строк из названий полей)
-            normalized_row = {}
-            for key, value in row.items():
-                if key:
-                    # Нормализуем ключ так же, как мы нормализовали fieldnames
-                    normalized_key = key.replace('\n', ' ').replace('\r', ' ').replace('\ufeff', '').replace('\u200b', '')
-                    normalized_key = ' '.join(normalized_key.split()).strip()
-                    normalized_row[normalized_key] = value
-            
-            # Извлекаем обязательные поля, используя найденные названия
-            object_name_key = found_fields.get('Название объекта', 'Название объекта')
-            area_type_key = found_fields.get('Тип площади', 'Тип площади')
-            total_area_key = found_fields.get('Площадь общая', 'Площадь общая')
-            price_key = found_fields.get('Стоимость', 'Стоимость')
-            
-            # Нормализуем ключи для поиска в normalized_row
-            object_name_norm = object_name_key.replace('\n', ' ').replace('\r', ' ').replace('\ufeff', '').replace('\u200b', '')
-            object_name_norm = ' '.join(object_name_norm.split()).strip()
-            area_type_norm = area_type_key.replace('\n', ' ').replace('\r', ' ').replace('\ufeff', '').replace('\u200b', '')
-            area_type_norm = ' '.join(area_type_norm.split()).strip()
-            total_area_norm = total_area_key.replace('\n', ' ').replace('\r', ' ').replace('\ufeff', '').replace('\u200b', '')
-            total_area_norm = ' '.join(total_area_norm.split()).strip()
-            price_norm = price_key.replace('\n', ' ').replace('\r', ' ').replace('\ufeff', '').replace('\u200b', '')
-            price_norm = ' '.join(price_norm.split()).strip()
-            
-            # Пробуем найти поля разными способами
-            object_name = ''
-            area_type = ''
-            total_area = ''
-            price_str = ''
-            
-            # Ищем по нормализованному ключу
-            if object_name_norm in normalized_row:
-                object_name = str(normalized_row[object_name_norm]).strip()
-            # Если не нашли, пробуем найти в оригинальной строке
-            elif object_name_key in row:
-                object_name = str(row[object_name_key]).strip()
-            
-            if area_type_norm in normalized_row:
-                area_type = str(normalized_row[area_type_norm]).strip()
-            elif area_type_key in row:
-                area_type = str(row[area_type_key]).strip()
-            
-            if total_area_norm in normalized_row:
-                total_area = str(normalized_row[total_area_norm]).strip()
-            elif total_area_key in row:
-                total_area = str(row[total_area_key]).strip()
-            
-            # Убираем переносы строк из значений
-            object_name = object_name.replace('\n', ' ').replace('\r', ' ').strip()
-            area_type = area_type.replace('\n', ' ').replace('\r', ' ').strip()
-            total_area = total_area.replace('\n', ' ').replace('\r', ' ').strip()
-            
-            # Для ЖК "Залив 1" и "Аквилон ZaLive" используем столбец "100% стоимость" вместо "Стоимость"
-            use_100_percent_price = False
-            if object_name and (('залив' in object_name.lower() and '1' in object_name) or 
-                               'аквилон' in object_name.lower()):
-                use_100_percent_price = True
-                # Ищем столбец "100% стоимость" или его варианты
-                price_100_key = None
-                price_100_norm = None
-                for field in fieldnames:
-                    if field:
-                        normalized_field = field.strip().replace('\n', ' ').replace('\r', ' ')
-                        normalized_field = normalized_field.replace('\ufeff', '').replace('\u200b', '')
-                        normalized_field_lower = ''.join(normalized_field.split()).lower()
-                        # Ищем варианты: "100%стоимость", "100% стоимость", "стоимостьпри100%" и т.д.
-                        if '100' in normalized_field_lower and ('стоимость' in normalized_field_lower or 'cost' in normalized_field_lower):
-                            # Находим оригинальное название поля
-                            for orig_field in original_fieldnames:
-                                if orig_field and field.strip() == orig_field.strip():
-                                    price_100_key = orig_field
-                                    price_100_norm = normalized_field.strip()
-                                    break
-                            if price_100_key:
-                                break
-                
-                if price_100_key:
-                    # Используем столбец "100% стоимость"
-                    if price_100_norm in normalized_row:
-                        price_str = str(normalized_row[price_100_norm]).strip()
-                    elif price_100_key in row:
-                        price_str = str(row[price_100_key]).strip()
-            
-            # Если не нашли "100% стоимость" или это не "Залив 1"/"Аквилон", используем обычный столбец "Стоимость"
-            if not use_100_percent_price or not price_str:
-                if price_norm in normalized_row:
-                    price_str = str(normalized_row[price_norm]).strip()
-                elif price_key in row:
-                    price_str = str(row[price_key]).strip()
-            
-            # Отладочная информация для Аквилон
-            if use_100_percent_price and not price_str:
-                print(f"Предупреждение: для {object_name} не найден столбец '100% стоимость', используем обычный 'Стоимость'")
-            
-            # Убираем переносы строк из стоимости
-            price_str = price_str.replace('\n', ' ').replace('\r', ' ').strip()
-            
-            # Валидация полей
-            if not object_name:
-                print(f"Предупреждение: строка {row_num} - пустое поле 'Название объекта', пропускаем")
-                continue
-            
-            if not area_type:
-                print(f"Предупреждение: строка {row_num} - пустое поле 'Тип площади', пропускаем")
-                continue
-            
-            # Нормализуем тип площади к единому формату
-            area_type = normalize_area_type(area_type)
-            if not area_type:
-                print(f"Предупреждение: строка {row_num} - не удалось нормализовать 'Тип площади', пропускаем")
-                continue
-            
-            if not total_area:
-                print(f"Предупреждение: строка {row_num} - пустое поле 'Площадь общая', пропускаем")
-                continue
-            
-            # Нормализуем площадь - убираем единицы измерения и лишние символы
-            try:
-                # Убираем "м²", пробелы и другие символы, оставляем только число
-                area_clean = str(total_area).replace('м²', '').replace('м2', '').replace(' ', '').replace('\xa0', '')
-                area_float = float(area_clean.replace(',', '.'))
-            except (ValueError, TypeError) as e:
-                print(f"Предупреждение: строка {row_num} - неверный формат 'Площадь общая': '{total_area}', ошибка: {e}, пропускаем")
-                continue
-            
-            # Нормализуем стоимость
-            price_norm = normalize_price(price_str)
-            if price_norm is None:
-                print(f"Предупреждение: строка {row_num} - неверный формат 'Стоимость': '{price_str}', пропускаем")
-                continue
-            
-            # Дополнительные характеристики (если есть в файле)
-            extra_fields = {}
-            for extra_name in extra_field_names:
-                mapping = extra_field_mapping.get(extra_name)
-                if not mapping:
-                    continue
-                orig_extra_key, norm_extra_key = mapping
-
-                val = ''
-                # Сначала пробуем по нормализованному ключу
-                if norm_extra_key in normalized_row:
-                    val = normalized_row.get(norm_extra_key, '')
-                elif orig_extra_key in row:
-                    val = row.get(orig_extra_key, '')
-
-                if val is None:
-                    val = ''
-                val = str(val).strip()
-                if val != '':
-                    extra_fields[extra_name] = val
-
-            apt_record = {
-                'Название объекта': object_name,
-                'Тип площади': area_type,
-                'Площадь общая': area_float,
-                'Стоимость': price_norm
-            }
-            # Добавляем характеристики только если они непустые
-            apt_record.update(extra_fields)
+        return load_table_from_text(text_stream, filename, stats, csv_format.delimiter)
+    finally:
+        # Поток загруженного файла закрывает werkzeug, а не обёртка
+        text_stream.detach()
 
-            apartments.append(apt_record)
-            
-    except ValueError as e:
-        # Пробрасываем ошибки валидации наверх
-        raise e
-    except Exception as e:
-        error_msg = f"Ошибка при загрузке CSV файла '{filename}': {str(e)}"
-        raise ValueError(error_msg)
-    
-    return apartments
+def group_apartments(table, source_name):
+    """Группирует квартиры таблицы по типу площади.
+
+    Возвращает словарь: тип площади -> индексы строк таблицы, отсортированные
+    по стоимости, и название объекта.
+    """
+    groups = {}
+    if len(table):
+        # Сортируем по типу площади, внутри типа — по стоимости (порядок равных сохраняется)
+        order = np.lexsort((table.prices, table.area_type_codes))
+        codes_sorted = table.area_type_codes[order]
+        starts = np.flatnonzero(np.r_[True, codes_sorted[1:] != codes_sorted[:-1]])
+        bounds = np.r_[starts, len(order)]
+        # Типы площади в порядке первого появления, как при группировке словарём
+        first_seen = {}
+        for k in range(len(starts)):
+            idx = order[bounds[k]:bounds[k + 1]]
+            first_seen[idx.min()] = (table.area_types[codes_sorted[bounds[k]]], idx)
+        for _, (area_type, idx) in sorted(first_seen.items()):
+            groups[area_type] = idx
+
+    # Возвращаем также название объекта (берем первое)
+    if len(table):
+        object_name = table.object_names[table.object_codes[0]]
+    else:
+        object_name = source_name
 
-def group_apartments(apartments, source_name):
-    """Группирует квартиры по типу площади"""
-    groups = defaultdict(list)
-    object_names = set()  # Собираем уникальные названия объектов
-    
-    for apt in apartments:
-        # Группируем только по типу площади
-        group_key = apt['Тип площади']
-        object_names.add(apt['Название объекта'])
-        
-        groups[group_key].append({
-            'Название объекта': apt['Название объекта'],
-            'Площадь общая': apt['Площадь общая'],
-            'Стоимость': apt['Стоимость']
-        })
-    
-    # Сортируем квартиры по стоимости внутри каждой группы
-    for group_key in groups:
-        groups[group_key].sort(key=lambda x: x['Стоимость'])
-    
-    # Возвращаем также название объекта (берем первое уникальное)
-    object_name = list(object_names)[0] if object_names else source_name
-    
     return groups, object_name
 
 def calculate_statistics(costs):
-    """Вычисляет статистику для группы"""
-    if not costs:
+    """Вычисляет статистику для группы (список или массив NumPy).
+
+    Для многих групп сразу используйте group_stats.batch_statistics.
+    """
+    costs_sorted = np.sort(np.asarray(costs))
+    if costs_sorted.size == 0:
         return None
-    
-    costs_sorted = sorted(costs)
-    mean = statistics.mean(costs_sorted)
-    median = statistics.median(costs_sorted)
-    std = statistics.stdev(costs_sorted) if len(costs_sorted) > 1 else 0
-    q1 = statistics.quantiles(costs_sorted, n=4)[0]
-    q3 = statistics.quantiles(costs_sorted, n=4)[2]
-    iqr = q3 - q1
-    
-    # Выбросы
-    lower_bound = q1 - 1.5 * iqr
-    upper_bound = q3 + 1.5 * iqr
-    outliers_lower = [c for c in costs_sorted if c < lower_bound]
-    outliers_upper = [c for c in costs_sorted if c > upper_bound]
-    outliers_all = outliers_lower + outliers_upper
-    
-    return {
-        'mean': mean,
-        'median': median,
-        'std': std,
-        'min': min(costs_sorted),
-        'max': max(costs_sorted),
-        'q1': q1,
-        'q3': q3,
-        'iqr': iqr,
-        'outliers': outliers_all,
-        'outliers_lower': outliers_lower,
-        'outliers_upper': outliers_upper,
-        'outliers_count': len(outliers_all),
-        'outliers_lower_count': len(outliers_lower),
-        'outliers_upper_count': len(outliers_upper)
-    }
-
-def plot_to_base64(fig):
-    """Конвертирует matplotlib figure в base64 строку"""
-    img = io.BytesIO()
-    fig.savefig(img, format='png', dpi=100, bbox_inches='tight')
-    img.seek(0)
-    img_base64 = base64.b64encode(img.getvalue()).decode('utf-8')
-    plt.close(fig)
-    return img_base64
+    return batch_statistics(costs_sorted, [0, costs_sorted.size]).group(0)
 
 @app.route('/health')
 def health():
@@ -621,6 +273,165 @@ def normalize_object_name(object_name):
     
     return object_name
 
+# Причины пропуска групп
+GROUP_ISSUES = {
+    'empty_group': 'группа не содержит валидных данных (стоимость и площадь > 0)',
+}
+
+def build_object_groups(object_name, table, is_main, groups_list, diagnostics=None):
+    """Добавляет в groups_list группы одного ЖК (по типу площади), без 'id'.
+
+    Статистика стоимости заполняется позже для всех групп сразу
+    (attach_group_statistics), до этого 'costs' — массив NumPy.
+    Пропущенные группы учитываются в diagnostics (price_ingest.Diagnostics).
+    """
+    object_groups, _ = group_apartments(table, object_name)
+
+    for area_type, idx in object_groups.items():
+        # Извлекаем стоимости и площади (уже отсортированы по стоимости)
+        costs = table.prices[idx]
+        areas = table.areas[idx]
+
+        # Проверяем, что стоимости валидны (> 0)
+        costs = costs[costs > 0]
+        areas = areas[areas > 0]
+
+        if not costs.size or not areas.size:
+            if diagnostics is not None:
+                diagnostics.add('empty_group', f"{object_name}: {area_type}")
+            continue
+
+        # Сортируем для правильного расчета медианы
+        costs_sorted = np.sort(costs)
+        areas_sorted = np.sort(areas)
+
+        total_area = sum(areas.tolist())  # Суммарная площадь группы
+
+        # Рассчитываем цены за квадратный метр (по отсортированным рядам стоимости и площади)
+        pair_count = min(costs_sorted.size, areas_sorted.size)
+        price_per_sqm = costs_sorted[:pair_count] / areas_sorted[:pair_count]
+        price_per_sqm_sorted = np.sort(price_per_sqm[price_per_sqm > 0])  # Убираем нулевые значения
+
+        if price_per_sqm_sorted.size:
+            min_price_per_sqm = price_per_sqm_sorted[0].item()
+            max_price_per_sqm = price_per_sqm_sorted[-1].item()
+            avg_price_per_sqm = math.fsum(price_per_sqm_sorted.tolist()) / price_per_sqm_sorted.size
+        else:
+            min_price_per_sqm = max_price_per_sqm = avg_price_per_sqm = 0
+
+        groups_list.append({
+            'source': object_name,
+            'is_main': is_main,  # Флаг для основных ЖК
+            'тип_площади': area_type,
+            'количество': int(idx.size),
+            'общая_площадь': total_area,
+            'мин_стоимость': costs_sorted[0].item(),  # Минимальная стоимость
+            'мин_площадь': areas_sorted[0].item(),  # Минимальная площадь
+            'макс_стоимость': costs_sorted[-1].item(),  # Максимальная стоимость
+            'макс_площадь': areas_sorted[-1].item(),  # Максимальная площадь
+            'сред_стоимость': None,  # Средняя стоимость (из статистики)
+            'сред_площадь': math.fsum(areas_sorted.tolist()) / areas_sorted.size,  # Средняя площадь
+            'мин_цена_за_м2': min_price_per_sqm,
+            'сред_цена_за_м2': avg_price_per_sqm,
+            'макс_цена_за_м2': max_price_per_sqm,
+            'costs': costs_sorted,  # Используем отсортированные стоимости
+            'areas': areas_sorted.tolist(),  # Используем отсортированные площади
+            'price_per_sqm': price_per_sqm_sorted.tolist(),  # Цены за м² для графиков
+            'stats': None
+        })
+
+def attach_group_statistics(groups_list):
+    """Считает статистику стоимости для всех групп одним пакетным проходом"""
+    if not groups_list:
+        return
+    sizes = [len(group['costs']) for group in groups_list]
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    batch = batch_statistics(np.concatenate([group['costs'] for group in groups_list]), offsets)
+    for k, group in enumerate(groups_list):
+        group['stats'] = batch.group(k)
+        group['сред_стоимость'] = group['stats']['mean']
+        group['costs'] = group['costs'].tolist()
+
+def read_uploads(files):
+    """Хэширует загруженные файлы: список (имя файла, поток байтов, SHA-256 содержимого).
+
+    Файл читается кусками и целиком в памяти не держится (большие загрузки
+    werkzeug хранит во временном файле на диске); поток перематывается в
+    начало для последующего разбора.
+    """
+    uploads = []
+    for uploaded_file in files:
+        uploads.append((uploaded_file.filename, uploaded_file.stream, stream_digest(uploaded_file.stream)))
+    return uploads
+
+def load_object(object_name, parts, is_main):
+    """Группы и характеристики одного ЖК с учётом кэша.
+
+    parts — список (хэш файла, подтаблица ЖК из этого файла) в порядке загрузки.
+    Результат кэшируется по названию ЖК и хэшам только тех файлов, где он
+    встречается: если изменился другой файл стороны, ЖК не пересчитывается.
+    Возвращает (группы со статистикой, пропущенные группы, характеристики).
+    """
+    object_key = ('object', is_main, object_name, tuple(digest for digest, _ in parts))
+    cached = upload_cache.get(object_key)
+    if cached is not None:
+        return cached
+
+    table = ApartmentTable.concat([object_table for _, object_table in parts])
+    groups = []
+    groups_diagnostics = Diagnostics(GROUP_ISSUES)
+    build_object_groups(object_name, table, is_main, groups, groups_diagnostics)
+    attach_group_statistics(groups)
+    result = (groups, groups_diagnostics, object_characteristics(table))
+    upload_cache.put(object_key, result)
+    return result
+
+def load_side(uploads, is_main):
+    """Загружает файлы одной стороны (основной ЖК или конкуренты) с учётом кэша.
+
+    Возвращает (objects_data, groups, diagnostics): словарь название объекта ->
+    характеристики (object_characteristics), группы объектов со статистикой
+    (без 'id') и сводку проблем загрузки ({'files': [...по файлам...],
+    'groups': {...пропущенные группы...}}). Разобранные таблицы кэшируются
+    по хэшу каждого файла, группы и характеристики — по ЖК (load_object),
+    результат стороны — по хэшам всех её файлов. Бросает ValueError при
+    ошибках валидации полей.
+    """
+    side_key = ('side', is_main, tuple(digest for _, _, digest in uploads))
+    cached = upload_cache.get(side_key)
+    if cached is not None:
+        return cached
+
+    object_parts = {}  # название объекта -> [(хэш файла, подтаблица)], объекты в порядке появления
+    files_diagnostics = []
+    for filename, stream, digest in uploads:
+        cached_table = upload_cache.get(('table', digest))
+        if cached_table is None:
+            stats = IngestStats(filename)
+            table = load_table_from_stream(stream, filename, stats)
+            cached_table = (table, stats.to_dict())
+            upload_cache.put(('table', digest), cached_table, table.nbytes)
+        table, file_diagnostics = cached_table
+        for object_name, object_table in table.map_object_names(normalize_object_name).split_by_object().items():
+            object_parts.setdefault(object_name, []).append((digest, object_table))
+        # Тот же файл мог быть загружен под другим именем
+        files_diagnostics.append({**file_diagnostics, 'filename': filename})
+
+    objects_data = {}
+    groups = []
+    groups_diagnostics = Diagnostics(GROUP_ISSUES)
+    for object_name, parts in object_parts.items():
+        object_groups, object_diagnostics, characteristics = load_object(object_name, parts, is_main)
+        objects_data[object_name] = characteristics
+        groups.extend(object_groups)
+        groups_diagnostics.merge(object_diagnostics)
+    report_diagnostics(f"Предупреждение: пропущено групп: {groups_diagnostics.total}", groups_diagnostics)
+
+    diagnostics = {'files': files_diagnostics, 'groups': groups_diagnostics.to_dict()}
+    upload_cache.put(side_key, (objects_data, groups, diagnostics))
+    return objects_data, groups, diagnostics
+
 def create_groups_impl():
     """Реализация создания групп (используется обоими маршрутами)"""
     try:
@@ -630,165 +441,41 @@ def create_groups_impl():
         if not main_files or len(main_files) == 0:
             return jsonify({'error': 'Не загружен файл основного ЖК'}), 400
         
-        # Загружаем все файлы основного ЖК и группируем по объектам
-        main_objects_data = defaultdict(list)  # название объекта -> квартиры
+        main_uploads = read_uploads(main_files)
+        competitor_uploads = read_uploads(competitor_files)
         
-        for main_file in main_files:
-            try:
-                main_content = main_file.read().decode('utf-8-sig')
-                main_apartments = load_csv_from_string(main_content, main_file.filename)
-                # Группируем квартиры по нормализованному названию объекта
-                for apt in main_apartments:
-                    original_name = apt.get('Название объекта', 'Неизвестный объект')
-                    object_name = normalize_object_name(original_name)
-                    main_objects_data[object_name].append(apt)
-            except ValueError as e:
-                # Ошибки валидации полей
-                return jsonify({'error': str(e)}), 400
+        # Те же файлы уже обрабатывались — отдаём готовый результат без разбора и агрегации
+        response_key = ('response',
+                        tuple(digest for _, _, digest in main_uploads),
+                        tuple(digest for _, _, digest in competitor_uploads))
+        # Идентификатор результата тоже адресуется содержимым: те же файлы — тот же result_id
+        result_id = file_digest(repr(response_key).encode('utf-8'))[:32]
+        cached_response = upload_cache.get(response_key)
+        if cached_response is not None:
+            group_sessions.put(result_id, cached_response['groups'])
+            return jsonify(cached_response)
+        
+        # Загружаем все файлы основного ЖК и группируем по объектам
+        try:
+            main_objects_data, main_groups, main_diagnostics = load_side(main_uploads, True)  # название объекта -> характеристики
+        except ValueError as e:
+            # Ошибки валидации полей
+            return jsonify({'error': str(e)}), 400
         
         if not main_objects_data:
             return jsonify({'error': 'Не удалось загрузить данные из файлов основного ЖК. Проверьте формат файлов.'}), 400
         
         # Загружаем конкурентов и группируем по объектам
-        competitor_objects_data = defaultdict(list)  # название объекта -> квартиры
-        
-        for comp_file in competitor_files:
-            try:
-                comp_content = comp_file.read().decode('utf-8-sig')
-                comp_apartments = load_csv_from_string(comp_content, comp_file.filename)
-                # Группируем квартиры по нормализованному названию объекта
-                for apt in comp_apartments:
-                    original_name = apt.get('Название объекта', 'Неизвестный объект')
-                    object_name = normalize_object_name(original_name)
-                    competitor_objects_data[object_name].append(apt)
-            except ValueError as e:
-                # Ошибки валидации полей
-                return jsonify({'error': str(e)}), 400
+        try:
+            competitor_objects_data, competitor_groups, competitor_diagnostics = load_side(competitor_uploads, False)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Формируем список групп для вывода
+        # Формируем список групп для вывода: сначала основной ЖК, затем конкуренты
         groups_list = []
-        
-        # Группы основного ЖК (группировка по объектам и типу площади)
-        for object_name, apartments in main_objects_data.items():
-            object_groups, _ = group_apartments(apartments, object_name)
-            
-            for area_type, apts in object_groups.items():
-                # Извлекаем стоимости и площади
-                costs = [apt['Стоимость'] for apt in apts]
-                areas = [apt['Площадь общая'] for apt in apts]
-                
-                # Проверяем, что стоимости валидны (не None и > 0)
-                costs = [c for c in costs if c is not None and c > 0]
-                areas = [a for a in areas if a is not None and a > 0]
-                
-                if not costs or not areas:
-                    print(f"Предупреждение: группа {area_type} для {object_name} не содержит валидных данных, пропускаем")
-                    continue
-                
-                # Сортируем для правильного расчета медианы
-                costs_sorted = sorted(costs)
-                areas_sorted = sorted(areas)
-                
-                total_area = sum(areas)  # Суммарная площадь группы
-                min_cost = min(costs_sorted) if costs_sorted else 0  # Минимальная стоимость
-                min_area = min(areas_sorted) if areas_sorted else 0  # Минимальная площадь
-                max_cost = max(costs_sorted) if costs_sorted else 0  # Максимальная стоимость
-                max_area = max(areas_sorted) if areas_sorted else 0  # Максимальная площадь
-                avg_cost = statistics.mean(costs_sorted) if costs_sorted else 0  # Средняя стоимость
-                avg_area = statistics.mean(areas_sorted) if areas_sorted else 0  # Средняя площадь
-                stats = calculate_statistics(costs_sorted)
-                
-                # Рассчитываем цены за квадратный метр
-                price_per_sqm = [cost / area if area > 0 else 0 for cost, area in zip(costs_sorted, areas_sorted)]
-                price_per_sqm = [p for p in price_per_sqm if p > 0]  # Убираем нулевые значения
-                price_per_sqm_sorted = sorted(price_per_sqm) if price_per_sqm else []
-                
-                min_price_per_sqm = min(price_per_sqm_sorted) if price_per_sqm_sorted else 0
-                max_price_per_sqm = max(price_per_sqm_sorted) if price_per_sqm_sorted else 0
-                avg_price_per_sqm = statistics.mean(price_per_sqm_sorted) if price_per_sqm_sorted else 0
-                
-                groups_list.append({
-                    'id': f"main_{len(groups_list)}",
-                    'source': object_name,
-                    'is_main': True,  # Флаг для основных ЖК
-                    'тип_площади': area_type,
-                    'количество': len(apts),
-                    'общая_площадь': total_area,
-                    'мин_стоимость': min_cost,
-                    'мин_площадь': min_area,
-                    'макс_стоимость': max_cost,
-                    'макс_площадь': max_area,
-                    'сред_стоимость': avg_cost,
-                    'сред_площадь': avg_area,
-                    'мин_цена_за_м2': min_price_per_sqm,
-                    'сред_цена_за_м2': avg_price_per_sqm,
-                    'макс_цена_за_м2': max_price_per_sqm,
-                    'costs': costs_sorted,  # Используем отсортированные стоимости
-                    'areas': areas_sorted,  # Используем отсортированные площади
-                    'price_per_sqm': price_per_sqm_sorted,  # Цены за м² для графиков
-                    'stats': stats
-                })
-        
-        # Группы конкурентов (группировка по объектам и типу площади)
-        for object_name, apartments in competitor_objects_data.items():
-            object_groups, _ = group_apartments(apartments, object_name)
-            
-            for area_type, apts in object_groups.items():
-                # Извлекаем стоимости и площади
-                costs = [apt['Стоимость'] for apt in apts]
-                areas = [apt['Площадь общая'] for apt in apts]
-                
-                # Проверяем, что стоимости валидны (не None и > 0)
-                costs = [c for c in costs if c is not None and c > 0]
-                areas = [a for a in areas if a is not None and a > 0]
-                
-                if not costs or not areas:
-                    print(f"Предупреждение: группа {area_type} для {object_name} не содержит валидных данных, пропускаем")
-                    continue
-                
-                # Сортируем для правильного расчета медианы
-                costs_sorted = sorted(costs)
-                areas_sorted = sorted(areas)
-                
-                total_area = sum(areas)  # Суммарная площадь группы
-                min_cost = min(costs_sorted) if costs_sorted else 0  # Минимальная стоимость
-                min_area = min(areas_sorted) if areas_sorted else 0  # Минимальная площадь
-                max_cost = max(costs_sorted) if costs_sorted else 0  # Максимальная стоимость
-                max_area = max(areas_sorted) if areas_sorted else 0  # Максимальная площадь
-                avg_cost = statistics.mean(costs_sorted) if costs_sorted else 0  # Средняя стоимость
-                avg_area = statistics.mean(areas_sorted) if areas_sorted else 0  # Средняя площадь
-                stats = calculate_statistics(costs_sorted)
-                
-                # Рассчитываем цены за квадратный метр
-                price_per_sqm = [cost / area if area > 0 else 0 for cost, area in zip(costs_sorted, areas_sorted)]
-                price_per_sqm = [p for p in price_per_sqm if p > 0]  # Убираем нулевые значения
-                price_per_sqm_sorted = sorted(price_per_sqm) if price_per_sqm else []
-                
-                min_price_per_sqm = min(price_per_sqm_sorted) if price_per_sqm_sorted else 0
-                max_price_per_sqm = max(price_per_sqm_sorted) if price_per_sqm_sorted else 0
-                avg_price_per_sqm = statistics.mean(price_per_sqm_sorted) if price_per_sqm_sorted else 0
-                
-                groups_list.append({
-                    'id': f"comp_{len(groups_list)}",
-                    'source': object_name,
-                    'is_main': False,  # Флаг для конкурентов
-                    'тип_площади': area_type,
-                    'количество': len(apts),
-                    'общая_площадь': total_area,
-                    'мин_стоимость': min_cost,
-                    'мин_площадь': min_area,
-                    'макс_стоимость': max_cost,
-                    'макс_площадь': max_area,
-                    'сред_стоимость': avg_cost,
-                    'сред_площадь': avg_area,
-                    'мин_цена_за_м2': min_price_per_sqm,
-                    'сред_цена_за_м2': avg_price_per_sqm,
-                    'макс_цена_за_м2': max_price_per_sqm,
-                    'costs': costs_sorted,  # Используем отсортированные стоимости
-                    'areas': areas_sorted,  # Используем отсортированные площади
-                    'price_per_sqm': price_per_sqm_sorted,  # Цены за м² для графиков
-                    'stats': stats
-                })
+        for group in main_groups + competitor_groups:
+            id_prefix = 'main' if group['is_main'] else 'comp'
+            groups_list.append({'id': f"{id_prefix}_{len(groups_list)}", **group})
         
         # Создаем графики/боксплоты для всех ЖК
         boxplot_img = create_all_boxplots(groups_list) if (PLOTLY_AVAILABLE or MATPLOTLIB_AVAILABLE) else None
@@ -796,39 +483,131 @@ def create_groups_impl():
         # Характеристики ЖК (собираем по всем объектам, основной и конкуренты)
         characteristics = build_characteristics(main_objects_data, competitor_objects_data)
         
-        return jsonify({
+        result = {
+            'result_id': result_id,
             'groups': groups_list,
             'boxplot': boxplot_img,
-            'characteristics': characteristics
-        })
+            'characteristics': characteristics,
+            # Сводка пропущенных строк и групп по каждому файлу и стороне
+            'diagnostics': {'main': main_diagnostics, 'competitors': competitor_diagnostics}
+        }
+        upload_cache.put(response_key, result)
+        # Группы остаются на сервере: compare_groups получает только result_id и id групп
+        group_sessions.put(result_id, groups_list)
+        return jsonify(result)
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/cache_stats')
+def cache_stats():
+    """Счётчики кэшей: загруженные файлы, отрисованные графики и типы площади (попадания, промахи, объём)"""
+    stats = upload_cache.stats()
+    stats['figures'] = figure_cache.stats()
+    stats['area_types'] = normalize_area_type.stats()
+    return jsonify(stats)
+
 @akvilon_bp.route('/api/compare_groups', methods=['POST'])
 def akvilon_compare_groups():
     """Сравнивает сопоставимые группы (Аквилон)"""
     return compare_groups_impl()
 
+def find_comparable_pairs(groups, main_vs_competitor=False):
+    """Находит пары сопоставимых групп: одинаковый тип площади, разные источники.
+
+    Группы раскладываются по корзинам типа площади, пары строятся только внутри
+    корзины. Порядок пар — как при переборе всех пар (i, j), i < j.
+    При main_vs_competitor=True остаются только пары основной ЖК — конкурент.
+    """
+    buckets = {}
+    for index, group in enumerate(groups):
+        buckets.setdefault(group['тип_площади'], []).append(index)
+
+    pair_indices = []
+    for indices in buckets.values():
+        for pos, i in enumerate(indices):
+            group1 = groups[i]
+            for j in indices[pos + 1:]:
+                group2 = groups[j]
+                if group1['source'] == group2['source']:
+                    continue
+                if main_vs_competitor and group1.get('is_main', False) == group2.get('is_main', False):
+                    continue
+                pair_indices.append((i, j))
+    pair_indices.sort()
+
+    return [{'group1': groups[i], 'group2': groups[j]} for i, j in pair_indices]
+
+def make_pair_id(group1, group2):
+    """Идентификатор пары групп для ссылок на графики: '<id1>--<id2>'"""
+    if group1.get('id') is None or group2.get('id') is None:
+        return None
+    return f"{group1['id']}--{group2['id']}"
+
+def chart_url(result_id, group1, group2, kind):
+    """Ссылка на график пары (с учетом префикса Blueprint текущего запроса)"""
+    pair_id = make_pair_id(group1, group2)
+    if pair_id is None or not MATPLOTLIB_AVAILABLE:
+        return None
+    endpoint = f'{request.blueprint}.chart' if request.blueprint else 'chart'
+    return url_for(endpoint, result_id=result_id, pair_id=pair_id, kind=kind)
+
+def chart_impl(result_id, pair_id, kind):
+    """Рендерит график пары групп по запросу (PNG с ETag и Cache-Control)"""
+    if kind not in CHART_KINDS:
+        return jsonify({'error': f'Неизвестный вид графика: {kind}'}), 404
+    if not MATPLOTLIB_AVAILABLE:
+        return jsonify({'error': 'Построение графиков недоступно'}), 503
+
+    # result_id адресуется содержимым, поэтому график для него неизменен
+    etag = file_digest(f'{result_id}/{pair_id}/{kind}'.encode('utf-8'))[:32]
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        group_ids = pair_id.split('--')
+        groups = group_sessions.select(result_id, group_ids) if len(group_ids) == 2 else None
+        if groups is None:
+            return jsonify({'error': 'Результат группировки не найден или устарел. Создайте группы заново.'}), 404
+        groups_by_id = {group['id']: group for group in groups}
+        if group_ids[0] not in groups_by_id or group_ids[1] not in groups_by_id:
+            return jsonify({'error': 'Группы пары не найдены'}), 404
+        png = render_png(kind, groups_by_id[group_ids[0]], groups_by_id[group_ids[1]])
+        response = app.response_class(png, mimetype='image/png')
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = CHART_MAX_AGE
+    return response
+
+@app.route('/api/chart/<result_id>/<pair_id>/<kind>')
+def chart(result_id, pair_id, kind):
+    """График сравнения пары групп (boxplot или histogram)"""
+    return chart_impl(result_id, pair_id, kind)
+
+@akvilon_bp.route('/api/chart/<result_id>/<pair_id>/<kind>', endpoint='chart')
+def akvilon_chart(result_id, pair_id, kind):
+    """График сравнения пары групп (Аквилон)"""
+    return chart_impl(result_id, pair_id, kind)
+
 def compare_groups_impl():
     """Реализация сравнения групп (используется обоими маршрутами)"""
     try:
-        data = request.json
-        groups = data.get('groups', [])
-        
-        # Находим сопоставимые группы (одинаковый тип площади, разные источники)
-        comparable_pairs = []
+        data = request.json or {}
+        result_id = data.get('result_id')
+        if result_id:
+            # Группы берём из результата create_groups, сохранённого на сервере
+            groups = group_sessions.select(result_id, data.get('group_ids'))
+            if groups is None:
+                return jsonify({'error': 'Результат группировки не найден или устарел. Создайте группы заново.'}), 404
+        else:
+            # Совместимость: группы целиком в теле запроса. Сохраняем их на сервере,
+            # чтобы графики можно было запрашивать по ссылкам
+            groups = data.get('groups', [])
+            result_id = file_digest(json.dumps(groups, sort_keys=True, ensure_ascii=False).encode('utf-8'))[:32]
+            group_sessions.put(result_id, groups)
         
-        for i, group1 in enumerate(groups):
-            for j, group2 in enumerate(groups[i+1:], start=i+1):
-                # Проверяем, что тип площади одинаковый, но источники разные
-                if (group1['тип_площади'] == group2['тип_площади'] and
-                    group1['source'] != group2['source']):
-                    
-                    comparable_pairs.append({
-                        'group1': group1,
-                        'group2': group2
-                    })
+        # Находим сопоставимые группы (одинаковый тип площади, разные источники).
+        # main_vs_competitor=true — только пары «основной ЖК — конкурент»
+        comparable_pairs = find_comparable_pairs(groups, bool(data.get('main_vs_competitor', False)))
         
         if not comparable_pairs:
             return jsonify({'error': 'Не найдено сопоставимых групп'}), 400
@@ -840,15 +619,12 @@ def compare_groups_impl():
             g1 = pair['group1']
             g2 = pair['group2']
             
-            # Определяем, какая группа - основной ЖК ("Мой ЖК")
-            if g1['source'] == 'Мой ЖК':
-                main_group = g1
-                competitor_group = g2
-            elif g2['source'] == 'Мой ЖК':
+            # Определяем, какая группа - основной ЖК (по флагу is_main)
+            if g2.get('is_main', False) and not g1.get('is_main', False):
                 main_group = g2
                 competitor_group = g1
             else:
-                # Если нет группы "Мой ЖК", используем первую как основную
+                # Основной ЖК первый, либо обе группы одной стороны — первая считается основной
                 main_group = g1
                 competitor_group = g2
             
@@ -868,12 +644,6 @@ def compare_groups_impl():
                 'max': calculate_percentage_diff(stats1['max'], stats2['max'])
             }
             
-            # Boxplot
-            boxplot_img = create_boxplot(g1, g2) if MATPLOTLIB_AVAILABLE else None
-            
-            # Histogram
-            histogram_img = create_histogram(g1, g2) if MATPLOTLIB_AVAILABLE else None
-            
             comparisons.append({
                 'group1': {
                     'source': g1['source'],
@@ -888,10 +658,23 @@ def compare_groups_impl():
                 },
                 'percentage_diffs': percentage_diffs,
                 'main_source': main_group['source'],
-                'boxplot': boxplot_img,
-                'histogram': histogram_img
+                'pair_id': make_pair_id(g1, g2),
+                'boxplot_url': chart_url(result_id, g1, g2, 'boxplot'),
+                'histogram_url': chart_url(result_id, g1, g2, 'histogram')
             })
         
+        # Графики по умолчанию не встраиваются: браузер запрашивает их по ссылкам.
+        # inline_images=true — boxplot и гистограмма base64 для каждой пары (в пуле процессов)
+        if MATPLOTLIB_AVAILABLE and data.get('inline_images'):
+            tasks = []
+            for pair in comparable_pairs:
+                tasks.append(('boxplot', pair['group1'], pair['group2']))
+                tasks.append(('histogram', pair['group1'], pair['group2']))
+            images = chart_pool.render(tasks)
+            for k, comparison in enumerate(comparisons):
+                comparison['boxplot'] = images[2 * k]
+                comparison['histogram'] = images[2 * k + 1]
+        
         return jsonify({'comparisons': comparisons})
     
     except Exception as e:
@@ -908,6 +691,9 @@ def compare_groups():
     """Сравнивает сопоставимые группы"""
     return compare_groups_impl()
 
+# Версия оформления графиков Plotly (входит в отпечаток кэша графиков)
+PLOTLY_FIGURE_VERSION = 1
+
 def create_all_boxplots(groups):
     """Создает интерактивные графики (Plotly) для каждого типа площадей.
 
@@ -972,7 +758,8 @@ def create_all_boxplots(groups):
         key=lambda x: (not x[1]['is_main'], x[0])
     )
 
-    boxplots = {}
+    # Данные графиков по типам площади: (тип, подписи, цены за м² по ЖК, цвета, количества)
+    prepared = []
 
     for area_type in sorted_area_types:
         groups_for_type = area_type_map[area_type]
@@ -1033,200 +820,99 @@ def create_all_boxplots(groups):
             # Для этого типа нет валидных данных — пропускаем
             continue
 
-        # Цвета осей (сохраняем прежнюю логику)
-        left_color = '#42A5F5'   # цена за м² — голубой
-        right_color = '#FB8C00'  # количество — оранжевый
-
-        x_positions = list(range(1, len(labels) + 1))
-
-        fig = go.Figure()
+        prepared.append((area_type, labels, price_data, colors, counts))
 
-        for x, name, values, color, count in zip(x_positions, labels, price_data, colors, counts):
-            stats_vals = calculate_statistics(values)
-            if not stats_vals:
-                continue
+    if not prepared:
+        return None
 
-            q1 = stats_vals['q1']
-            q3 = stats_vals['q3']
-            mean_val = stats_vals['mean']
-            outliers = stats_vals.get('outliers', [])
+    # Графики, уже построенные для тех же данных, берём из кэша (порядок типов сохраняется)
+    boxplots = {item[0]: None for item in prepared}
+    to_build = []
+    for area_type, labels, price_data, colors, counts in prepared:
+        key = fingerprint(
+            'plotly_area_type', price_data + [counts],
+            {'version': PLOTLY_FIGURE_VERSION, 'area_type': area_type, 'labels': labels, 'colors': colors}
+        )
+        cached = figure_cache.get(key)
+        if cached is not None:
+            boxplots[area_type] = json.loads(cached)
+        else:
+            to_build.append((key, (area_type, labels, price_data, colors, counts)))
 
-            height = max(q3 - q1, 0)
+    # Статистика всех полос строящихся графиков — одним пакетным проходом
+    batch = batch_statistics(*pack_groups([values for _, item in to_build for values in item[2]]))
+    batch_index = 0
 
-            # Цвет обводки — немного темнее заливки
-            if color == '#A5D6A7':
-                edge_color = '#66BB6A'
-            elif color == '#90CAF9':
-                edge_color = '#42A5F5'
-            else:
-                edge_color = '#546E7A'
-
-            # Прямоугольник [Q1, Q3] как столбец
-            fig.add_trace(go.Bar(
-                x=[x],
-                y=[height],
-                base=[q1],
-                width=0.4,
-                marker=dict(
-                    color=color,
-                    line=dict(color=edge_color, width=1.4)
-                ),
-                customdata=[[stats_vals['min'], mean_val, stats_vals['max'], name]],
-                hovertemplate=(
-                    "%{customdata[3]}<br>"
-                    "Мин: %{customdata[0]:,.0f} руб.<br>"
-                    "Сред: %{customdata[1]:,.0f} руб.<br>"
-                    "Макс: %{customdata[2]:,.0f} руб.<extra></extra>"
-                ),
-                showlegend=False
-            ))
-
-            # Линия среднего значения
-            fig.add_trace(go.Scatter(
-                x=[x - 0.2, x + 0.2],
-                y=[mean_val, mean_val],
-                mode='lines',
-                line=dict(color=edge_color, width=1.6),
-                hoverinfo='skip',
-                showlegend=False
-            ))
-
-            # Выбросы убраны по запросу пользователя
-
-            # Точка количества квартир (правая ось)
-            if count > 0:
-                fig.add_trace(go.Scatter(
-                    x=[x],
-                    y=[count],
-                    mode='markers',
-                    marker=dict(
-                        color=right_color,
-                        size=9
-                    ),
-                    hovertemplate=(
-                        f"{name}<br>"
-                        "Количество квартир: %{y}<extra></extra>"
-                    ),
-                    yaxis='y2',
-                    showlegend=False
-                ))
-
-        # Определяем разумный диапазон для оси количества, чтобы точки целиком попадали в область графика
-        max_count = max([c for c in counts if c > 0], default=1)
-        # Чуть опускаем нижнюю границу ниже нуля, чтобы маркеры не "обрезались" по низу
-        y2_min = -max(1, max_count * 0.1)
-        y2_max = max_count * 1.1
-        y2_range = [y2_min, y2_max]
-
-        fig.update_layout(
-            xaxis=dict(
-                tickmode='array',
-                tickvals=x_positions,
-                ticktext=labels,
-                tickangle=-90,
-                tickfont=dict(size=10)
-            ),
-            yaxis=dict(
-                title=dict(
-                    text='Цена за м², руб.',
-                    font=dict(color=left_color)
-                ),
-                tickfont=dict(color=left_color),
-                tickformat=',.0f',
-                gridcolor='rgba(0,0,0,0.1)'
-            ),
-            yaxis2=dict(
-                title=dict(
-                    text='Количество квартир',
-                    font=dict(color=right_color)
-                ),
-                tickfont=dict(color=right_color),
-                dtick=20,
-                range=y2_range,
-                overlaying='y',
-                side='right'
-            ),
-            bargap=0.3,
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            margin=dict(l=60, r=60, t=20, b=120),
-            height=500,
-            showlegend=False,
-            hovermode='closest'
-        )
+    for key, (area_type, labels, price_data, colors, counts) in to_build:
+        # Следы и layout собираются сразу словарями (без валидации go.Figure)
+        data, layout = area_type_figure(labels, colors, counts, batch, batch_index)
+        batch_index += len(labels)
 
         boxplots[area_type] = {
-            'data': fig.to_dict()['data'],
-            'layout': fig.to_dict()['layout'],
+            'data': data,
+            'layout': layout,
             'div_id': f'boxplot_{area_type}',
             'title': f'Цены за м², {area_type}'
         }
+        figure_cache.put(key, json.dumps(boxplots[area_type], ensure_ascii=False).encode('utf-8'))
 
     return boxplots if boxplots else None
 
 
+CHARACTERISTIC_FIELDS = ['Застройщик', 'Район', 'Класс', 'Срок сдачи', 'Тип дома', 'Отделка']
+
+def object_characteristics(table):
+    """Значения характеристик одного ЖК (ApartmentTable): поле -> множество значений,
+    'Этажность' — числовая этажность, 'Этажность_сырье' — исходные значения.
+
+    Значения берём из категорий таблицы: каждое уникальное значение
+    обрабатывается один раз.
+    """
+    obj = {field: set() for field in CHARACTERISTIC_FIELDS}
+    obj['Этажность'] = []
+    obj['Этажность_сырье'] = set()
+    for field in CHARACTERISTIC_FIELDS:
+        for val in table.unique_values(field):
+            if val:
+                obj[field].add(str(val).strip())
+    # Этажность обрабатываем отдельно
+    for floors_raw in table.unique_values('Этажность'):
+        if not floors_raw:
+            continue
+        s = str(floors_raw).strip()
+        obj['Этажность_сырье'].add(s)
+        try:
+            # Пробуем разобрать как число
+            n = int(float(s.replace(',', '.')))
+            obj['Этажность'].append(n)
+        except ValueError:
+            pass
+    return obj
+
 def build_characteristics(main_objects_data, competitor_objects_data):
     """Строит сводную таблицу характеристик по каждому ЖК.
 
-    Для этажности выводим диапазон (мин–макс), для остальных параметров —
-    все уникальные значения через запятую.
+    main_objects_data / competitor_objects_data — словари: название ЖК ->
+    характеристики (object_characteristics). Для этажности выводим диапазон
+    (мин–макс), для остальных параметров — все уникальные значения через запятую.
     """
     characteristics_map = {}
 
-    def ensure_obj(name, is_main):
-        if name not in characteristics_map:
-            characteristics_map[name] = {
-                'name': name,
-                'is_main': is_main,
-                'Застройщик': set(),
-                'Район': set(),
-                'Класс': set(),
-                'Этажность': [],
-                'Этажность_сырье': set(),
-                'Срок сдачи': set(),
-                'Тип дома': set(),
-                'Отделка': set()
-            }
-
-    # Основные ЖК
-    for object_name, apartments in main_objects_data.items():
-        ensure_obj(object_name, True)
-        obj = characteristics_map[object_name]
-        for apt in apartments:
-            for field in ['Застройщик', 'Район', 'Класс', 'Срок сдачи', 'Тип дома', 'Отделка']:
-                val = apt.get(field)
-                if val:
-                    obj[field].add(str(val).strip())
-            # Этажность обрабатываем отдельно
-            floors_raw = apt.get('Этажность')
-            if floors_raw:
-                s = str(floors_raw).strip()
-                obj['Этажность_сырье'].add(s)
-                try:
-                    # Пробуем разобрать как число
-                    n = int(float(s.replace(',', '.')))
-                    obj['Этажность'].append(n)
-                except ValueError:
-                    pass
-
-    # Конкуренты
-    for object_name, apartments in competitor_objects_data.items():
-        ensure_obj(object_name, False)
-        obj = characteristics_map[object_name]
-        for apt in apartments:
-            for field in ['Застройщик', 'Район', 'Класс', 'Срок сдачи', 'Тип дома', 'Отделка']:
-                val = apt.get(field)
-                if val:
-                    obj[field].add(str(val).strip())
-            floors_raw = apt.get('Этажность')
-            if floors_raw:
-                s = str(floors_raw).strip()
-                obj['Этажность_сырье'].add(s)
-                try:
-                    n = int(float(s.replace(',', '.')))
-                    obj['Этажность'].append(n)
-                except ValueError:
-                    pass
+    # Основные ЖК, затем конкуренты; ЖК с обеих сторон объединяются
+    for objects_data, is_main in ((main_objects_data, True), (competitor_objects_data, False)):
+        for object_name, object_values in objects_data.items():
+            if object_name not in characteristics_map:
+                characteristics_map[object_name] = {
+                    'name': object_name,
+                    'is_main': is_main,
+                    **{field: set() for field in CHARACTERISTIC_FIELDS},
+                    'Этажность': [],
+                    'Этажность_сырье': set()
+                }
+            obj = characteristics_map[object_name]
+            for field in CHARACTERISTIC_FIELDS + ['Этажность_сырье']:
+                obj[field].update(object_values[field])
+            obj['Этажность'].extend(object_values['Этажность'])
 
     result = []
     for name, obj in characteristics_map.items():
@@ -1235,7 +921,7 @@ def build_characteristics(main_objects_data, competitor_objects_data):
             'Название ЖК': name,
             'is_main': obj['is_main']
         }
-        for field in ['Застройщик', 'Район', 'Класс', 'Срок сдачи', 'Тип дома', 'Отделка']:
+        for field in CHARACTERISTIC_FIELDS:
             values = sorted(v for v in obj[field] if v)
             row[field] = ', '.join(values) if values else ''
 
@@ -1267,83 +953,6 @@ def build_characteristics(main_objects_data, competitor_objects_data):
     result.sort(key=lambda r: (not r.get('is_main', False), r.get('Название ЖК', '')))
     return result
 
-def create_boxplot(group1, group2):
-    """Создает boxplot для двух групп"""
-    fig, ax = plt.subplots(figsize=(12, 8))
-    
-    data1 = group1['costs']
-    data2 = group2['costs']
-    
-    positions = [1, 2]
-    data = [data1, data2]
-    
-    bp = ax.boxplot(data, positions=positions, widths=0.6, vert=True, patch_artist=True,
-                    showmeans=True, meanline=True,
-                    boxprops=dict(facecolor='lightblue', alpha=0.7),
-                    medianprops=dict(color='red', linewidth=2),
-                    meanprops=dict(color='green', linewidth=2, linestyle='--'),
-                    whiskerprops=dict(color='black', linewidth=1.5),
-                    capprops=dict(color='black', linewidth=1.5))
-    
-    colors = ['lightblue', 'lightcoral']
-    for patch, color in zip(bp['boxes'], colors):
-        patch.set_facecolor(color)
-        patch.set_alpha(0.7)
-    
-    # Выбросы убраны по запросу пользователя
-    
-    ax.set_ylabel('Стоимость, руб.', fontsize=12, fontweight='bold')
-    ax.set_xticks(positions)
-    ax.set_xticklabels([group1['source'], group2['source']], fontsize=11, fontweight='bold')
-    ax.set_title('Сравнение стоимости',
-                fontsize=12, fontweight='bold', pad=15)
-    
-    ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x:,.0f}'))
-    ax.grid(True, alpha=0.3, axis='y')
-    
-    return plot_to_base64(fig)
-
-def create_histogram(group1, group2):
-    """Создает наложенные гистограммы для двух групп"""
-    fig, ax = plt.subplots(figsize=(14, 8))
-    
-    data1 = group1['costs']
-    data2 = group2['costs']
-    
-    # Вычисляем общий диапазон для обеих групп
-    all_data = data1 + data2
-    min_val = min(all_data)
-    max_val = max(all_data)
-    
-    # Создаем одинаковые границы бинов для обеих групп
-    num_bins = 15
-    bin_edges = np.linspace(min_val, max_val, num_bins + 1)
-    
-    ax.hist(data1, bins=bin_edges, alpha=0.6, label=group1['source'], 
-           color='steelblue', edgecolor='black', linewidth=0.5)
-    ax.hist(data2, bins=bin_edges, alpha=0.6, label=group2['source'],
-           color='coral', edgecolor='black', linewidth=0.5)
-    
-    # Средние и медианы
-    stats1 = group1['stats']
-    stats2 = group2['stats']
-    
-    ax.axvline(stats1['mean'], color='blue', linestyle='--', linewidth=2)
-    ax.axvline(stats2['mean'], color='red', linestyle='--', linewidth=2)
-    ax.axvline(stats1['median'], color='darkblue', linestyle='-', linewidth=2)
-    ax.axvline(stats2['median'], color='darkred', linestyle='-', linewidth=2)
-    
-    ax.set_xlabel('Стоимость, руб.', fontsize=12, fontweight='bold')
-    ax.set_ylabel('Количество квартир', fontsize=12, fontweight='bold')
-    ax.set_title('Распределение стоимости',
-                fontsize=12, fontweight='bold', pad=15)
-    
-    ax.xaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x/1e6:.1f}М'))
-    ax.grid(True, alpha=0.3, axis='y')
-    ax.legend(loc='upper right', fontsize=10)
-    
-    return plot_to_base64(fig)
-
 # Регистрируем Blueprint для Аквилона
 app.register_blueprint(akvilon_bp)
 
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Классификатор типа площади («Тип площади» из прайс-листа -> единый формат).
+
+Правила собраны в таблицу AREA_TYPE_RULES и проверяются строго по порядку:
+первое сработавшее правило определяет тип. Регулярные выражения
+компилируются один раз при импорте.
+
+Различных исходных строк в прайс-листах — несколько десятков, а строк —
+десятки тысяч, поэтому результат запоминается для каждого исходного
+значения (кэш LRU ограниченного размера). Для повторяющихся значений
+классификация сводится к поиску в словаре; счётчики попаданий — в stats().
+"""
+
+import os
+import re
+from functools import lru_cache
+
+
+# "2к", "2 к", "2ккв", "2K", "2kv" ... (кириллица и латиница)
+ROOMS_PATTERN = re.compile(r'(\d+)\s*[кkкквkv]')
+# "2ккв (Евро)", "3к евро" ...
+EURO_ROOMS_PATTERN = re.compile(r'(\d+)\s*[кkкквkv].*евро')
+DIGIT_PATTERN = re.compile(r'\d')
+
+EURO_LABELS = {2: 'S (2Евро)', 3: 'M (3Евро)', 4: 'L (4Евро)'}
+
+
+class AreaTypeText:
+    """Подготовленные варианты исходной строки для проверки правил"""
+
+    __slots__ = ('lower', 'no_spaces')
+
+    def __init__(self, lower):
+        self.lower = lower
+        self.no_spaces = lower.replace(' ', '')
+
+
+def _rooms_label(room_count):
+    # Возвращаем с кириллической "к"
+    return f"{room_count}к"
+
+
+def rule_studio(text):
+    """Студии -> "XS (Студия)" (проверяется до исправления опечаток)"""
+    if 'студи' in text.lower or text.lower.startswith('xs'):
+        return 'XS (Студия)'
+    return None
+
+
+def rule_euro_rooms(text):
+    """Форматы "2ккв (Евро)", "3ккв (Евро)", "4ккв (Евро)".
+
+    Для 5+ комнат упоминание "евро" игнорируется — это обычная квартира.
+    """
+    match = EURO_ROOMS_PATTERN.search(text.lower)
+    if not match:
+        return None
+    room_count = int(match.group(1))
+    if room_count in EURO_LABELS:
+        return EURO_LABELS[room_count]
+    if room_count >= 5:
+        return _rooms_label(room_count)
+    return None
+
+
+def rule_euro_s(text):
+    """S (2Евро) — 2 комнаты евро"""
+    if (text.lower.startswith('s') and 'евро' in text.lower) or '2евро' in text.no_spaces:
+        return 'S (2Евро)'
+    return None
+
+
+def _letter_euro_rule(letter, rooms, label):
+    """M (3Евро) / L (4Евро): просто "M"/"L" (без цифр и без "к") или с упоминанием евро"""
+    def rule(text):
+        lower = text.lower
+        if not lower.startswith(letter):
+            return None
+        # Отсекаем "м2", "л2" и подобное
+        if len(lower) <= 2 or (not DIGIT_PATTERN.search(lower) and 'к' not in lower):
+            return label
+        if 'евро' in lower or f'{rooms}евро' in text.no_spaces:
+            return label
+        return None
+    rule.__name__ = f'rule_euro_{letter}'
+    rule.__doc__ = f'{label} — {rooms} комнаты евро'
+    return rule
+
+
+rule_euro_m = _letter_euro_rule('m', 3, 'M (3Евро)')
+rule_euro_l = _letter_euro_rule('l', 4, 'L (4Евро)')
+
+
+def rule_rooms(text):
+    """Обычные квартиры: "1к", "1 ккв", "5ккв", "1K" ... -> "Nк" """
+    match = ROOMS_PATTERN.search(text.lower)
+    if match:
+        return _rooms_label(int(match.group(1)))
+    return None
+
+
+# Правила в порядке приоритета: (название, функция, исправлять опечатки перед проверкой).
+# Студии проверяются по исходному тексту, остальные — после замены "Зевро" на "3евро"
+AREA_TYPE_RULES = (
+    ('студия', rule_studio, False),
+    ('евро по числу комнат', rule_euro_rooms, True),
+    ('S (2Евро)', rule_euro_s, True),
+    ('M (3Евро)', rule_euro_m, True),
+    ('L (4Евро)', rule_euro_l, True),
+    ('число комнат', rule_rooms, True),
+)
+
+
+def fix_typos(lower):
+    """Исправляет опечатки: "З" (кириллическая) вместо "3" в "3Евро" """
+    return lower.replace('зевро', '3евро').replace('зеuro', '3евро')
+
+
+def classify_area_type(area_type_str):
+    """Классифицирует строку типа площади без кэша: (тип, название сработавшего правила).
+
+    Если ни одно правило не подошло, возвращается исходная строка (без
+    пробелов по краям) и правило None.
+    """
+    # Нормализуем регистр и пробелы
+    lower = ' '.join(area_type_str.lower().split())
+    raw_text = AreaTypeText(lower)
+    fixed_text = None
+    for name, rule, typos in AREA_TYPE_RULES:
+        if typos:
+            if fixed_text is None:
+                fixed_text = AreaTypeText(fix_typos(lower))
+            text = fixed_text
+        else:
+            text = raw_text
+        result = rule(text)
+        if result is not None:
+            return result, name
+    return area_type_str, None
+
+
+class AreaTypeClassifier:
+    """Классификатор с кэшем результатов по исходному значению (LRU, max_entries записей)"""
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._classify = lru_cache(maxsize=max_entries, typed=True)(self._classify_uncached)
+
+    @staticmethod
+    def _classify_uncached(area_type):
+        return classify_area_type(str(area_type).strip())[0]
+
+    def __call__(self, area_type):
+        """Нормализует тип площади к единому формату (None для пустого значения)"""
+        if not area_type:
+            return None
+        try:
+            return self._classify(area_type)
+        except TypeError:
+            # Нехэшируемое значение — классифицируем без кэша
+            return self._classify_uncached(area_type)
+
+    def clear(self):
+        self._classify.cache_clear()
+
+    def stats(self):
+        """Счётчики кэша: попадания, промахи, доля попаданий, число записей"""
+        info = self._classify.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            'hits': info.hits,
+            'misses': info.misses,
+            'hit_rate': info.hits / lookups if lookups else 0.0,
+            'entries': info.currsize,
+            'max_entries': info.maxsize,
+        }
+
+
+# Общий классификатор приложения; размер кэша — AREA_TYPE_CACHE_SIZE
+normalize_area_type = AreaTypeClassifier(int(os.environ.get('AREA_TYPE_CACHE_SIZE', '4096')))
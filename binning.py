@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Разбиение числовых значений на интервалы: диапазоны площади и классы этажей.
+
+Стратегии разбиения площади:
+- FixedWidthBinning(10) — интервалы фиксированной ширины ("40-50", "50-60", ...);
+- QuantileBinning(4) — границы по квантилям значений (примерно равные по
+  числу квартир интервалы);
+- PerRoomBinning({'1к': [...], '2к': [...]}, default) — свои границы для
+  каждой комнатности, остальные — по стратегии default.
+
+assign() считает коды интервалов сразу для всего столбца (NumPy) и
+возвращает таблицу интервалов Bins с числовыми границами. Подписи
+интервалов — BinLabel: это обычная строка "40-50" (сравнивается и
+хэшируется как строка), которая хранит и числовые границы, поэтому при
+сортировке и выборке по диапазону строку разбирать не нужно.
+
+Классы этажей (Classes) задаются порогами: FLOOR_CLASSES относит этажи
+[1, 2) к "первый", остальные (и неразборчивые) — к "не первый".
+"""
+
+import math
+
+import numpy as np
+
+
+def format_bound(value):
+    """Граница интервала для подписи: 40.0 -> "40", 37.5 -> "37.5" """
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    return f'{value:g}'
+
+
+class BinLabel(str):
+    """Подпись интервала "нижняя-верхняя" с числовыми границами lower_bound и upper_bound"""
+
+    def __new__(cls, lower, upper):
+        label = super().__new__(cls, f'{format_bound(lower)}-{format_bound(upper)}')
+        label.lower_bound = lower
+        label.upper_bound = upper
+        return label
+
+    def __reduce__(self):
+        return BinLabel, (self.lower_bound, self.upper_bound)
+
+
+class Bins:
+    """Таблица интервалов [lower, upper), упорядоченная по границам; код интервала — его номер"""
+
+    def __init__(self, lower, upper):
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.upper = np.asarray(upper, dtype=np.float64)
+        self.labels = [BinLabel(lo, hi) for lo, hi in zip(self.lower.tolist(), self.upper.tolist())]
+
+    def __len__(self):
+        return len(self.labels)
+
+    @classmethod
+    def from_edges(cls, edges):
+        edges = np.asarray(edges, dtype=np.float64)
+        return cls(edges[:-1], edges[1:])
+
+
+def _edge_codes(values, edges, last_closed=False):
+    """Номер интервала между соседними границами edges для каждого значения (-1 — вне границ или NaN)"""
+    codes = np.searchsorted(edges, values, side='right') - 1
+    if last_closed:
+        # Максимальное значение попадает в последний интервал
+        codes[values == edges[-1]] = len(edges) - 2
+    codes[(codes < 0) | (codes >= len(edges) - 1) | np.isnan(values)] = -1
+    return codes
+
+
+class FixedWidthBinning:
+    """Интервалы ширины width, начиная от origin: [origin + k·width, origin + (k + 1)·width)"""
+
+    def __init__(self, width=10, origin=0):
+        self.width = width
+        self.origin = origin
+
+    def __repr__(self):
+        return f'FixedWidthBinning(width={self.width!r}, origin={self.origin!r})'
+
+    def _lower(self, values):
+        return np.floor_divide(values - self.origin, self.width) * self.width + self.origin
+
+    def label(self, value):
+        """Подпись интервала одного значения (None для NaN и бесконечности)"""
+        if not math.isfinite(value):
+            return None
+        lower = (value - self.origin) // self.width * self.width + self.origin
+        return BinLabel(lower, lower + self.width)
+
+    def assign(self, values, rooms=None):
+        """Коды интервалов столбца и таблица встретившихся интервалов: (codes, Bins)"""
+        values = np.asarray(values, dtype=np.float64)
+        finite = np.isfinite(values)
+        lower = self._lower(values[finite])
+        unique = np.unique(lower)
+        codes = np.full(len(values), -1, dtype=np.int64)
+        codes[finite] = np.searchsorted(unique, lower)
+        return codes, Bins(unique, unique + self.width)
+
+
+class QuantileBinning:
+    """count интервалов с границами по квантилям значений (повторяющиеся границы объединяются)"""
+
+    def __init__(self, count=4):
+        self.count = count
+
+    def __repr__(self):
+        return f'QuantileBinning(count={self.count!r})'
+
+    def assign(self, values, rooms=None):
+        values = np.asarray(values, dtype=np.float64)
+        finite = values[np.isfinite(values)]
+        if not len(finite):
+            return np.full(len(values), -1, dtype=np.int64), Bins([], [])
+        edges = np.unique(np.quantile(finite, np.linspace(0, 1, self.count + 1)))
+        if len(edges) == 1:
+            edges = np.array([edges[0], edges[0] + 1])
+        return _edge_codes(values, edges, last_closed=True), Bins.from_edges(edges)
+
+
+class PerRoomBinning:
+    """Свои границы интервалов для каждой комнатности; значения вне границ не попадают ни в один интервал"""
+
+    def __init__(self, edges_by_rooms, default=None):
+        self.edges_by_rooms = {rooms: np.asarray(edges, dtype=np.float64)
+                               for rooms, edges in edges_by_rooms.items()}
+        self.default = default or FixedWidthBinning()
+
+    def __repr__(self):
+        edges = {rooms: edges.tolist() for rooms, edges in sorted(self.edges_by_rooms.items())}
+        return f'PerRoomBinning({edges!r}, default={self.default!r})'
+
+    def assign(self, values, rooms=None):
+        """rooms — массив комнатности той же длины, что values"""
+        values = np.asarray(values, dtype=np.float64)
+        if rooms is None:
+            return self.default.assign(values)
+        rooms = np.asarray(rooms, dtype=object)
+
+        # Коды внутри каждой комнатности, затем общая таблица интервалов
+        parts = []
+        rest = np.ones(len(values), dtype=bool)
+        for room, edges in self.edges_by_rooms.items():
+            mask = rooms == room
+            if not mask.any():
+                continue
+            rest &= ~mask
+            parts.append((mask, _edge_codes(values[mask], edges), Bins.from_edges(edges)))
+        if rest.any():
+            codes, bins = self.default.assign(values[rest])
+            parts.append((rest, codes, bins))
+
+        intervals = sorted({(lo, hi) for _, _, bins in parts
+                            for lo, hi in zip(bins.lower.tolist(), bins.upper.tolist())})
+        table = Bins([lo for lo, _ in intervals], [hi for _, hi in intervals])
+        position = {interval: i for i, interval in enumerate(intervals)}
+        codes = np.full(len(values), -1, dtype=np.int64)
+        for mask, part_codes, bins in parts:
+            remap = np.array([position[(lo, hi)] for lo, hi in zip(bins.lower.tolist(), bins.upper.tolist())] + [-1],
+                             dtype=np.int64)
+            codes[mask] = remap[part_codes]  # код -1 указывает на последний элемент remap (-1)
+        return codes, table
+
+
+class Classes:
+    """Классы значений по порогам: [edges[i], edges[i + 1]) -> labels[i], остальное (и NaN) -> default"""
+
+    def __init__(self, edges, labels, default):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.names = list(labels) + [default]
+        if len(self.names) != len(self.edges):
+            raise ValueError("Число классов должно быть на единицу меньше числа порогов")
+
+    def __repr__(self):
+        return f'Classes({self.edges.tolist()!r}, {self.names[:-1]!r}, {self.names[-1]!r})'
+
+    def codes(self, values):
+        """Номера классов (индексы в names) для столбца значений"""
+        codes = _edge_codes(np.asarray(values, dtype=np.float64), self.edges)
+        codes[codes < 0] = len(self.names) - 1
+        return codes
+
+    def classify(self, value):
+        """Класс одного значения"""
+        if value is None or math.isnan(value):
+            return self.names[-1]
+        for i, name in enumerate(self.names[:-1]):
+            if self.edges[i] <= value < self.edges[i + 1]:
+                return name
+        return self.names[-1]
+
+
+# Первый этаж и все остальные
+FLOOR_CLASSES = Classes([1, 2], ['первый'], 'не первый')
+
+# Диапазоны площади по умолчанию — шаг 10 м²
+AREA_BINNING = FixedWidthBinning(10)
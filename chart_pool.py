@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Параллельный рендеринг графиков сравнения (matplotlib) в пуле процессов.
+
+Каждая пара групп даёт два графика (боксплот и гистограмму), и каждый
+рендерится целиком на CPU. Пул раскладывает графики по ядрам:
+- одновременно в очереди не больше max_pending заданий (ограниченная очередь);
+- на каждый график отводится timeout секунд, иначе результат — None.
+  Отсчёт начинается, когда ответ доходит до этого графика (все предыдущие
+  готовы), поэтому ожидание в очереди пула в timeout не входит;
+- результаты возвращаются в порядке заданий;
+- при одном ядре (или CHART_WORKERS=1) графики рендерятся последовательно
+  в текущем процессе.
+
+Процессы запускаются методом spawn: безопасно для многопоточного gunicorn.
+Зависший график не прерывается (ProcessPoolExecutor не умеет снимать
+задание), но ответ перестаёт его ждать.
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+
+import charts
+
+
+# Виды графиков -> функции рендеринга из charts
+RENDERERS = {
+    'boxplot': charts.create_boxplot,
+    'histogram': charts.create_histogram,
+}
+
+
+def chart_payload(group):
+    """Минимальные данные группы для рендеринга (без площадей и лишних полей)"""
+    stats = group.get('stats') or {}
+    return {
+        'source': group['source'],
+        'costs': list(group['costs']),
+        'stats': {'mean': stats.get('mean'), 'median': stats.get('median')},
+    }
+
+
+def render_chart(kind, group1, group2):
+    """Рендерит один график в base64 PNG (выполняется в процессе пула)"""
+    return RENDERERS[kind](group1, group2)
+
+
+class ChartRenderPool:
+    """Пул процессов для рендеринга графиков с ограниченной очередью и таймаутом"""
+
+    def __init__(self, workers=None, timeout=60, max_pending=None):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = max(int(workers), 1)
+        self.timeout = timeout
+        self.max_pending = max_pending or self.workers * 2
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def parallel(self):
+        return self.workers > 1
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def _reset_executor(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def shutdown(self):
+        self._reset_executor()
+
+    def render(self, tasks):
+        """Рендерит задания [(вид, группа1, группа2), ...] и возвращает результаты в том же порядке.
+
+        Для графиков, не уложившихся в timeout или упавших с ошибкой, результат — None.
+        """
+        tasks = [(kind, chart_payload(g1), chart_payload(g2)) for kind, g1, g2 in tasks]
+        if not tasks:
+            return []
+        if not self.parallel or len(tasks) == 1:
+            return [self._render_serial(task) for task in tasks]
+
+        try:
+            return self._render_parallel(tasks)
+        except BrokenProcessPool:
+            # Процесс пула упал — пересоздадим пул в следующий раз, сейчас рендерим сами
+            self._reset_executor()
+            return [self._render_serial(task) for task in tasks]
+
+    @staticmethod
+    def _render_serial(task):
+        try:
+            return render_chart(*task)
+        except Exception as e:
+            print(f"Предупреждение: не удалось построить график {task[0]}: {e}")
+            return None
+
+    def _render_parallel(self, tasks):
+        executor = self._get_executor()
+        results = [None] * len(tasks)
+        pending = {}  # индекс задания -> future
+        next_task = 0
+        next_result = 0
+
+        while next_result < len(tasks):
+            # Досылаем задания, пока очередь не заполнена
+            while next_task < len(tasks) and len(pending) < self.max_pending:
+                future = executor.submit(render_chart, *tasks[next_task])
+                pending[next_task] = future
+                next_task += 1
+
+            # Ждём результаты строго по порядку заданий; timeout отсчитывается
+            # с этого момента, а не с отправки задания в очередь
+            future = pending.pop(next_result)
+            try:
+                results[next_result] = future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                print(f"Предупреждение: график {tasks[next_result][0]} не построен за {self.timeout} с")
+            except BrokenProcessPool:
+                for other in pending.values():
+                    other.cancel()
+                raise
+            except Exception as e:
+                print(f"Предупреждение: не удалось построить график {tasks[next_result][0]}: {e}")
+            next_result += 1
+
+        return results
+
+
+# Общий пул приложения: число процессов — CHART_WORKERS (по умолчанию по числу ядер),
+# таймаут одного графика — CHART_TIMEOUT секунд
+chart_pool = ChartRenderPool(
+    workers=int(os.environ['CHART_WORKERS']) if os.environ.get('CHART_WORKERS') else None,
+    timeout=float(os.environ.get('CHART_TIMEOUT', '60'))
+)
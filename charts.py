@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Графики сравнения групп (matplotlib): боксплот и гистограммы стоимости.
+
+Вынесены из app.py отдельным модулем, чтобы их можно было вызывать
+в процессах пула рендеринга (chart_pool) без загрузки Flask-приложения.
+
+Графики рисуются в объектах matplotlib.figure.Figure с холстом Agg,
+без pyplot: у pyplot общее глобальное состояние (текущая фигура, список
+открытых фигур), и он небезопасен в потоках gunicorn (gthread), где
+app.chart_impl рендерит графики прямо в потоке запроса.
+"""
+
+import base64
+import io
+import os
+
+from figure_cache import figure_cache, fingerprint
+
+# Для Render: matplotlib должен писать кэш во временную папку
+if 'MPLCONFIGDIR' not in os.environ:
+    os.environ['MPLCONFIGDIR'] = '/tmp/matplotlib'
+
+try:
+    import matplotlib
+    matplotlib.use('Agg')  # Backend без GUI (для сервера)
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from matplotlib.ticker import FuncFormatter
+    import numpy as np
+    import matplotlib.patches as mpatches
+    MATPLOTLIB_AVAILABLE = True
+    # Настройки задаются один раз при импорте, до рендеринга в потоках
+    matplotlib.rcParams['font.family'] = 'DejaVu Sans'
+    matplotlib.rcParams['axes.unicode_minus'] = False
+except ImportError:
+    MATPLOTLIB_AVAILABLE = False
+
+
+def plot_to_png(fig):
+    """Конвертирует matplotlib figure в байты PNG"""
+    img = io.BytesIO()
+    FigureCanvasAgg(fig).print_figure(img, format='png', dpi=100, bbox_inches='tight')
+    return img.getvalue()
+
+
+def plot_to_base64(fig):
+    """Конвертирует matplotlib figure в base64 строку"""
+    return base64.b64encode(plot_to_png(fig)).decode('utf-8')
+
+
+def draw_boxplot(group1, group2):
+    """Рисует boxplot для двух групп (возвращает figure)"""
+    fig = Figure(figsize=(12, 8))
+    ax = fig.subplots()
+    
+    data1 = group1['costs']
+    data2 = group2['costs']
+    
+    positions = [1, 2]
+    data = [data1, data2]
+    
+    bp = ax.boxplot(data, positions=positions, widths=0.6, vert=True, patch_artist=True,
+                    showmeans=True, meanline=True,
+                    boxprops=dict(facecolor='lightblue', alpha=0.7),
+                    medianprops=dict(color='red', linewidth=2),
+                    meanprops=dict(color='green', linewidth=2, linestyle='--'),
+                    whiskerprops=dict(color='black', linewidth=1.5),
+                    capprops=dict(color='black', linewidth=1.5))
+    
+    colors = ['lightblue', 'lightcoral']
+    for patch, color in zip(bp['boxes'], colors):
+        patch.set_facecolor(color)
+        patch.set_alpha(0.7)
+    
+    # Выбросы убраны по запросу пользователя
+    
+    ax.set_ylabel('Стоимость, руб.', fontsize=12, fontweight='bold')
+    ax.set_xticks(positions)
+    ax.set_xticklabels([group1['source'], group2['source']], fontsize=11, fontweight='bold')
+    ax.set_title('Сравнение стоимости',
+                fontsize=12, fontweight='bold', pad=15)
+    
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'{x:,.0f}'))
+    ax.grid(True, alpha=0.3, axis='y')
+    
+    return fig
+
+def draw_histogram(group1, group2):
+    """Рисует наложенные гистограммы для двух групп (возвращает figure)"""
+    fig = Figure(figsize=(14, 8))
+    ax = fig.subplots()
+    
+    data1 = group1['costs']
+    data2 = group2['costs']
+    
+    # Вычисляем общий диапазон для обеих групп
+    all_data = data1 + data2
+    min_val = min(all_data)
+    max_val = max(all_data)
+    
+    # Создаем одинаковые границы бинов для обеих групп
+    num_bins = 15
+    bin_edges = np.linspace(min_val, max_val, num_bins + 1)
+    
+    ax.hist(data1, bins=bin_edges, alpha=0.6, label=group1['source'], 
+           color='steelblue', edgecolor='black', linewidth=0.5)
+    ax.hist(data2, bins=bin_edges, alpha=0.6, label=group2['source'],
+           color='coral', edgecolor='black', linewidth=0.5)
+    
+    # Средние и медианы
+    stats1 = group1['stats']
+    stats2 = group2['stats']
+    
+    ax.axvline(stats1['mean'], color='blue', linestyle='--', linewidth=2)
+    ax.axvline(stats2['mean'], color='red', linestyle='--', linewidth=2)
+    ax.axvline(stats1['median'], color='darkblue', linestyle='-', linewidth=2)
+    ax.axvline(stats2['median'], color='darkred', linestyle='-', linewidth=2)
+    
+    ax.set_xlabel('Стоимость, руб.', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Количество квартир', fontsize=12, fontweight='bold')
+    ax.set_title('Распределение стоимости',
+                fontsize=12, fontweight='bold', pad=15)
+    
+    ax.xaxis.set_major_formatter(FuncFormatter(lambda x, p: f'{x/1e6:.1f}М'))
+    ax.grid(True, alpha=0.3, axis='y')
+    ax.legend(loc='upper right', fontsize=10)
+    
+    return fig
+
+def create_boxplot(group1, group2):
+    """Создает boxplot для двух групп (base64 PNG)"""
+    return base64.b64encode(render_png('boxplot', group1, group2)).decode('utf-8')
+
+def create_histogram(group1, group2):
+    """Создает наложенные гистограммы для двух групп (base64 PNG)"""
+    return base64.b64encode(render_png('histogram', group1, group2)).decode('utf-8')
+
+
+# Виды графиков сравнения -> функции рисования
+CHART_KINDS = {
+    'boxplot': draw_boxplot,
+    'histogram': draw_histogram,
+}
+
+# Параметры оформления, от которых зависит картинка. Входят в отпечаток графика:
+# при изменении оформления увеличьте version, чтобы не отдавать старые картинки из кэша
+CHART_STYLE = {'version': 1, 'format': 'png', 'dpi': 100}
+
+
+def chart_fingerprint(kind, group1, group2):
+    """Отпечаток графика сравнения: стоимости обеих групп, названия и (для гистограммы) среднее/медиана"""
+    params = dict(CHART_STYLE, sources=[group1['source'], group2['source']])
+    if kind == 'histogram':
+        params['stats'] = [[g['stats']['mean'], g['stats']['median']] for g in (group1, group2)]
+    return fingerprint(kind, [group1['costs'], group2['costs']], params)
+
+
+def render_png(kind, group1, group2):
+    """Рендерит график сравнения заданного вида в байты PNG (с кэшем по отпечатку данных)"""
+    return figure_cache.get_or_render(
+        chart_fingerprint(kind, group1, group2),
+        lambda: plot_to_png(CHART_KINDS[kind](group1, group2))
+    )
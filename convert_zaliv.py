@@ -6,11 +6,13 @@
 
 import csv
 
+from csv_sniff import open_csv
+
 def convert_zaliv_file(input_file, output_file):
     """Преобразует файл Залив в правильный формат"""
     
-    with open(input_file, 'r', encoding='utf-8-sig') as f:
-        reader = csv.DictReader(f)
+    with open_csv(input_file) as (f, csv_format):
+        reader = csv.DictReader(f, delimiter=csv_format.delimiter)
         
         output_rows = []
         
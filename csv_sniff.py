@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Определение формата CSV-файла по первым килобайтам: кодировка, BOM и разделитель.
+
+Выгрузки приходят в UTF-8 (с BOM и без) или в cp1251, с разделителем
+"," или ";". Раньше загрузчики перебирали кодировки, заново открывая и
+перечитывая файл после каждой UnicodeDecodeError (и успевая добавить
+часть строк). Теперь формат определяется один раз по началу файла, и
+файл читается ровно один раз.
+"""
+
+import codecs
+import csv
+import io
+from collections import namedtuple
+from contextlib import contextmanager
+
+
+# Сколько байт начала файла анализировать
+SNIFF_BYTES = 16 * 1024
+
+# Кодировка, если начало файла — не UTF-8 (cp1251 и windows-1251 — одно и то же)
+FALLBACK_ENCODING = 'cp1251'
+
+# Кандидаты в разделители в порядке предпочтения при равенстве
+DELIMITERS = (',', ';', '\t')
+
+# Сколько строк начала файла использовать для выбора разделителя
+SNIFF_LINES = 20
+
+BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+CsvFormat = namedtuple('CsvFormat', ['encoding', 'delimiter', 'bom'])
+
+
+def detect_encoding(sample, complete=False):
+    """Кодировка по началу файла: (кодировка, есть ли BOM).
+
+    complete=True — sample содержит файл целиком (иначе последний символ
+    может быть обрезан посередине и это не считается ошибкой).
+    """
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding, True
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=complete)
+        return 'utf-8', False
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING, False
+
+
+def detect_delimiter(text, complete=False):
+    """Разделитель по первым строкам текста.
+
+    Выбирается разделитель, при котором строки начала файла имеют одинаковое
+    число колонок (больше одной), а при равенстве — больше колонок в заголовке.
+    """
+    lines = text.splitlines()
+    if not complete and len(lines) > 1:
+        lines = lines[:-1]  # последняя строка могла обрезаться
+    lines = lines[:SNIFF_LINES]
+    best = None
+    best_score = None
+    for delimiter in DELIMITERS:
+        try:
+            rows = [row for row in csv.reader(lines, delimiter=delimiter) if row]
+        except csv.Error:
+            continue
+        if not rows or len(rows[0]) < 2:
+            continue
+        width = len(rows[0])
+        consistent = sum(1 for row in rows if len(row) == width) / len(rows)
+        score = (consistent, width)
+        if best_score is None or score > best_score:
+            best, best_score = delimiter, score
+    return best or ','
+
+
+def sniff_csv(sample, complete=False):
+    """Формат CSV (CsvFormat) по первым байтам файла"""
+    encoding, bom = detect_encoding(sample, complete)
+    text = sample.decode(encoding, errors='ignore')
+    return CsvFormat(encoding, detect_delimiter(text, complete), bom)
+
+
+def _readable_stream(stream):
+    """Поток, который можно обернуть в TextIOWrapper.
+
+    SpooledTemporaryFile (в нём werkzeug держит загруженный файл) получил
+    readable() и прочие методы io.IOBase только в Python 3.11. До этого
+    оборачивается его внутренний файл (BytesIO или временный файл на диске),
+    а если его нет — содержимое, прочитанное в память.
+    """
+    if hasattr(stream, 'readable'):
+        return stream
+    inner = getattr(stream, '_file', None)
+    if inner is not None and hasattr(inner, 'readable'):
+        return inner
+    return io.BytesIO(stream.read())
+
+
+def sniff_stream(stream):
+    """Определяет формат потока байтов и оборачивает его в текстовый поток.
+
+    Поток должен поддерживать seek (файл на диске, загруженный файл). Текст
+    декодируется по мере чтения; BOM отбрасывается. Возвращает
+    (текстовый поток, CsvFormat).
+    """
+    stream = _readable_stream(stream)
+    start = stream.tell()
+    sample = stream.read(SNIFF_BYTES)
+    stream.seek(start)
+    csv_format = sniff_csv(sample, complete=len(sample) < SNIFF_BYTES)
+    return io.TextIOWrapper(stream, encoding=csv_format.encoding, newline=''), csv_format
+
+
+@contextmanager
+def open_csv(file_path):
+    """Открывает CSV-файл с определением формата: with open_csv(path) as (f, csv_format)"""
+    with open(file_path, 'rb') as raw:
+        text_stream, csv_format = sniff_stream(raw)
+        try:
+            yield text_stream, csv_format
+        finally:
+            text_stream.detach()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Сохранённое состояние поиска дубликатов задач (process_tasks) между выгрузками.
+
+Еженедельная выгрузка задач почти совпадает с предыдущей, поэтому результат
+сравнения пар сохраняется рядом с CSV (.<имя CSV>.dedup.json), по ID задачи:
+- texts — нормализованные заголовок и описание каждой задачи;
+- edges — найденные пары-дубликаты (рёбра графа похожести);
+- parents — корень группы каждой задачи (Union-Find после сжатия путей).
+
+При следующем запуске задачи с теми же ID и тем же нормализованным текстом
+считаются неизменными: пары между ними уже сравнивались, их рёбра берутся
+из состояния. Заново сравниваются только пары с новыми и изменёнными
+задачами. Индекс 3-грамм заголовков (task_index) не сохраняется — он
+строится по сохранённым текстам быстрее, чем читался бы с диска.
+
+Состояние сбрасывается, если изменились пороги, правило отбора пар или
+версия формата.
+"""
+
+import json
+import os
+
+from price_snapshot import write_atomic
+
+
+STATE_VERSION = 1
+
+
+def state_path(csv_path):
+    """Путь файла состояния рядом с выгрузкой задач"""
+    directory, name = os.path.split(os.fspath(csv_path))
+    return os.path.join(directory, f'.{name}.dedup.json')
+
+
+class DedupState:
+    """Тексты, рёбра-дубликаты и корни групп задач по ID задачи"""
+
+    def __init__(self, settings, texts=None, edges=None, parents=None):
+        self.settings = settings  # пороги и правило отбора пар, при которых получены рёбра
+        self.texts = texts or {}  # ID -> (заголовок, описание)
+        self.edges = edges or []  # [(ID, ID), ...]
+        self.parents = parents or {}  # ID -> ID корня группы
+
+    @classmethod
+    def load(cls, path, settings):
+        """Состояние из файла или None, если его нет, он повреждён или получен с другими настройками"""
+        try:
+            with open(path, 'rb') as f:
+                data = json.loads(f.read().decode('utf-8'))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict):
+            return None
+        if data.get('version') != STATE_VERSION or data.get('settings') != settings:
+            return None
+        try:
+            return cls(
+                settings,
+                texts={task_id: tuple(text) for task_id, text in data['texts'].items()},
+                edges=[tuple(edge) for edge in data['edges']],
+                parents=dict(data['parents']),
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def save(self, path):
+        data = {
+            'version': STATE_VERSION,
+            'settings': self.settings,
+            'texts': {task_id: list(text) for task_id, text in self.texts.items()},
+            'edges': [list(edge) for edge in self.edges],
+            'parents': self.parents,
+        }
+        write_atomic(path, lambda f: f.write(json.dumps(data, ensure_ascii=False).encode('utf-8')))
+
+    def diff(self, texts):
+        """Сравнение с новой выгрузкой {ID: текст}: (неизменные, изменённые, новые, удалённые) ID"""
+        unchanged, changed, added = set(), set(), set()
+        for task_id, text in texts.items():
+            stored = self.texts.get(task_id)
+            if stored is None:
+                added.add(task_id)
+            elif stored == tuple(text):
+                unchanged.add(task_id)
+            else:
+                changed.add(task_id)
+        removed = set(self.texts) - set(texts)
+        return unchanged, changed, added, removed
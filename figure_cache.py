@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Кэш отрисованных графиков по отпечатку входных данных.
+
+Боксплоты, гистограммы (PNG) и графики Plotly (JSON) — чистые функции от
+массивов значений, названий ЖК и параметров оформления. Ключ кэша —
+SHA-256 от вида графика, параметров и байтов входных массивов, поэтому
+повторное сравнение неизменившихся прайс-листов не рисует график заново.
+
+Два уровня:
+- память процесса — LRU с ограничением по объёму (upload_cache.UploadCache);
+- диск — файлы в каталоге FIGURE_CACHE_DIR, общие для всех процессов
+  (воркеры gunicorn, пул рендеринга); при превышении лимита удаляются
+  давно не использованные файлы.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from upload_cache import UploadCache
+
+
+def fingerprint(kind, arrays=(), params=None):
+    """Отпечаток графика: вид, параметры оформления и содержимое входных массивов"""
+    digest = hashlib.sha256()
+    digest.update(kind.encode('utf-8'))
+    digest.update(json.dumps(params or {}, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+    for values in arrays:
+        values = np.ascontiguousarray(values)
+        digest.update(f'|{values.dtype.str}{values.shape}|'.encode('ascii'))
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+class FigureCache:
+    """Двухуровневый кэш графиков (байты): память + диск"""
+
+    def __init__(self, memory_max_bytes, disk_dir=None, disk_max_bytes=0):
+        self.memory = UploadCache(memory_max_bytes)
+        self.disk_dir = disk_dir if disk_dir and disk_max_bytes > 0 else None
+        self.disk_max_bytes = disk_max_bytes
+        self._disk_bytes = None  # оценка объёма на диске, уточняется при очистке
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+        self.disk_misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + '.bin')
+
+    def get(self, key):
+        """Байты графика по ключу или None"""
+        value = self.memory.get(('figure', key))
+        if value is not None or self.disk_dir is None:
+            return value
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = f.read()
+            os.utime(path)  # отметка использования для вытеснения LRU
+        except OSError:
+            with self._lock:
+                self.disk_misses += 1
+            return None
+        with self._lock:
+            self.disk_hits += 1
+        self.memory.put(('figure', key), value, len(value))
+        return value
+
+    def put(self, key, value):
+        """Сохраняет байты графика в память и на диск"""
+        self.memory.put(('figure', key), value, len(value))
+        if self.disk_dir is None:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Пишем во временный файл и атомарно переименовываем: другие процессы
+            # никогда не увидят недописанный график
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Предупреждение: не удалось сохранить график в кэш на диске: {e}")
+            return
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk()[1]
+            else:
+                self._disk_bytes += len(value)
+            if self._disk_bytes > self.disk_max_bytes:
+                self._evict_disk()
+
+    def _scan_disk(self):
+        """Файлы кэша на диске: список (время использования, объём, путь) и общий объём"""
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if not name.endswith('.bin'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        return files, total
+
+    def _evict_disk(self):
+        """Удаляет давно не использованные файлы, пока объём не станет ниже 90% лимита"""
+        files, total = self._scan_disk()
+        files.sort()
+        target = self.disk_max_bytes * 0.9
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._disk_bytes = total
+
+    def get_or_render(self, key, render):
+        """Возвращает байты графика из кэша или рисует его функцией render() и сохраняет"""
+        value = self.get(key)
+        if value is None:
+            value = render()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def stats(self):
+        memory_stats = self.memory.stats()
+        with self._lock:
+            return {
+                'memory_entries': memory_stats['entries'],
+                'memory_bytes': memory_stats['bytes'],
+                'memory_hits': memory_stats['hits_total'],
+                'memory_misses': memory_stats['misses_total'],
+                'disk_dir': self.disk_dir,
+                'disk_bytes': self._disk_bytes,
+                'disk_hits': self.disk_hits,
+                'disk_misses': self.disk_misses,
+            }
+
+
+# Общий кэш графиков: FIGURE_CACHE_MB — память процесса, FIGURE_CACHE_DISK_MB —
+# лимит на диске (0 — без диска), FIGURE_CACHE_DIR — каталог
+figure_cache = FigureCache(
+    int(os.environ.get('FIGURE_CACHE_MB', '32')) * 1024 * 1024,
+    os.environ.get('FIGURE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'allio_figures')),
+    int(os.environ.get('FIGURE_CACHE_DISK_MB', '256')) * 1024 * 1024
+)
@@ -13,6 +13,8 @@ from datetime import datetime
 from collections import defaultdict
 from pathlib import Path
 
+from csv_sniff import open_csv
+
 try:
     import matplotlib
     matplotlib.use('Agg')
@@ -123,40 +125,34 @@ def plot_to_base64(fig):
 def load_data(file_path):
     """Загружает данные из CSV файла"""
     requests = []
-    encodings = ['utf-8', 'cp1251', 'windows-1251', 'utf-8-sig']
-    
-    for encoding in encodings:
-        try:
-            with open(file_path, 'r', encoding=encoding) as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    normalized_row = {k.strip(): v for k, v in row.items()}
+    try:
+        with open_csv(file_path) as (f, csv_format):
+            reader = csv.DictReader(f, delimiter=csv_format.delimiter)
+            for row in reader:
+                normalized_row = {k.strip(): v for k, v in row.items()}
                     
-                    created_date = parse_date(normalized_row.get('Создана', ''))
-                    request_type = normalized_row.get('Тип', '').strip()
-                    developer = normalized_row.get('Застройщик', '').strip()
+                created_date = parse_date(normalized_row.get('Создана', ''))
+                request_type = normalized_row.get('Тип', '').strip()
+                developer = normalized_row.get('Застройщик', '').strip()
                     
-                    first_reply_min = parse_time_minutes(normalized_row.get('Первая реакция', ''))
-                    resolution_min = parse_time_minutes(normalized_row.get('Время решения', ''))
+                first_reply_min = parse_time_minutes(normalized_row.get('Первая реакция', ''))
+                resolution_min = parse_time_minutes(normalized_row.get('Время решения', ''))
                     
-                    requests.append({
-                        'id': normalized_row.get('ID задачи', ''),
-                        'created': created_date,
-                        'type': request_type,
-                        'developer': developer,
-                        'is_external': is_external_user(developer),
-                        'first_reply_min': first_reply_min,
-                        'resolution_min': resolution_min,
-                        'first_reply_category': categorize_first_reply(first_reply_min),
-                        'resolution_category': categorize_resolution_time(resolution_min),
-                        'raw': normalized_row
-                    })
-            break
-        except UnicodeDecodeError:
-            continue
-        except Exception as e:
-            print(f"Ошибка при чтении файла: {e}")
-            return []
+                requests.append({
+                    'id': normalized_row.get('ID задачи', ''),
+                    'created': created_date,
+                    'type': request_type,
+                    'developer': developer,
+                    'is_external': is_external_user(developer),
+                    'first_reply_min': first_reply_min,
+                    'resolution_min': resolution_min,
+                    'first_reply_category': categorize_first_reply(first_reply_min),
+                    'resolution_category': categorize_resolution_time(resolution_min),
+                    'raw': normalized_row
+                })
+    except Exception as e:
+        print(f"Ошибка при чтении файла: {e}")
+        return []
     
     return requests
 
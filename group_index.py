@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Индекс групп квартир поверх снимка прайс-листа (price_snapshot).
+
+Группа — сочетание значений ключевых полей (комнатность, класс этажа, вид,
+диапазон площади). Поля ключа описываются декларативно:
+- CategoryKey — строковое поле снимка как есть;
+- ClassKey — класс числового поля по порогам (binning.Classes);
+- BinnedKey — интервал числового поля по стратегии разбиения (binning).
+Коды классов и интервалов считаются сразу для всего столбца.
+
+Индекс хранит:
+- order — номера строк снимка, упорядоченные по группам, а внутри группы
+  по стоимости (при равной стоимости — в порядке файла);
+- offsets — смещения групп в order (как в CSR): группа k занимает
+  order[offsets[k]:offsets[k + 1]];
+- codes — коды значений полей ключа каждой группы.
+
+Группы упорядочены по полям ключа (интервалы — по числовым границам),
+поэтому любой префикс ключа (например, «все группы 2к» или «2к, не первый,
+во двор» с диапазоном площадей) — непрерывный отрезок групп, который
+находится бинарным поиском. Выборка группы и её цен стоит O(размер
+результата), без прохода по файлу. Строки, не попавшие ни в один интервал,
+в группы не входят.
+
+Индекс сохраняется рядом со снимком (.<имя CSV>.<ключ>.groups.npz) и
+перестраивается, если изменился исходный CSV, код нормализации снимка
+(Snapshot.normalizer) или описание ключа.
+"""
+
+import os
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from binning import BinLabel, Bins
+from price_snapshot import snapshot_paths, write_atomic
+
+
+class CategoryKey:
+    """Строковое поле снимка"""
+
+    def __init__(self, field):
+        self.field = field
+
+    def __repr__(self):
+        return f'CategoryKey({self.field!r})'
+
+    def column(self, snapshot):
+        """(коды строк, подписи кодов)"""
+        return np.asarray(snapshot.column(self.field), dtype=np.int64), list(snapshot.categories[self.field])
+
+
+class ClassKey:
+    """Класс числового поля по порогам (например, binning.FLOOR_CLASSES)"""
+
+    def __init__(self, field, classes):
+        self.field = field
+        self.classes = classes
+
+    def __repr__(self):
+        return f'ClassKey({self.field!r}, {self.classes!r})'
+
+    def column(self, snapshot):
+        return self.classes.codes(snapshot.column(self.field)), list(self.classes.names)
+
+
+class BinnedKey:
+    """Интервал числового поля; by — строковое поле для разбиения по комнатности (PerRoomBinning)"""
+
+    def __init__(self, field, binning, by=None):
+        self.field = field
+        self.binning = binning
+        self.by = by
+
+    def __repr__(self):
+        return f'BinnedKey({self.field!r}, {self.binning!r}, by={self.by!r})'
+
+    def column(self, snapshot):
+        rooms = None
+        if self.by is not None:
+            categories = np.array(list(snapshot.categories[self.by]), dtype=object)
+            rooms = categories[np.asarray(snapshot.column(self.by))]
+        codes, bins = self.binning.assign(snapshot.column(self.field), rooms)
+        return codes, bins.labels
+
+
+def _label_sort_key(label):
+    if isinstance(label, BinLabel):
+        return label.lower_bound, label.upper_bound
+    return label
+
+
+def _ranks(labels):
+    """Ранг каждого кода при сортировке подписей (код -> позиция)"""
+    order = sorted(range(len(labels)), key=lambda c: _label_sort_key(labels[c]))
+    ranks = np.empty(len(labels), dtype=np.int64)
+    ranks[order] = np.arange(len(labels))
+    return ranks
+
+
+class GroupIndex:
+    """Группы снимка: отрезки order по группам и поиск групп по префиксу ключа"""
+
+    def __init__(self, snapshot, key_specs, price_field, labels, codes, offsets, order):
+        self.snapshot = snapshot
+        self.key_specs = tuple(key_specs)
+        self.price_field = price_field
+        self.labels = labels  # подписи кодов каждого поля ключа
+        self.codes = codes  # (число групп, число полей) — коды полей ключа групп
+        self.offsets = offsets
+        self.order = order
+        self.sizes = np.diff(offsets)
+
+        self.keys = [tuple(column_labels[c] for column_labels, c in zip(labels, row))
+                     for row in codes.tolist()]
+        # Ключи для бинарного поиска: интервалы сравниваются по нижней границе
+        self._sort_keys = [tuple(label.lower_bound if isinstance(label, BinLabel) else label for label in key)
+                           for key in self.keys]
+        self._positions = {key: k for k, key in enumerate(self.keys)}
+
+    @classmethod
+    def build(cls, snapshot, key_specs, price_field):
+        """Строит индекс по снимку: коды полей ключа столбцами и одна сортировка строк (np.lexsort)"""
+        columns = [spec.column(snapshot) for spec in key_specs]
+        valid = np.ones(len(snapshot), dtype=bool)
+        for codes, _ in columns:
+            valid &= codes >= 0
+        rows = np.flatnonzero(valid)
+
+        ranks = [_ranks(labels)[codes[rows]] for codes, labels in columns]
+        prices = np.asarray(snapshot.column(price_field))[rows]
+        # np.lexsort устойчива; последний ключ — главный
+        permutation = np.lexsort([prices] + ranks[::-1])
+        order = rows[permutation]
+
+        if len(order):
+            sorted_ranks = np.stack([r[permutation] for r in ranks], axis=1)
+            boundaries = np.flatnonzero(np.any(sorted_ranks[1:] != sorted_ranks[:-1], axis=1)) + 1
+            starts = np.concatenate(([0], boundaries))
+        else:
+            starts = np.zeros(0, dtype=np.int64)
+        offsets = np.concatenate((starts, [len(order)])).astype(np.int64)
+        first_rows = order[starts]
+        group_codes = np.stack([codes[first_rows] for codes, _ in columns], axis=1).astype(np.int32)
+        labels = [labels for _, labels in columns]
+        return cls(snapshot, key_specs, price_field, labels, group_codes, offsets, order.astype(np.int64))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return tuple(key) in self._positions
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def rows(self, key):
+        """Номера строк снимка группы, по возрастанию стоимости (пустой массив, если группы нет)"""
+        k = self._positions.get(tuple(key))
+        if k is None:
+            return self.order[:0]
+        return self.order[self.offsets[k]:self.offsets[k + 1]]
+
+    def file_rows(self, key):
+        """Номера строк снимка группы в порядке файла"""
+        return np.sort(self.rows(key))
+
+    def prices(self, key):
+        """Стоимости группы по возрастанию"""
+        return np.asarray(self.snapshot.column(self.price_field))[self.rows(key)]
+
+    def items(self):
+        """Пары (ключ группы, номера строк по возрастанию стоимости) в порядке групп"""
+        for k, key in enumerate(self.keys):
+            yield key, self.order[self.offsets[k]:self.offsets[k + 1]]
+
+    def select(self, *prefix, area_from=None, area_to=None):
+        """Ключи групп с заданным префиксом ключа и нижней границей интервала в [area_from, area_to].
+
+        select('2к') — все группы 2к; select('2к', 'первый', 'во двор', area_from=40, area_to=60)
+        — группы 40-50, 50-60 и 60-70. Границы относятся к последнему полю ключа
+        (интервалу площади).
+        """
+        prefix = tuple(prefix)
+        last = len(self.key_specs) - 1
+        if len(prefix) > last:
+            raise ValueError(f"Префикс длиннее {last} полей: {prefix}")
+        prefix_len = len(prefix)
+        lo = bisect_left(self._sort_keys, prefix, key=lambda key: key[:prefix_len])
+        hi = bisect_right(self._sort_keys, prefix, lo=lo, key=lambda key: key[:prefix_len])
+        if area_from is None and area_to is None:
+            return self.keys[lo:hi]
+        if prefix_len == last:
+            # Внутри полного префикса группы упорядочены по нижней границе интервала
+            if area_from is not None:
+                lo = bisect_left(self._sort_keys, area_from, lo=lo, hi=hi, key=lambda key: key[last])
+            if area_to is not None:
+                hi = bisect_right(self._sort_keys, area_to, lo=lo, hi=hi, key=lambda key: key[last])
+            return self.keys[lo:hi]
+        return [key for key, sort_key in zip(self.keys[lo:hi], self._sort_keys[lo:hi])
+                if (area_from is None or sort_key[last] >= area_from)
+                and (area_to is None or sort_key[last] <= area_to)]
+
+
+def index_path(csv_path, snapshot_key):
+    data_path, _ = snapshot_paths(csv_path, snapshot_key)
+    return data_path[:-len('.npy')] + '.groups.npz'
+
+
+def _signature(key_specs, price_field, normalizer):
+    return repr((tuple(key_specs), price_field, normalizer))
+
+
+def save_group_index(csv_path, snapshot_key, index):
+    """Сохраняет индекс рядом со снимком (с подписью исходного CSV и описанием ключа)"""
+    arrays = {
+        'signature': np.array(_signature(index.key_specs, index.price_field, index.snapshot.normalizer)),
+        'sha256': np.array(index.snapshot.source['sha256']),
+        'codes': index.codes,
+        'offsets': index.offsets,
+        'order': index.order,
+    }
+    for i, labels in enumerate(index.labels):
+        if labels and isinstance(labels[0], BinLabel):
+            arrays[f'lower_{i}'] = np.array([label.lower_bound for label in labels], dtype=np.float64)
+            arrays[f'upper_{i}'] = np.array([label.upper_bound for label in labels], dtype=np.float64)
+        else:
+            arrays[f'labels_{i}'] = np.array(labels, dtype=str)
+    write_atomic(index_path(csv_path, snapshot_key), lambda f: np.savez(f, **arrays))
+
+
+def _stored_labels(stored, i):
+    if f'lower_{i}' in stored:
+        return Bins(stored[f'lower_{i}'], stored[f'upper_{i}']).labels
+    return stored[f'labels_{i}'].tolist()
+
+
+def load_group_index(csv_path, snapshot_key, snapshot, key_specs, price_field):
+    """Индекс групп снимка: сохранённый, если он построен по тому же CSV и ключу, иначе новый"""
+    path = index_path(csv_path, snapshot_key)
+    source = snapshot.source or {}
+    try:
+        with np.load(path, allow_pickle=False) as stored:
+            if (stored['sha256'].item() == source.get('sha256')
+                    and stored['signature'].item() == _signature(key_specs, price_field, snapshot.normalizer)):
+                labels = [_stored_labels(stored, i) for i in range(len(key_specs))]
+                return GroupIndex(snapshot, key_specs, price_field, labels,
+                                  stored['codes'], stored['offsets'], stored['order'])
+    except (OSError, ValueError, KeyError):
+        pass
+
+    index = GroupIndex.build(snapshot, key_specs, price_field)
+    if source.get('sha256'):
+        try:
+            save_group_index(csv_path, snapshot_key, index)
+        except OSError as e:
+            print(f"Предупреждение: не удалось сохранить индекс групп для {os.fspath(csv_path)}: {e}")
+    return index
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Хранение результатов группировки на сервере.
+
+/api/create_groups кладёт список групп (со стоимостями, площадями и
+статистикой) в хранилище и возвращает result_id. /api/compare_groups
+получает только result_id и идентификаторы выбранных групп, без повторной
+пересылки массивов из браузера. Записи живут ограниченное время (TTL,
+продлевается при обращении); при переполнении удаляются самые старые.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class GroupSessionStore:
+    """Потокобезопасное хранилище результатов группировки с TTL"""
+
+    def __init__(self, ttl_seconds=3600, max_sessions=200):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # result_id -> (время истечения, группы)
+        self._lock = threading.Lock()
+
+    def _purge_expired(self, now):
+        # Записи упорядочены по последнему обращению, поэтому устаревшие — в начале
+        while self._sessions:
+            result_id, (expires_at, _) = next(iter(self._sessions.items()))
+            if expires_at > now:
+                break
+            del self._sessions[result_id]
+
+    def put(self, result_id, groups):
+        """Сохраняет (или продлевает) результат группировки под result_id"""
+        now = time.monotonic()
+        with self._lock:
+            self._purge_expired(now)
+            self._sessions.pop(result_id, None)
+            self._sessions[result_id] = (now + self.ttl_seconds, groups)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return result_id
+
+    def get(self, result_id):
+        """Возвращает группы по result_id или None, если результат не найден или устарел"""
+        now = time.monotonic()
+        with self._lock:
+            self._purge_expired(now)
+            entry = self._sessions.pop(result_id, None)
+            if entry is None:
+                return None
+            groups = entry[1]
+            self._sessions[result_id] = (now + self.ttl_seconds, groups)
+            return groups
+
+    def select(self, result_id, group_ids=None):
+        """Группы результата, отфильтрованные по списку id (порядок результата сохраняется).
+
+        Без group_ids возвращаются все группы. None — если результат не найден.
+        """
+        groups = self.get(result_id)
+        if groups is None or not group_ids:
+            return groups
+        wanted = set(group_ids)
+        return [group for group in groups if group.get('id') in wanted]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
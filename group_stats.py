@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Пакетный расчёт статистики сразу для многих групп квартир.
+
+Все группы передаются одним отсортированным массивом значений и массивом
+смещений групп (как в CSR): группа k занимает values[offsets[k]:offsets[k + 1]].
+Среднее, медиана, стандартное отклонение, квартили, IQR, мин/макс и маски
+выбросов считаются векторно за один проход по массиву.
+
+Квартили совпадают с statistics.quantiles(data, n=4) (метод exclusive)
+бит в бит; для группы из одного значения Q1 = Q3 = значение. Медиана
+группы нечётного размера — само среднее по порядку значение (целое для
+целых стоимостей, как у statistics.median). Стандартное отклонение
+считается NumPy в два прохода и может отличаться от statistics.stdev в
+последних битах.
+"""
+
+import numpy as np
+
+
+class GroupStatistics:
+    """Статистика по группам: массивы длины «число групп» и маски выбросов по значениям"""
+
+    def __init__(self, values, offsets, mean, median, std, q1, q3, outliers_lower, outliers_upper):
+        self.values = values
+        self.offsets = offsets
+        self.sizes = np.diff(offsets)
+        self.mean = mean
+        self.median = median
+        self.std = std
+        self.q1 = q1
+        self.q3 = q3
+        self.iqr = q3 - q1
+        self.min = values[offsets[:-1]]
+        self.max = values[offsets[1:] - 1]
+        self.outliers_lower = outliers_lower  # маска по values: значение ниже Q1 - 1.5·IQR своей группы
+        self.outliers_upper = outliers_upper  # маска по values: значение выше Q3 + 1.5·IQR своей группы
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def group(self, k):
+        """Статистика группы k в формате app.calculate_statistics (значения Python)"""
+        start, end = self.offsets[k], self.offsets[k + 1]
+        values = self.values[start:end]
+        # Нечётная группа: медиана — значение из группы (тип не меняется), как у statistics.median
+        size = end - start
+        median = values[size // 2].item() if size % 2 else self.median[k].item()
+        outliers_lower = values[self.outliers_lower[start:end]].tolist()
+        outliers_upper = values[self.outliers_upper[start:end]].tolist()
+        outliers_all = outliers_lower + outliers_upper
+        return {
+            'mean': self.mean[k].item(),
+            'median': median,
+            'std': self.std[k].item(),
+            'min': self.min[k].item(),
+            'max': self.max[k].item(),
+            'q1': self.q1[k].item(),
+            'q3': self.q3[k].item(),
+            'iqr': self.iqr[k].item(),
+            'outliers': outliers_all,
+            'outliers_lower': outliers_lower,
+            'outliers_upper': outliers_upper,
+            'outliers_count': len(outliers_all),
+            'outliers_lower_count': len(outliers_lower),
+            'outliers_upper_count': len(outliers_upper)
+        }
+
+    def groups(self):
+        """Статистика всех групп списком словарей"""
+        return [self.group(k) for k in range(len(self))]
+
+
+def _quantile(values, starts, sizes, i):
+    """i-й квартиль (i = 1 или 3) каждой группы по формуле statistics.quantiles (exclusive).
+
+    m = n + 1, j = i·m // 4 с ограничением 1 ≤ j ≤ n − 1, delta = i·m − 4·j,
+    q = (x[j − 1]·(4 − delta) + x[j]·delta) / 4
+    """
+    m = sizes + 1
+    j = np.clip((i * m) // 4, 1, np.maximum(sizes - 1, 1))
+    delta = i * m - j * 4
+    # Группа из одного значения: Q1 = Q3 = значение
+    single = sizes == 1
+    lo = starts + np.where(single, 0, j - 1)
+    hi = starts + np.where(single, 0, j)
+    delta = np.where(single, 0, delta)
+    return (values[lo] * (4 - delta) + values[hi] * delta) / 4
+
+
+def batch_statistics(values_sorted, offsets):
+    """Считает статистику для всех групп сразу.
+
+    values_sorted — значения всех групп подряд, внутри группы по возрастанию;
+    offsets — границы групп длиной «число групп + 1» (offsets[0] = 0,
+    offsets[-1] = len(values_sorted)). Пустые группы не допускаются.
+    """
+    values = np.asarray(values_sorted)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    sizes = np.diff(offsets)
+    if len(sizes) and sizes.min() < 1:
+        raise ValueError('Пустые группы не поддерживаются')
+    starts = offsets[:-1]
+    if not len(sizes):
+        empty = np.empty(0, dtype=np.float64)
+        mask = np.zeros(len(values), dtype=bool)
+        return GroupStatistics(values, offsets, empty, empty, empty, empty, empty, mask, mask)
+
+    # Среднее: сумма по группам (для целых стоимостей — точная в int64)
+    sums = np.add.reduceat(values, starts)
+    mean = sums / sizes
+
+    # Медиана (массив float; group() отдаёт нечётные медианы в типе значений)
+    mid = starts + sizes // 2
+    odd = (sizes % 2) == 1
+    median = np.where(odd, values[mid], (values[mid - 1] + values[mid]) / 2)
+
+    # Стандартное отклонение (выборочное), для группы из одного значения — 0
+    deviations = values - np.repeat(mean, sizes)
+    squares = np.add.reduceat(deviations * deviations, starts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std = np.where(sizes > 1, np.sqrt(squares / np.maximum(sizes - 1, 1)), 0.0)
+
+    q1 = _quantile(values, starts, sizes, 1)
+    q3 = _quantile(values, starts, sizes, 3)
+    iqr = q3 - q1
+
+    # Выбросы: границы группы растягиваются на все её значения
+    lower_bound = np.repeat(q1 - 1.5 * iqr, sizes)
+    upper_bound = np.repeat(q3 + 1.5 * iqr, sizes)
+    outliers_lower = values < lower_bound
+    outliers_upper = values > upper_bound
+
+    return GroupStatistics(values, offsets, mean, median, std, q1, q3, outliers_lower, outliers_upper)
+
+
+def pack_groups(groups):
+    """Сортирует значения каждой группы и склеивает в (values_sorted, offsets) для batch_statistics"""
+    arrays = [np.sort(np.asarray(g)) for g in groups]
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    if arrays:
+        np.cumsum([len(a) for a in arrays], out=offsets[1:])
+        values = np.concatenate(arrays)
+    else:
+        values = np.empty(0)
+    return values, offsets
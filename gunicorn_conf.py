@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Конфигурация gunicorn для продакшена (Render): gunicorn -c gunicorn_conf.py app:app
+
+- один воркер: результаты create_groups (group_sessions) и кэш загрузок
+  (upload_cache) хранятся в памяти процесса, и запросы /api/compare_groups
+  и /api/chart/<result_id>/... должны попадать в тот же процесс, что и
+  create_groups. Несколько воркеров (WEB_CONCURRENCY > 1) возможны только
+  с общим хранилищем этих данных;
+- параллельность — потоками (gthread): тяжёлый /api/compare_groups занимает
+  один поток, а /health и остальные запросы обслуживают другие; графики
+  рендерятся на всех ядрах в пуле процессов chart_pool;
+- preload_app: приложение (matplotlib, Plotly, NumPy) импортируется один
+  раз в мастере, воркеры получают его готовым через fork;
+- увеличенный timeout для тяжёлых запросов и graceful_timeout для
+  корректного завершения при деплое;
+- если задан HEALTH_PORT, мастер отвечает на /health в отдельном лёгком
+  потоке на этом порту — даже когда все воркеры заняты.
+
+Переменные окружения: PORT, WEB_CONCURRENCY (число воркеров),
+GUNICORN_THREADS, GUNICORN_TIMEOUT,
+GUNICORN_GRACEFUL_TIMEOUT, HEALTH_PORT.
+
+Итоговые значения для текущей машины:
+    python gunicorn_conf.py --print-concurrency
+"""
+
+import json
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Потоков на воркер
+DEFAULT_THREADS = 4
+
+
+def _read_first_line(path):
+    try:
+        with open(path) as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+
+def cpu_limit():
+    """Число доступных ядер с учётом квоты cgroup (не меньше 1)"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = None
+    line = _read_first_line('/sys/fs/cgroup/cpu.max')  # cgroup v2: "квота период"
+    if line and not line.startswith('max'):
+        quota_us, period_us = line.split()[:2]
+        quota = int(quota_us) / int(period_us)
+    else:
+        quota_us = _read_first_line('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')  # cgroup v1
+        period_us = _read_first_line('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+        if quota_us and period_us and int(quota_us) > 0:
+            quota = int(quota_us) / int(period_us)
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return max(cpus, 1)
+
+
+def memory_limit_mb():
+    """Доступная память в МБ: лимит cgroup или физическая память машины"""
+    physical = None
+    try:
+        physical = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        pass
+
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        line = _read_first_line(path)
+        if line and line.isdigit():
+            limit = int(line) // (1024 * 1024)
+            # "Без лимита" в cgroup v1 — огромное число
+            if physical is None or limit < physical:
+                return limit
+            break
+    return physical
+
+
+def worker_count():
+    """Число воркеров: WEB_CONCURRENCY или 1 (состояние группировок — в памяти процесса)"""
+    if os.environ.get('WEB_CONCURRENCY'):
+        return max(int(os.environ['WEB_CONCURRENCY']), 1)
+    return 1
+
+
+def thread_count():
+    return max(int(os.environ.get('GUNICORN_THREADS', DEFAULT_THREADS)), 1)
+
+
+CPUS = cpu_limit()
+MEMORY_MB = memory_limit_mb()
+
+# Настройки gunicorn
+bind = f"0.0.0.0:{os.environ.get('PORT', '5001')}"
+workers = worker_count()
+threads = thread_count()
+worker_class = 'gthread'
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+# Файлы «пульса» воркеров — в памяти, а не на диске контейнера
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+
+class HealthHandler(BaseHTTPRequestHandler):
+    """/health мастера gunicorn: отвечает, пока жив мастер, и сообщает число воркеров"""
+
+    arbiter = None
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/health':
+            self.send_error(404)
+            return
+        body = json.dumps({
+            'status': 'ok',
+            'workers': len(self.arbiter.WORKERS) if self.arbiter else None,
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_health_server(port, arbiter=None):
+    """Запускает /health на отдельном порту в фоновом потоке; возвращает сервер"""
+    HealthHandler.arbiter = arbiter
+    server = ThreadingHTTPServer(('0.0.0.0', port), HealthHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='health', daemon=True)
+    thread.start()
+    return server
+
+
+def when_ready(server):
+    """Хук gunicorn: мастер готов — печатаем конфигурацию и запускаем /health на HEALTH_PORT"""
+    server.log.info(f"Воркеров: {workers}, потоков на воркер: {threads} "
+                    f"(ядер: {CPUS}, память: {MEMORY_MB} МБ)")
+    if workers > 1:
+        server.log.warning("Воркеров больше одного: результаты группировки хранятся в памяти "
+                           "процесса, ссылки result_id будут работать только в том воркере, "
+                           "где группы созданы")
+    if os.environ.get('HEALTH_PORT'):
+        port = int(os.environ['HEALTH_PORT'])
+        start_health_server(port, server)
+        server.log.info(f"/health мастера: порт {port}")
+
+
+def concurrency():
+    """Итоговые параметры: ядра, память, воркеры, потоки и число одновременных запросов"""
+    return {
+        'cpus': CPUS,
+        'memory_mb': MEMORY_MB,
+        'workers': workers,
+        'threads': threads,
+        'concurrent_requests': workers * threads,
+        'timeout': timeout,
+        'graceful_timeout': graceful_timeout,
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Конфигурация gunicorn для app:app')
+    parser.add_argument('--print-concurrency', action='store_true',
+                        help='вывести число воркеров и потоков для текущей машины')
+    args = parser.parse_args()
+    if args.print_concurrency:
+        for name, value in concurrency().items():
+            print(f"{name}: {value}")
+    else:
+        parser.print_help()
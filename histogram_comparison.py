@@ -4,11 +4,11 @@
 Скрипт для построения наложенных гистограмм двух групп
 """
 
-import csv
-import re
 from pathlib import Path
 import statistics
 
+from apartment_snapshot import load_index, load_snapshot
+
 try:
     import matplotlib.pyplot as plt
     import numpy as np
@@ -19,97 +19,28 @@ except ImportError:
     MATPLOTLIB_AVAILABLE = False
     print("Внимание: matplotlib не установлен.")
 
-def normalize_floor(floor):
-    """Нормализует этаж: первый (1) или не первый (>1)"""
-    try:
-        floor_num = int(float(str(floor)))
-        return "первый" if floor_num == 1 else "не первый"
-    except (ValueError, TypeError):
-        return "не первый"
-
-def normalize_rooms(rooms):
-    """Нормализует комнатность"""
-    if not rooms or str(rooms).strip() == '':
-        return None
-    rooms_str = str(rooms).strip().lower()
-    rooms_str = re.sub(r'[^\dк]', '', rooms_str)
-    match = re.search(r'(\d+)', rooms_str)
-    if match:
-        return f"{match.group(1)}к"
-    return rooms_str
-
-def normalize_view(view):
-    """Нормализует вид из окон: во двор или на улицу"""
-    if not view or str(view).strip() == '':
-        return None
-    view_str = str(view).strip().lower()
-    if "во двор" in view_str and "на улицу" not in view_str:
-        return "во двор"
-    elif "на улицу" in view_str:
-        return "на улицу"
-    elif "во двор" in view_str:
-        return "на улицу"
-    else:
-        return "на улицу"
-
-def normalize_area(area):
-    """Нормализует площадь и группирует с шагом 10 м²"""
-    if not area or str(area).strip() == '':
-        return None
-    try:
-        area_str = str(area).replace(',', '.')
-        area_float = float(area_str)
-        lower_bound = int(area_float // 10) * 10
-        upper_bound = lower_bound + 10
-        return f"{lower_bound}-{upper_bound}"
-    except (ValueError, TypeError):
-        return None
-
-def normalize_price(price):
-    """Нормализует стоимость"""
-    if not price or str(price).strip() == '':
-        return None
-    try:
-        return int(float(str(price)))
-    except (ValueError, TypeError):
-        return None
+# Снимок нормализованных квартир (apartment_snapshot): ключ и исходные поля для вывода
+SNAPSHOT_KEY = 'histogram_comparison'
+SNAPSHOT_FIELDS = ()
 
 def load_and_filter_apartments(file_paths, target_group):
-    """Загружает квартиры и фильтрует по целевой группе"""
+    """Загружает квартиры целевой группы (повторно — по снимкам и индексам групп рядом с файлами)"""
     apartments = []
     
     for file_path in file_paths:
         if not file_path.exists():
             continue
             
-        encodings = ['utf-8', 'cp1251', 'windows-1251']
-        
-        for encoding in encodings:
-            try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        floor_norm = normalize_floor(row.get('Этаж', ''))
-                        rooms_norm = normalize_rooms(row.get('Комнатность', ''))
-                        view_norm = normalize_view(row.get('Вид из окон', ''))
-                        area_norm = normalize_area(row.get('Общая площадь (м.кв.)', ''))
-                        price_norm = normalize_price(row.get('Стоимость', ''))
-                        
-                        if not all([floor_norm, rooms_norm, view_norm, area_norm is not None, price_norm is not None]):
-                            continue
-                        
-                        if (rooms_norm == target_group['Комнатность'] and
-                            floor_norm == target_group['Этаж'] and
-                            view_norm == target_group['Вид'] and
-                            area_norm == target_group['Площадь']):
-                            apartments.append(price_norm)
-                break
-            except UnicodeDecodeError:
-                continue
-            except Exception as e:
-                print(f"Ошибка при чтении файла {file_path}: {e}")
-                break
-    
+        snapshot = load_snapshot(file_path, SNAPSHOT_KEY, SNAPSHOT_FIELDS)
+        if snapshot is None:
+            continue
+
+        # Квартиры целевой группы по индексу групп, в порядке файла
+        index = load_index(file_path, SNAPSHOT_KEY, snapshot)
+        indices = index.file_rows((target_group['Комнатность'], target_group['Этаж'],
+                                   target_group['Вид'], target_group['Площадь']))
+        apartments.extend(snapshot.values('price_norm', indices))
+
     return apartments
 
 def plot_overlapping_histograms(data1, label1, data2, label2, output_path):
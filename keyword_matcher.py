@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Поиск многих ключевых слов в тексте за один проход и декларативные таблицы
+правил поверх него (theme_tasks).
+
+KeywordAutomaton находит ключевые слова, входящие в текст (в том числе
+перекрывающиеся и вложенные: "дкп" внутри "пдкп"), автоматом Ахо — Корасик
+из pyahocorasick (на C, есть в requirements.txt) за один проход по тексту —
+время линейно по длине текста и не зависит от числа слов. Если пакет не
+установлен, вместо множества найденных слов используется сам текст, и
+проверка слова — поиск подстроки (результат тот же, но каждое слово ищется
+отдельным проходом).
+
+Правила описываются условиями над найденными словами полей:
+- Contains(поле, слово, ...) — в поле есть хотя бы одно из слов;
+- AllOf(...), AnyOf(...), Not(...) — сочетания условий; ALWAYS — всегда истинно;
+- Rule(условие, результат) — результат либо строка, либо вложенный список
+  правил (выбирается первое подходящее вложенное правило; если ни одно не
+  подошло — проверяются следующие правила).
+RuleTable собирает слова всех правил в автоматы (по одному на поле): текст
+проходится один раз, а условия правил проверяются по порядку приоритета
+как `слово in найденные слова`.
+"""
+
+from collections import namedtuple
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+
+class KeywordAutomaton:
+    """Поиск набора ключевых слов в тексте (Ахо — Корасик, если доступен pyahocorasick)"""
+
+    def __init__(self, keywords):
+        self.keywords = sorted(set(keywords))
+        self._automaton = None
+        if AHOCORASICK_AVAILABLE and self.keywords:
+            automaton = ahocorasick.Automaton()
+            for keyword in self.keywords:
+                automaton.add_word(keyword, keyword)
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    def find(self, text):
+        """Ключевые слова, входящие в text: множество найденных слов.
+
+        Без pyahocorasick возвращается сам текст: `слово in текст` — поиск подстроки.
+        """
+        if self._automaton is None:
+            return text
+        return {keyword for _, keyword in self._automaton.iter(text)}
+
+
+class Contains:
+    """В поле field есть хотя бы одно из ключевых слов"""
+
+    def __init__(self, field, *keywords):
+        if not keywords:
+            raise ValueError("Contains: нужно хотя бы одно ключевое слово")
+        self.field = field
+        self.keywords = keywords
+
+    def __repr__(self):
+        return f'Contains({self.field!r}, {", ".join(map(repr, self.keywords))})'
+
+    def fields(self):
+        """Пары (поле, ключевое слово), которые нужно искать для этого условия"""
+        return [(self.field, keyword) for keyword in self.keywords]
+
+    def test(self, found):
+        """Выполнено ли условие; found — найденные слова каждого поля (RuleTable.find)"""
+        words = found[self.field]
+        return any(keyword in words for keyword in self.keywords)
+
+
+class AllOf:
+    """Выполнены все условия (без условий — всегда истинно)"""
+
+    def __init__(self, *conditions):
+        self.conditions = conditions
+
+    def __repr__(self):
+        return f'{type(self).__name__}({", ".join(map(repr, self.conditions))})'
+
+    def fields(self):
+        return [item for condition in self.conditions for item in condition.fields()]
+
+    def test(self, found):
+        return all(condition.test(found) for condition in self.conditions)
+
+
+class AnyOf(AllOf):
+    """Выполнено хотя бы одно из условий"""
+
+    def test(self, found):
+        return any(condition.test(found) for condition in self.conditions)
+
+
+class Not:
+    """Условие не выполнено"""
+
+    def __init__(self, condition):
+        self.condition = condition
+
+    def __repr__(self):
+        return f'Not({self.condition!r})'
+
+    def fields(self):
+        return self.condition.fields()
+
+    def test(self, found):
+        return not self.condition.test(found)
+
+
+ALWAYS = AllOf()
+
+# Правило таблицы: условие и результат (строка или вложенный список правил)
+Rule = namedtuple('Rule', ['when', 'then'])
+
+
+def _rule_fields(rules):
+    for rule in rules:
+        yield from rule.when.fields()
+        if not isinstance(rule.then, str):
+            yield from _rule_fields(rule.then)
+
+
+def _first(rules, found):
+    """Результат первого подходящего правила или None (вложенные списки — рекурсивно)"""
+    for rule in rules:
+        if rule.when.test(found):
+            if isinstance(rule.then, str):
+                return rule.then
+            result = _first(rule.then, found)
+            if result is not None:
+                return result
+    return None
+
+
+class RuleTable:
+    """Таблица правил по приоритету: результат первого подходящего правила или default"""
+
+    def __init__(self, rules, default=None):
+        self.rules = list(rules)
+        self.default = default
+        keywords = {}
+        for field, keyword in _rule_fields(self.rules):
+            keywords.setdefault(field, set()).add(keyword)
+        self.automata = {field: KeywordAutomaton(words) for field, words in keywords.items()}
+
+    def find(self, fields):
+        """Найденные ключевые слова каждого поля: {поле: слова (поддерживают `слово in`)}"""
+        return {field: automaton.find(fields.get(field, ''))
+                for field, automaton in self.automata.items()}
+
+    def match(self, fields):
+        """Результат для полей {поле: текст}"""
+        result = _first(self.rules, self.find(fields))
+        return self.default if result is None else result
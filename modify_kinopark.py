@@ -10,12 +10,14 @@
 import csv
 import random
 
+from csv_sniff import open_csv
+
 def modify_kinopark_file(input_file, output_file):
     """Модифицирует файл Кинопарк"""
     
     # Читаем исходный файл
-    with open(input_file, 'r', encoding='utf-8-sig') as f:
-        reader = csv.DictReader(f)
+    with open_csv(input_file) as (f, csv_format):
+        reader = csv.DictReader(f, delimiter=csv_format.delimiter)
         rows = list(reader)
     
     print(f'Исходное количество квартир: {len(rows)}')
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Разбор чисел из прайс-листов: стоимость и площадь.
+
+Ячейка очищается короткой цепочкой str.replace: единицы (₽, руб, руб.,
+RUB в конце ячейки для стоимости; м², м2 для площади) и обычные пробелы
+удаляются, десятичная запятая становится точкой; неразрывные и тонкие
+пробелы удаляются, только если в ячейке остались не-ASCII символы. Затем
+число разбирает int() или float() — без регулярных выражений и
+посимвольных циклов.
+
+Режимы:
+- обычный — результат тот же, что у прежних функций (normalize_price
+  выбрасывает посторонние символы, площадь — единицы в любом месте),
+  неразборчивая ячейка даёт None;
+- строгий (strict=True) — ячейка должна быть числом вида -123, 45.6
+  (после удаления пробелов и суффикса), иначе NumberParseError; пустая
+  ячейка — отсутствующее значение. price_ingest разбирает ячейки строго
+  и учитывает нестандартные, но разобранные прежним способом ячейки в
+  предупреждениях загрузки.
+
+Сравнение с прежними функциями на CSV из репозитория и на наборе
+отформатированных ячеек (FORMATTED_PRICES, FORMATTED_AREAS):
+    python number_parsing.py [файлы CSV...]
+"""
+
+
+# Суффиксы единиц стоимости в конце ячейки (варианты регистра перечислены: endswith быстрее lower())
+PRICE_SUFFIXES = ('₽', 'руб.', 'руб', 'Руб.', 'Руб', 'РУБ.', 'РУБ', 'RUB', 'rub', 'Rub')
+
+# Символы числа в строгом режиме: после strip(NUMBER_CHARS) от числа ничего не остаётся
+NUMBER_CHARS = '0123456789.-'
+
+
+class NumberParseError(ValueError):
+    """Нестандартная ячейка при строгом разборе: cells — список (номер, значение)"""
+
+    def __init__(self, kind, cells):
+        self.kind = kind
+        self.cells = cells
+        shown = ', '.join(f"{index}: '{value}'" for index, value in cells[:5])
+        more = f" и ещё {len(cells) - 5}" if len(cells) > 5 else ''
+        super().__init__(f"Неверный формат ({kind}): {shown}{more}")
+
+
+def clean_number(text, suffixes):
+    """Строка числа без суффикса единиц, без пробелов и с точкой (может остаться мусор)"""
+    if text.endswith(suffixes):
+        for suffix in suffixes:
+            if text.endswith(suffix):
+                text = text[:-len(suffix)]
+                break
+    text = text.replace(' ', '').replace(',', '.')
+    if not text.isascii():
+        text = text.replace('\xa0', '').replace('\u2009', '').replace('\u202f', '')
+    return text
+
+
+def _lenient_price(text):
+    """Разбор нестандартной стоимости так же, как прежний normalize_price"""
+    text = text.strip().replace('₽', '').replace('руб', '').replace('RUB', '')
+    text = text.replace(' ', '').replace('\xa0', '').replace('\u2009', '').replace(',', '.')
+    # Убираем все оставшиеся нечисловые символы кроме точки и минуса
+    text = ''.join(c for c in text if c.isdigit() or c in '.-')
+    if not text or text in ('.', '-'):
+        return None
+    try:
+        return int(float(text))
+    except ValueError:
+        return None
+
+
+def parse_price(value, strict=False):
+    """Стоимость в рублях (целое) или None для пустой/неразборчивой ячейки.
+
+    В строгом режиме неразборчивая ячейка — NumberParseError.
+    """
+    if not value:
+        return None
+    text = value if isinstance(value, str) else str(value)
+    # Самый частый случай — целое без разделителей
+    if text.isdigit() and text.isascii():
+        return int(text)
+    cleaned = clean_number(text.strip(), PRICE_SUFFIXES)
+    # Целое разбирает int() (он не примет "1e5" или "inf", которые прежний разбор читал иначе);
+    # дробное и любое в строгом режиме — только из цифр, точки и минуса
+    if not cleaned.strip(NUMBER_CHARS) or not (strict or '.' in cleaned):
+        try:
+            return int(cleaned) if '.' not in cleaned else int(float(cleaned))
+        except ValueError:
+            pass
+    if not text.strip():
+        return None
+    if strict:
+        raise NumberParseError('стоимость', [(0, value)])
+    return _lenient_price(text)
+
+
+def parse_area(value, strict=False):
+    """Площадь в м² (float) или None для пустой/неразборчивой ячейки.
+
+    В строгом режиме неразборчивая ячейка — NumberParseError.
+    """
+    if not value:
+        return None
+    text = value if isinstance(value, str) else str(value)
+    if strict:
+        text = text.strip()
+    # Как прежняя загрузка CSV (единицы удаляются в любом месте), плюс тонкие пробелы;
+    # в ASCII-ячейке нет ни единиц, ни особых пробелов
+    if text.isascii():
+        cleaned = text.replace(' ', '').replace(',', '.')
+    else:
+        cleaned = text.replace('м²', '').replace('м2', '').replace(' ', '').replace('\xa0', '')
+        cleaned = cleaned.replace('\u2009', '').replace('\u202f', '').replace(',', '.')
+    # Строгий режим: только цифры, точка и минус, единицы — только в конце ячейки
+    if strict and (cleaned.strip(NUMBER_CHARS) or 0 <= text.find('м') < len(text) - 2):
+        raise NumberParseError('площадь', [(0, value)])
+    try:
+        return float(cleaned)
+    except ValueError:
+        if strict and text:
+            raise NumberParseError('площадь', [(0, value)]) from None
+        return None
+
+
+# Отформатированные ячейки для benchmark: тонкие и неразрывные пробелы, единицы, запятые
+FORMATTED_PRICES = [
+    '12 345 678 ₽', '12\xa0345\xa0678 ₽', '12\u2009345\u2009678 руб.', '9\u202f540\u202f854 руб',
+    '15 000 000 RUB', '7 800 000', '11 250 000,50 ₽', '8 900 000 руб.',
+]
+FORMATTED_AREAS = [
+    '45,67 м²', '45.67 м2', '112,3\xa0м²', '38 м2', '1\u2009204,5 м²', '1\u202f012 м2', '65 м²', '52,10',
+]
+
+
+def _legacy_normalize_price(price):
+    """Прежний app.normalize_price (для сравнения в benchmark)"""
+    if not price or str(price).strip() == '':
+        return None
+    try:
+        price_str = str(price).strip()
+        price_str = price_str.replace('₽', '').replace('руб', '').replace('руб.', '').replace('RUB', '')
+        price_str = price_str.replace(' ', '').replace('\xa0', '').replace('\u2009', '')
+        price_str = price_str.replace(',', '.')
+        price_str = ''.join(c for c in price_str if c.isdigit() or c in '.-')
+        if not price_str or price_str in ['.', '-']:
+            return None
+        return int(float(price_str))
+    except (ValueError, TypeError):
+        return None
+
+
+def _legacy_parse_area(value):
+    """Прежний разбор площади при загрузке CSV (для сравнения в benchmark)"""
+    area_clean = value.replace('м²', '').replace('м2', '').replace(' ', '').replace('\xa0', '')
+    return float(area_clean.replace(',', '.'))
+
+
+def benchmark(paths, repeats=20, formatted_copies=500):
+    """Сравнивает прежний и новый разбор стоимости и площади на столбцах CSV-файлов
+    и на отформатированных ячейках (FORMATTED_PRICES, FORMATTED_AREAS)"""
+    import csv
+    import time
+
+    prices = []
+    areas = []
+    for path in paths:
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f)
+            header = [h.strip().lower() for h in next(reader, [])]
+            price_idx = next((i for i, h in enumerate(header) if h == 'стоимость'), None)
+            area_idx = next((i for i, h in enumerate(header) if 'площадь' in h and 'общ' in h), None)
+            for row in reader:
+                if price_idx is not None and price_idx < len(row):
+                    prices.append(row[price_idx])
+                if area_idx is not None and area_idx < len(row) and row[area_idx].strip():
+                    areas.append(row[area_idx])
+
+    def timed(func):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            result = func()
+        return (time.perf_counter() - start) / repeats * 1000, result
+
+    def legacy_area(value):
+        try:
+            return _legacy_parse_area(value)
+        except ValueError:
+            return None
+
+    # Прежняя загрузка не удаляла тонкие пробелы в площади (давала None) — сверяем с ожидаемыми числами
+    expected_areas = [45.67, 45.67, 112.3, 38.0, 1204.5, 1012.0, 65.0, 52.1]
+
+    rows = [
+        ('стоимость (CSV)', prices, _legacy_normalize_price, parse_price, None),
+        ('площадь (CSV)', areas, legacy_area, parse_area, None),
+        ('стоимость (форматированные)', FORMATTED_PRICES * formatted_copies, _legacy_normalize_price,
+         parse_price, None),
+        ('площадь (форматированные)', FORMATTED_AREAS * formatted_copies, legacy_area, parse_area,
+         expected_areas * formatted_copies),
+    ]
+    identical = True
+    for kind, column, legacy, cell, expected in rows:
+        legacy_ms, legacy_result = timed(lambda: [legacy(v) for v in column])
+        cell_ms, per_cell = timed(lambda: [cell(v) for v in column])
+        same = per_cell == (legacy_result if expected is None else expected)
+        identical = identical and same
+        print(f"{kind}: {len(column)} ячеек; прежний разбор {legacy_ms:.2f} мс, "
+              f"новый {cell_ms:.2f} мс ({cell_ms / max(len(column), 1) * 1000:.2f} мкс/ячейку); "
+              f"совпадает: {same}")
+    return identical
+
+
+if __name__ == '__main__':
+    import glob
+    import sys
+    files = sys.argv[1:] or sorted(glob.glob('*.csv'))
+    sys.exit(0 if benchmark(files) else 1)
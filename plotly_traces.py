@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Построение графиков Plotly «цена за м² по ЖК» без plotly.graph_objects.
+
+go.Figure проверяет каждое свойство каждого следа валидаторами Plotly, а
+to_dict() ещё раз обходит и копирует всю фигуру. Здесь следы и layout
+собираются сразу готовыми словарями (в том же виде, что даёт
+fig.to_dict()), из пакетной статистики групп. Шаблон оформления Plotly,
+который go.Figure добавляет в layout, берётся один раз и переиспользуется.
+
+Запуск модуля как скрипта сравнивает результат с go.Figure и замеряет время:
+    python plotly_traces.py [число ЖК] [число типов площади] [повторы]
+"""
+
+import threading
+
+try:
+    import plotly.io as pio
+    PLOTLY_AVAILABLE = True
+except ImportError:
+    PLOTLY_AVAILABLE = False
+
+
+# Цвета осей
+LEFT_COLOR = '#42A5F5'   # цена за м² — голубой
+RIGHT_COLOR = '#FB8C00'  # количество — оранжевый
+
+# Цвет обводки — немного темнее заливки
+EDGE_COLORS = {
+    '#A5D6A7': '#66BB6A',
+    '#90CAF9': '#42A5F5',
+}
+DEFAULT_EDGE_COLOR = '#546E7A'
+
+BAR_HOVERTEMPLATE = (
+    "%{customdata[3]}<br>"
+    "Мин: %{customdata[0]:,.0f} руб.<br>"
+    "Сред: %{customdata[1]:,.0f} руб.<br>"
+    "Макс: %{customdata[2]:,.0f} руб.<extra></extra>"
+)
+
+_template = None
+_template_lock = threading.Lock()
+
+
+def default_template():
+    """Шаблон оформления Plotly по умолчанию в виде словаря (как в fig.to_dict()['layout']).
+
+    Словарь общий для всех графиков и только сериализуется — изменять его нельзя.
+    """
+    global _template
+    if _template is None:
+        with _template_lock:
+            if _template is None:
+                _template = pio.templates[pio.templates.default].to_plotly_json()
+    return _template
+
+
+def bar_trace(x, name, color, q1, q3, min_val, mean_val, max_val):
+    """Прямоугольник [Q1, Q3] как столбец"""
+    return {
+        'base': [q1],
+        'customdata': [[min_val, mean_val, max_val, name]],
+        'hovertemplate': BAR_HOVERTEMPLATE,
+        'marker': {
+            'color': color,
+            'line': {'color': EDGE_COLORS.get(color, DEFAULT_EDGE_COLOR), 'width': 1.4}
+        },
+        'showlegend': False,
+        'width': 0.4,
+        'x': [x],
+        'y': [max(q3 - q1, 0)],
+        'type': 'bar'
+    }
+
+
+def mean_line_trace(x, color, mean_val):
+    """Линия среднего значения поверх столбца"""
+    return {
+        'hoverinfo': 'skip',
+        'line': {'color': EDGE_COLORS.get(color, DEFAULT_EDGE_COLOR), 'width': 1.6},
+        'mode': 'lines',
+        'showlegend': False,
+        'x': [x - 0.2, x + 0.2],
+        'y': [mean_val, mean_val],
+        'type': 'scatter'
+    }
+
+
+def count_trace(x, name, count):
+    """Точка количества квартир (правая ось)"""
+    return {
+        'hovertemplate': f"{name}<br>Количество квартир: %{{y}}<extra></extra>",
+        'marker': {'color': RIGHT_COLOR, 'size': 9},
+        'mode': 'markers',
+        'showlegend': False,
+        'x': [x],
+        'y': [count],
+        'yaxis': 'y2',
+        'type': 'scatter'
+    }
+
+
+def area_type_layout(labels, counts):
+    """Layout графика: ЖК по оси X, цена за м² слева, количество квартир справа"""
+    # Разумный диапазон оси количества, чтобы точки целиком попадали в область графика;
+    # нижняя граница чуть ниже нуля, чтобы маркеры не "обрезались" по низу
+    max_count = max([c for c in counts if c > 0], default=1)
+    y2_range = [-max(1, max_count * 0.1), max_count * 1.1]
+
+    return {
+        'template': default_template(),  # общий словарь: не изменять
+        'xaxis': {
+            'tickmode': 'array',
+            'tickvals': list(range(1, len(labels) + 1)),
+            'ticktext': list(labels),
+            'tickangle': -90,
+            'tickfont': {'size': 10}
+        },
+        'yaxis': {
+            'title': {'text': 'Цена за м², руб.', 'font': {'color': LEFT_COLOR}},
+            'tickfont': {'color': LEFT_COLOR},
+            'tickformat': ',.0f',
+            'gridcolor': 'rgba(0,0,0,0.1)'
+        },
+        'yaxis2': {
+            'title': {'text': 'Количество квартир', 'font': {'color': RIGHT_COLOR}},
+            'tickfont': {'color': RIGHT_COLOR},
+            'dtick': 20,
+            'range': y2_range,
+            'overlaying': 'y',
+            'side': 'right'
+        },
+        'bargap': 0.3,
+        'plot_bgcolor': 'white',
+        'paper_bgcolor': 'white',
+        'margin': {'l': 60, 'r': 60, 't': 20, 'b': 120},
+        'height': 500,
+        'showlegend': False,
+        'hovermode': 'closest'
+    }
+
+
+def area_type_figure(labels, colors, counts, batch, first_group):
+    """Данные и layout графика одного типа площади.
+
+    batch — group_stats.GroupStatistics, в котором полосы графика идут подряд
+    начиная с first_group (по одной группе на ЖК, в порядке labels).
+    Возвращает (data, layout) — то же, что fig.to_dict()['data'] и ['layout'].
+    """
+    data = []
+    for i, (name, color, count) in enumerate(zip(labels, colors, counts)):
+        k = first_group + i
+        x = i + 1
+        mean_val = batch.mean[k].item()
+        data.append(bar_trace(
+            x, name, color,
+            batch.q1[k].item(), batch.q3[k].item(),
+            batch.min[k].item(), mean_val, batch.max[k].item()
+        ))
+        data.append(mean_line_trace(x, color, mean_val))
+        if count > 0:
+            data.append(count_trace(x, name, count))
+    return data, area_type_layout(labels, counts)
+
+
+def graph_objects_figure(labels, colors, counts, batch, first_group):
+    """Тот же график через plotly.graph_objects (эталон для сравнения и замера)"""
+    import plotly.graph_objects as go
+
+    data, layout = area_type_figure(labels, colors, counts, batch, first_group)
+    fig = go.Figure()
+    for trace in data:
+        trace = dict(trace)
+        trace_type = trace.pop('type')
+        fig.add_trace(go.Bar(**trace) if trace_type == 'bar' else go.Scatter(**trace))
+    layout = dict(layout)
+    del layout['template']
+    fig.update_layout(**layout)
+    return fig.to_dict()['data'], fig.to_dict()['layout']
+
+
+def benchmark(objects=12, area_types=10, repeats=5):
+    """Сравнивает построение через go.Figure и готовыми словарями; печатает время"""
+    import json
+    import random
+    import time
+
+    import numpy as np
+    from group_stats import batch_statistics, pack_groups
+
+    rng = random.Random(0)
+    charts = []
+    values = []
+    for _ in range(area_types):
+        labels = [f'ЖК {i}' for i in range(objects)]
+        colors = ['#A5D6A7' if i == 0 else '#90CAF9' for i in range(objects)]
+        counts = [rng.randint(0, 80) for _ in range(objects)]
+        charts.append((labels, colors, counts))
+        values.extend(np.array([rng.uniform(150000, 450000) for _ in range(rng.randint(1, 60))])
+                      for _ in range(objects))
+    batch = batch_statistics(*pack_groups(values))
+
+    def run(build):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            result = []
+            for n, (labels, colors, counts) in enumerate(charts):
+                result.append(build(labels, colors, counts, batch, n * objects))
+        return (time.perf_counter() - start) / repeats, result
+
+    default_template()  # шаблон загружается один раз, не учитываем в замере
+    go_seconds, go_result = run(graph_objects_figure)
+    fast_seconds, fast_result = run(area_type_figure)
+    identical = json.dumps(go_result, sort_keys=True) == json.dumps(fast_result, sort_keys=True)
+
+    print(f"Графиков: {area_types}, ЖК на графике: {objects}")
+    print(f"go.Figure + to_dict: {go_seconds * 1000:.1f} мс")
+    print(f"готовые словари:     {fast_seconds * 1000:.1f} мс")
+    print(f"ускорение: {go_seconds / max(fast_seconds, 1e-9):.1f}x, результат совпадает: {identical}")
+    return identical
+
+
+if __name__ == '__main__':
+    import sys
+    args = [int(a) for a in sys.argv[1:4]]
+    sys.exit(0 if benchmark(*args) else 1)
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Потоковая загрузка прайс-листов (CSV) для веб-приложения.
+
+Сопоставление колонок выполняется один раз на файл: обязательные поля,
+столбец "100% стоимость" и дополнительные характеристики ЖК. Дальше
+строки проходят через заранее собранный извлекатель по индексам колонок,
+без нормализации ключей на каждой строке.
+"""
+
+import csv
+import os
+import time
+
+from number_parsing import NumberParseError, parse_area
+
+
+# Обязательные колонки нового формата
+REQUIRED_FIELDS = ['Название объекта', 'Тип площади', 'Площадь общая', 'Стоимость']
+
+# Дополнительные характеристики ЖК (если есть в файле)
+EXTRA_FIELD_NAMES = ['Застройщик', 'Район', 'Класс', 'Этажность', 'Срок сдачи', 'Тип дома', 'Отделка']
+
+# Альтернативные названия колонок (в сжатом виде: без пробелов, нижний регистр).
+# Например, "Этажность" в файлах может называться "Этажей"
+EXTRA_FIELD_ALIASES = {
+    'Этажность': ['этажей'],
+}
+
+
+def normalize_header(name):
+    """Нормализует название колонки: убирает переносы строк, невидимые символы и лишние пробелы"""
+    if not name:
+        return ''
+    normalized = name.replace('\n', ' ').replace('\r', ' ').replace('\ufeff', '').replace('\u200b', '')
+    return ' '.join(normalized.split()).strip()
+
+
+def compact_header(name):
+    """Сжатая форма названия колонки для сравнения: без пробелов и в нижнем регистре"""
+    return ''.join(normalize_header(name).split()).lower()
+
+
+def is_100_percent_price_object(object_name):
+    """Для ЖК "Залив 1" и "Аквилон ZaLive" используется столбец "100% стоимость" вместо "Стоимость" """
+    if not object_name:
+        return False
+    name_lower = object_name.lower()
+    return ('залив' in name_lower and '1' in object_name) or 'аквилон' in name_lower
+
+
+class ColumnMapping:
+    """Сопоставление колонок файла с полями квартиры (индексы в строке CSV).
+
+    Строится один раз по заголовку файла через resolve().
+    """
+
+    def __init__(self, fieldnames, required, price_100_index, extras):
+        self.fieldnames = fieldnames
+        self.required = required  # обязательное поле -> индекс колонки
+        self.price_100_index = price_100_index  # индекс "100% стоимость" или None
+        self.extras = extras  # список (название характеристики, индекс колонки)
+        self.width = len(fieldnames)
+
+    @classmethod
+    def resolve(cls, original_fieldnames, filename=''):
+        """Находит индексы всех нужных колонок по заголовку файла.
+
+        Бросает ValueError, если не хватает обязательных полей.
+        """
+        original_fieldnames = list(original_fieldnames or [])
+        fieldnames = [normalize_header(f) for f in original_fieldnames]
+        compact = [compact_header(f) for f in fieldnames]
+
+        # Если после нормализации несколько колонок совпали, значение берётся из последней
+        # (так же вела себя загрузка через словарь нормализованных ключей)
+        last_index = {}
+        for i, norm in enumerate(fieldnames):
+            if norm:
+                last_index[norm] = i
+
+        def find_column(candidates):
+            for i, comp in enumerate(compact):
+                if comp and comp in candidates:
+                    return last_index[fieldnames[i]]
+            return None
+
+        required = {}
+        missing_fields = []
+        for required_field in REQUIRED_FIELDS:
+            index = find_column({compact_header(required_field)})
+            if index is None:
+                missing_fields.append(required_field)
+            else:
+                required[required_field] = index
+
+        if missing_fields:
+            # Показываем доступные поля для отладки
+            available_fields = ', '.join(fieldnames) if fieldnames else 'нет полей'
+            original_fields = ', '.join([f for f in original_fieldnames if f]) if original_fieldnames else 'нет полей'
+            found_fields_str = ', '.join([f"{k} -> {original_fieldnames[v]}" for k, v in required.items()])
+            error_msg = (f"В файле '{filename}' отсутствуют обязательные поля: {', '.join(missing_fields)}. "
+                         f"Найдены поля (нормализованные): {available_fields}. "
+                         f"Оригинальные поля: {original_fields}. Маппинг найденных: {found_fields_str}")
+            raise ValueError(error_msg)
+
+        # Столбец "100% стоимость": варианты "100%стоимость", "стоимостьпри100%" и т.д.
+        price_100_index = None
+        for i, comp in enumerate(compact):
+            if '100' in comp and ('стоимость' in comp or 'cost' in comp):
+                price_100_index = last_index[fieldnames[i]]
+                break
+
+        extras = []
+        for extra_name in EXTRA_FIELD_NAMES:
+            candidates = {compact_header(extra_name)}
+            candidates.update(EXTRA_FIELD_ALIASES.get(extra_name, []))
+            index = find_column(candidates)
+            if index is not None:
+                extras.append((extra_name, index))
+
+        return cls(fieldnames, required, price_100_index, extras)
+
+
+# Причины пропуска строк и предупреждения при загрузке
+ROW_ISSUES = {
+    'empty_object': "пустое поле 'Название объекта'",
+    'empty_area_type': "пустое поле 'Тип площади'",
+    'bad_area_type': "не удалось нормализовать 'Тип площади'",
+    'empty_area': "пустое поле 'Площадь общая'",
+    'bad_area': "неверный формат 'Площадь общая'",
+    'bad_price': "неверный формат 'Стоимость'",
+    'loose_area': "нестандартный формат 'Площадь общая', число выделено из текста",
+    'loose_price': "нестандартный формат 'Стоимость', число выделено из текста",
+    'no_price_100': "не найден столбец '100% стоимость', используется 'Стоимость'",
+}
+
+# Уровень вывода сводки загрузки (INGEST_LOG_LEVEL):
+# none — ничего, summary — строка на файл и по строке на причину, samples — с примерами строк
+INGEST_LOG_LEVELS = ('none', 'summary', 'samples')
+INGEST_LOG_LEVEL = os.environ.get('INGEST_LOG_LEVEL', 'summary').strip().lower()
+
+
+class Diagnostics:
+    """Сводка проблем: причина -> количество и первые max_samples примеров"""
+
+    def __init__(self, messages=None, max_samples=5):
+        self.messages = messages or {}
+        self.max_samples = max_samples
+        self.counts = {}
+        self.samples = {}
+
+    def add(self, reason, sample=None):
+        count = self.counts.get(reason, 0)
+        self.counts[reason] = count + 1
+        if count < self.max_samples and sample is not None:
+            self.samples.setdefault(reason, []).append(sample)
+
+    def merge(self, other):
+        """Добавляет сводку other так, как если бы её проблемы добавлялись сюда по порядку"""
+        for reason, count in other.counts.items():
+            before = self.counts.get(reason, 0)
+            self.counts[reason] = before + count
+            free = self.max_samples - min(before, self.max_samples)
+            samples = other.samples.get(reason, [])[:free]
+            if samples:
+                self.samples.setdefault(reason, []).extend(samples)
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def __bool__(self):
+        return bool(self.counts)
+
+    def to_dict(self):
+        return {
+            reason: {
+                'message': self.messages.get(reason, reason),
+                'count': count,
+                'samples': self.samples.get(reason, []),
+            }
+            for reason, count in self.counts.items()
+        }
+
+    @staticmethod
+    def _format_sample(sample):
+        if isinstance(sample, dict) and 'row' in sample:
+            value = f" '{sample['value']}'" if 'value' in sample else ''
+            return f"строка {sample['row']}{value}"
+        return str(sample)
+
+    def lines(self, with_samples=False):
+        """Строки сводки для вывода: по одной на причину"""
+        result = []
+        for reason, count in self.counts.items():
+            line = f"  {self.messages.get(reason, reason)}: {count}"
+            if with_samples and self.samples.get(reason):
+                line += f" (например: {', '.join(self._format_sample(s) for s in self.samples[reason])})"
+            result.append(line)
+        return result
+
+
+class IngestStats:
+    """Счётчики загрузки одного файла: строки, пропуски (с причинами) и пропускная способность"""
+
+    def __init__(self, filename=''):
+        self.filename = filename
+        self.rows_total = 0
+        self.rows_loaded = 0
+        self.rows_skipped = 0
+        self.seconds = 0.0
+        self.skipped = Diagnostics(ROW_ISSUES)
+        self.warnings = Diagnostics(ROW_ISSUES)
+
+    def skip(self, reason, row_num, value=None):
+        """Учитывает пропущенную строку: причина, номер строки и (необязательно) значение поля"""
+        self.rows_skipped += 1
+        self.skipped.add(reason, {'row': row_num, 'value': value} if value is not None else {'row': row_num})
+
+    def warn(self, reason, row_num, value=None):
+        """Учитывает предупреждение по строке, которая всё же загружена"""
+        self.warnings.add(reason, {'row': row_num, 'value': value} if value is not None else {'row': row_num})
+
+    @property
+    def rows_per_second(self):
+        return self.rows_total / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            'filename': self.filename,
+            'rows_total': self.rows_total,
+            'rows_loaded': self.rows_loaded,
+            'rows_skipped': self.rows_skipped,
+            'seconds': round(self.seconds, 4),
+            'rows_per_second': round(self.rows_per_second, 1),
+            'skipped': self.skipped.to_dict(),
+            'warnings': self.warnings.to_dict(),
+        }
+
+    def __str__(self):
+        return (f"Загрузка '{self.filename}': {self.rows_loaded} из {self.rows_total} строк "
+                f"за {self.seconds:.3f} с ({self.rows_per_second:,.0f} строк/с)")
+
+
+def report_diagnostics(title, diagnostics, level=None):
+    """Выводит сводку Diagnostics одним блоком: заголовок и строка на причину"""
+    level = level or INGEST_LOG_LEVEL
+    if level == 'none' or not diagnostics:
+        return
+    print('\n'.join([title] + diagnostics.lines(with_samples=level == 'samples')))
+
+
+def report(stats, level=None):
+    """Выводит сводку загрузки файла (уровень — INGEST_LOG_LEVEL): не больше блока на файл"""
+    level = level or INGEST_LOG_LEVEL
+    if level == 'none':
+        return
+    print(stats)
+    report_diagnostics(f"Предупреждение: пропущено строк: {stats.rows_skipped}", stats.skipped, level)
+    report_diagnostics("Предупреждения по загруженным строкам:", stats.warnings, level)
+
+
+def iter_apartments(rows, mapping, normalize_area_type, normalize_price, stats=None):
+    """Генератор записей квартир из строк CSV (списков значений).
+
+    rows — итератор строк без заголовка; нумерация строк начинается с 2.
+    Пропущенные строки и предупреждения учитываются в stats (IngestStats).
+    normalize_price(value, strict=False) — как number_parsing.parse_price:
+    числа разбираются строго, а нестандартная ячейка, из которой прежний
+    разбор всё же выделил число, загружается с предупреждением.
+    """
+    if stats is None:
+        stats = IngestStats()
+    object_idx = mapping.required['Название объекта']
+    area_type_idx = mapping.required['Тип площади']
+    total_area_idx = mapping.required['Площадь общая']
+    price_idx = mapping.required['Стоимость']
+    price_100_idx = mapping.price_100_index
+    extras = mapping.extras
+    width = mapping.width
+
+    row_num = 1
+    for row in rows:
+        if not row:
+            # Пустые строки csv.DictReader тоже пропускал без нумерации
+            continue
+        row_num += 1
+        stats.rows_total += 1
+        if len(row) < width:
+            row = row + [''] * (width - len(row))
+
+        object_name = row[object_idx].strip().replace('\n', ' ').replace('\r', ' ').strip()
+        area_type = row[area_type_idx].strip().replace('\n', ' ').replace('\r', ' ').strip()
+        total_area = row[total_area_idx].strip().replace('\n', ' ').replace('\r', ' ').strip()
+
+        price_str = ''
+        use_100_percent_price = is_100_percent_price_object(object_name)
+        if use_100_percent_price and price_100_idx is not None:
+            price_str = row[price_100_idx].strip()
+        # Если не нашли "100% стоимость" или это не "Залив 1"/"Аквилон", используем обычный столбец "Стоимость"
+        if not price_str:
+            price_str = row[price_idx].strip()
+        if use_100_percent_price and not price_str:
+            stats.warn('no_price_100', row_num, object_name)
+        price_str = price_str.replace('\n', ' ').replace('\r', ' ').strip()
+
+        # Валидация полей
+        if not object_name:
+            stats.skip('empty_object', row_num)
+            continue
+
+        if not area_type:
+            stats.skip('empty_area_type', row_num)
+            continue
+
+        # Нормализуем тип площади к единому формату
+        area_type = normalize_area_type(area_type)
+        if not area_type:
+            stats.skip('bad_area_type', row_num)
+            continue
+
+        if not total_area:
+            stats.skip('empty_area', row_num)
+            continue
+
+        try:
+            area_float = parse_area(total_area, strict=True)
+        except NumberParseError:
+            area_float = parse_area(total_area)
+            if area_float is not None:
+                stats.warn('loose_area', row_num, total_area)
+        if area_float is None:
+            stats.skip('bad_area', row_num, total_area)
+            continue
+
+        try:
+            price_value = normalize_price(price_str, strict=True)
+        except NumberParseError:
+            price_value = normalize_price(price_str)
+            if price_value is not None:
+                stats.warn('loose_price', row_num, price_str)
+        if price_value is None:
+            stats.skip('bad_price', row_num, price_str)
+            continue
+
+        apt_record = {
+            'Название объекта': object_name,
+            'Тип площади': area_type,
+            'Площадь общая': area_float,
+            'Стоимость': price_value
+        }
+        # Добавляем характеристики только если они непустые
+        for extra_name, extra_idx in extras:
+            val = row[extra_idx].strip()
+            if val != '':
+                apt_record[extra_name] = val
+
+        stats.rows_loaded += 1
+        yield apt_record
+
+
+def ingest_csv(stream, normalize_area_type, normalize_price, filename='', stats=None, collect=list,
+               delimiter=','):
+    """Загружает квартиры из текстового потока CSV.
+
+    collect получает генератор записей и собирает результат (по умолчанию —
+    список словарей, для колоночной таблицы — ApartmentTable.from_records).
+    delimiter — разделитель колонок (см. csv_sniff).
+    Возвращает (результат collect, IngestStats). Бросает ValueError при
+    отсутствии обязательных полей или ошибке разбора файла.
+    """
+    if stats is None:
+        stats = IngestStats(filename)
+    started = time.perf_counter()
+    try:
+        reader = csv.reader(stream, delimiter=delimiter, quoting=csv.QUOTE_MINIMAL)
+        header = next(reader, [])
+        mapping = ColumnMapping.resolve(header, filename)
+        apartments = collect(iter_apartments(reader, mapping, normalize_area_type, normalize_price, stats))
+    except ValueError:
+        # Пробрасываем ошибки валидации наверх
+        raise
+    except Exception as e:
+        raise ValueError(f"Ошибка при загрузке CSV файла '{filename}': {str(e)}")
+    stats.seconds = time.perf_counter() - started
+    return apartments, stats
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Снимки нормализованных прайс-листов для CLI-скриптов.
+
+При первой загрузке CSV нормализованные квартиры сохраняются рядом с
+исходным файлом в колоночном виде:
+- .<имя CSV>.<ключ>.npy  — структурированный массив NumPy (строковые поля
+  хранятся кодами категорий int32, числа — как есть);
+- .<имя CSV>.<ключ>.json — описание: версия, схема, категории строковых
+  полей и подпись исходного файла (размер, mtime, SHA-256).
+
+Следующие запуски открывают .npy через np.load(mmap_mode='r') — без разбора
+текста. Снимок устаревает, если изменились размер или содержимое CSV
+(при изменении только mtime сверяется SHA-256). Ключ отделяет снимки
+скриптов с разными правилами нормализации, а отпечаток кода нормализации
+(normalizer_digest) — снимки, построенные прежней версией правил того же
+скрипта.
+
+Формат .npy, а не .npz или Parquet: массивы внутри .npz нельзя отобразить
+в память, а pyarrow нет в зависимостях проекта.
+"""
+
+import csv
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import types
+
+import numpy as np
+
+from csv_sniff import open_csv
+
+
+SNAPSHOT_VERSION = 1
+
+# Типы полей схемы: строка (категория), целое, число с плавающей точкой
+FIELD_KINDS = {
+    'str': np.int32,
+    'int': np.int64,
+    'float': np.float64,
+}
+
+
+def snapshot_paths(csv_path, key):
+    """Пути файлов снимка: (данные .npy, описание .json)"""
+    csv_path = os.fspath(csv_path)
+    directory, name = os.path.split(csv_path)
+    base = os.path.join(directory, f'.{name}.{key}')
+    return base + '.npy', base + '.json'
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_signature(csv_path, sha256=None):
+    """Подпись исходного файла: размер, mtime и (если передан или нужен) SHA-256"""
+    st = os.stat(csv_path)
+    return {
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'sha256': sha256 if sha256 is not None else file_sha256(csv_path),
+    }
+
+
+class Snapshot:
+    """Колоночные данные снимка: структурированный массив и категории строковых полей"""
+
+    def __init__(self, data, schema, categories, source=None, normalizer=None):
+        self.data = data
+        self.schema = schema  # список (поле, тип)
+        self.kinds = dict(schema)
+        self.categories = categories  # поле -> список значений (код = индекс)
+        self.source = source  # подпись исходного CSV (size, mtime_ns, sha256)
+        self.normalizer = normalizer  # отпечаток кода нормализации строк (normalizer_digest)
+        self._code_maps = {}
+
+    def __len__(self):
+        return len(self.data)
+
+    def column(self, field):
+        """Массив поля (для строковых полей — коды категорий)"""
+        return self.data[field]
+
+    def code(self, field, value):
+        """Код значения строкового поля или -1, если такого значения нет"""
+        code_map = self._code_maps.get(field)
+        if code_map is None:
+            code_map = {v: i for i, v in enumerate(self.categories[field])}
+            self._code_maps[field] = code_map
+        return code_map.get(value, -1)
+
+    def values(self, field, indices=None):
+        """Значения поля списком Python (строки — раскодированные)"""
+        column = self.data[field] if indices is None else self.data[field][indices]
+        if self.kinds[field] == 'str':
+            categories = self.categories[field]
+            return [categories[c] for c in column.tolist()]
+        return column.tolist()
+
+    def where(self, conditions):
+        """Индексы строк, у которых строковые поля равны заданным значениям"""
+        mask = np.ones(len(self.data), dtype=bool)
+        for field, value in conditions.items():
+            mask &= self.data[field] == self.code(field, value)
+        return np.flatnonzero(mask)
+
+    def records(self, fields=None, indices=None):
+        """Строки снимка списком словарей {поле: значение}"""
+        fields = fields or [name for name, _ in self.schema]
+        columns = [self.values(field, indices) for field in fields]
+        return [dict(zip(fields, row)) for row in zip(*columns)]
+
+
+def _global_repr(value):
+    """Устойчивое между запусками представление константы модуля (множества — отсортированными)"""
+    if isinstance(value, (set, frozenset)):
+        return f'{type(value).__name__}({sorted(map(repr, value))})'
+    return repr(value)
+
+
+def _code_names(code):
+    """Глобальные имена, которые использует код (включая вложенные функции и генераторы)"""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _code_names(const)
+    return names
+
+
+def normalizer_digest(normalize_row):
+    """Отпечаток кода нормализации: исходный код normalize_row и функций и констант
+    её модуля, которые она использует (рекурсивно).
+
+    Меняется при любом изменении правил разбора (normalize_rooms, parse_area,
+    словари замен и т.п.), поэтому снимок, построенный прежними правилами, не
+    используется. Модули, классы и встроенные функции в отпечаток не входят.
+    """
+    module = normalize_row.__module__
+    digest = hashlib.sha256()
+    seen = set()
+    functions = [normalize_row]
+    while functions:
+        func = functions.pop()
+        if func.__qualname__ in seen:
+            continue
+        seen.add(func.__qualname__)
+        digest.update(f'def {func.__qualname__}\n{inspect.getsource(func)}\n'.encode('utf-8'))
+        for name in sorted(_code_names(func.__code__)):
+            if name not in func.__globals__ or name in seen:
+                continue
+            value = func.__globals__[name]
+            if isinstance(value, types.FunctionType):
+                if value.__module__ == module:
+                    functions.append(value)
+            elif not isinstance(value, (types.ModuleType, type, types.BuiltinFunctionType)):
+                seen.add(name)
+                digest.update(f'{name} = {_global_repr(value)}\n'.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def build_snapshot(schema, rows):
+    """Собирает Snapshot в памяти из строк-кортежей в порядке полей схемы"""
+    categories = {name: [] for name, kind in schema if kind == 'str'}
+    code_maps = {name: {} for name in categories}
+    columns = {name: [] for name, _ in schema}
+    for row in rows:
+        for (name, kind), value in zip(schema, row):
+            if kind == 'str':
+                code_map = code_maps[name]
+                code = code_map.get(value)
+                if code is None:
+                    code = code_map[value] = len(code_map)
+                    categories[name].append(value)
+                value = code
+            columns[name].append(value)
+
+    dtype = np.dtype([(name, FIELD_KINDS[kind]) for name, kind in schema])
+    data = np.empty(len(columns[schema[0][0]]) if schema else 0, dtype=dtype)
+    for name, _ in schema:
+        data[name] = columns[name]
+    return Snapshot(data, schema, categories)
+
+
+def write_atomic(path, write):
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def save_snapshot(csv_path, key, snapshot, signature=None):
+    """Сохраняет снимок рядом с CSV (данные, затем описание — атомарно)"""
+    data_path, meta_path = snapshot_paths(csv_path, key)
+    meta = {
+        'version': SNAPSHOT_VERSION,
+        'key': key,
+        'normalizer': snapshot.normalizer,
+        'schema': [list(item) for item in snapshot.schema],
+        'rows': len(snapshot),
+        'categories': snapshot.categories,
+        'source': signature or source_signature(csv_path),
+    }
+    write_atomic(data_path, lambda f: np.save(f, snapshot.data, allow_pickle=False))
+    write_atomic(meta_path, lambda f: f.write(json.dumps(meta, ensure_ascii=False).encode('utf-8')))
+
+
+def load_snapshot(csv_path, key, schema, normalizer=None):
+    """Открывает снимок (данные отображаются в память) или None, если его нет или он устарел.
+
+    normalizer — отпечаток кода нормализации (normalizer_digest): снимок,
+    построенный другой версией правил, считается устаревшим.
+    """
+    data_path, meta_path = snapshot_paths(csv_path, key)
+    try:
+        with open(meta_path, 'rb') as f:
+            meta = json.loads(f.read().decode('utf-8'))
+        st = os.stat(csv_path)
+    except (OSError, ValueError):
+        return None
+
+    if (meta.get('version') != SNAPSHOT_VERSION or meta.get('key') != key
+            or meta.get('normalizer') != normalizer
+            or meta.get('schema') != [list(item) for item in schema]):
+        return None
+    source = meta.get('source') or {}
+    if source.get('size') != st.st_size:
+        return None
+    if source.get('mtime_ns') != st.st_mtime_ns:
+        # Файл трогали — сверяем содержимое; если не изменилось, обновляем mtime в описании
+        sha256 = file_sha256(csv_path)
+        if source.get('sha256') != sha256:
+            return None
+        meta['source'] = source_signature(csv_path, sha256)
+        try:
+            write_atomic(meta_path, lambda f: f.write(json.dumps(meta, ensure_ascii=False).encode('utf-8')))
+        except OSError:
+            pass
+
+    try:
+        data = np.load(data_path, mmap_mode='r', allow_pickle=False)
+    except (OSError, ValueError):
+        return None
+    if len(data) != meta.get('rows'):
+        return None
+    return Snapshot(data, [tuple(item) for item in schema], meta.get('categories') or {},
+                    meta['source'], normalizer)
+
+
+def cached_snapshot(csv_path, key, schema, parse, normalizer=None):
+    """Снимок CSV: готовый с диска или построенный заново через parse(csv_path).
+
+    parse возвращает список строк-кортежей в порядке полей схемы или None при
+    ошибке чтения (тогда снимок не сохраняется и возвращается None).
+    normalizer — отпечаток правил разбора, с которыми построен снимок.
+    """
+    snapshot = load_snapshot(csv_path, key, schema, normalizer)
+    if snapshot is not None:
+        return snapshot
+
+    signature = source_signature(csv_path)
+    rows = parse(csv_path)
+    if rows is None:
+        return None
+    snapshot = build_snapshot(schema, rows)
+    snapshot.source = signature
+    snapshot.normalizer = normalizer
+    try:
+        save_snapshot(csv_path, key, snapshot, signature)
+    except OSError as e:
+        print(f"Предупреждение: не удалось сохранить снимок для {csv_path}: {e}")
+    return snapshot
+
+
+def load_csv_snapshot(file_path, key, schema, normalize_row):
+    """Снимок CSV-файла с квартирами; при отсутствии или устаревании — разбор файла.
+
+    normalize_row(row) получает строку csv.DictReader и возвращает кортеж в
+    порядке полей схемы или None, если строку нужно пропустить.
+    """
+    def parse(csv_path):
+        rows = []
+        try:
+            with open_csv(csv_path) as (f, csv_format):
+                reader = csv.DictReader(f, delimiter=csv_format.delimiter)
+                for row in reader:
+                    values = normalize_row(row)
+                    if values is not None:
+                        rows.append(values)
+        except Exception as e:
+            print(f"Ошибка при чтении файла {csv_path}: {e}")
+            return None
+        return rows
+
+    try:
+        return cached_snapshot(file_path, key, schema, parse, normalizer_digest(normalize_row))
+    except OSError as e:
+        print(f"Ошибка при чтении файла {file_path}: {e}")
+        return None
@@ -8,10 +8,17 @@
 """
 
 import csv
+import multiprocessing
+import os
 import re
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from difflib import SequenceMatcher
+
+from csv_sniff import open_csv
+from dedup_state import DedupState, state_path as dedup_state_path
+from task_index import MIN_OVERLAP, NGRAM_SIZE, TitleIndex
+from task_similarity import SimilarityEngine
 
 def normalize_text(text):
     """Нормализация текста для сравнения"""
@@ -29,12 +36,6 @@ def normalize_text(text):
     text = re.sub(r'\s+', ' ', text)
     return text.strip()
 
-def similarity(text1, text2):
-    """Вычисление схожести двух текстов"""
-    if not text1 or not text2:
-        return 0.0
-    return SequenceMatcher(None, text1, text2).ratio()
-
 def parse_date(date_str):
     """Парсинг даты из формата CSV"""
     if not date_str or date_str == "":
@@ -60,14 +61,147 @@ def parse_date(date_str):
 def read_csv_file(filepath):
     """Чтение CSV файла"""
     tasks = []
-    with open(filepath, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
+    with open_csv(filepath) as (f, csv_format):
+        reader = csv.DictReader(f, delimiter=csv_format.delimiter)
         for row in reader:
             tasks.append(row)
     return tasks
 
-def find_duplicates(tasks, title_threshold=0.70, description_threshold=0.5):
-    """Поиск дубликатов задач"""
+# Правило «подстроки»: оба заголовка длиннее SUBSTRING_MIN_LENGTH символов, и более
+# короткий входит в длинный или длинный начинается с его первых SUBSTRING_PREFIX_SHARE
+SUBSTRING_MIN_LENGTH = 20
+SUBSTRING_PREFIX_SHARE = 0.8
+
+def is_duplicate(item1, item2, title_threshold=0.70, description_threshold=0.5, engine=None):
+    """Считать ли две задачи дубликатами; item — нормализованные (заголовок, описание).
+
+    Похожесть считается через SimilarityEngine: пары, которые заведомо не
+    достигают порогов, отсеиваются без полного SequenceMatcher.ratio().
+    """
+    engine = engine or SimilarityEngine()
+    title1, desc1 = item1
+    title2, desc2 = item2
+
+    # Проверяем, является ли один заголовок подстрокой другого
+    # (для случаев типа "Добавить настройку..." и "Добавить настройку... в Галерее")
+    if len(title1) > SUBSTRING_MIN_LENGTH and len(title2) > SUBSTRING_MIN_LENGTH:  # Только для достаточно длинных заголовков
+        shorter = title1 if len(title1) < len(title2) else title2
+        longer = title1 if len(title1) >= len(title2) else title2
+        # Если более короткий заголовок составляет большую часть длинного
+        if shorter in longer or longer.startswith(shorter[:int(len(shorter) * SUBSTRING_PREFIX_SHARE)]):
+            return True
+
+    # Проверяем схожесть заголовков; ниже наименьшего из порогов она не нужна
+    title_sim = engine.ratio_at_least(title1, title2, min(0.9, title_threshold))
+    if title_sim is None:
+        return False
+
+    # Если заголовки очень похожи (высокий порог)
+    if title_sim >= 0.9:
+        return True
+    # Если заголовки похожи (средний порог) и есть описание
+    if title_sim >= title_threshold:
+        # Проверяем описание, если оно есть
+        if desc1 and desc2:
+            # Если и заголовки, и описания похожи
+            return engine.ratio_at_least(desc1, desc2, description_threshold) is not None
+        # Если описания нет, но заголовки очень похожи
+        return title_sim >= 0.80
+    return False
+
+def candidate_pairs(normalized_data, brute_force=False, only=None):
+    """Пары задач (i, j), i < j, которые нужно сравнить.
+
+    По умолчанию — кандидаты из индекса 3-грамм заголовков (task_index);
+    brute_force=True — все пары задач с непустыми заголовками;
+    only — номера задач: только пары, в которых участвует хотя бы одна из них.
+    """
+    titles = [title for title, _ in normalized_data]
+    if brute_force:
+        with_title = [i for i, title in enumerate(titles) if title]
+        only = set(with_title if only is None else only)
+        return [(i, j) for k, i in enumerate(with_title) for j in with_title[k + 1:]
+                if i in only or j in only]
+    index = TitleIndex(
+        titles,
+        # Длинный заголовок начинается с первых 80% короткого — значит, совпадают
+        # первые int(21 * 0.8) = 16 символов
+        prefix_length=int((SUBSTRING_MIN_LENGTH + 1) * SUBSTRING_PREFIX_SHARE),
+        prefix_min_length=SUBSTRING_MIN_LENGTH,
+    )
+    return index.candidate_pairs(only)
+
+def dedup_settings(title_threshold, description_threshold, brute_force):
+    """Настройки, при которых получены рёбра сохранённого состояния (DedupState)"""
+    return {
+        'title_threshold': title_threshold,
+        'description_threshold': description_threshold,
+        'candidates': 'all' if brute_force else f'ngram{NGRAM_SIZE}:{MIN_OVERLAP}',
+        'substring': [SUBSTRING_MIN_LENGTH, SUBSTRING_PREFIX_SHARE],
+    }
+
+# Данные задач в процессе пула: (нормализованные задачи, порог заголовка, порог описания)
+_worker_data = None
+
+def _init_worker(normalized_data, title_threshold, description_threshold):
+    global _worker_data
+    _worker_data = (normalized_data, title_threshold, description_threshold)
+
+def _score_shard(pairs):
+    """Пары-дубликаты из части пар-кандидатов и счётчики отсева (выполняется в процессе пула)"""
+    normalized_data, title_threshold, description_threshold = _worker_data
+    engine = SimilarityEngine()
+    edges = [(i, j) for i, j in pairs
+             if is_duplicate(normalized_data[i], normalized_data[j], title_threshold, description_threshold, engine)]
+    return edges, dict(engine.counters)
+
+def score_pairs(normalized_data, pairs, title_threshold=0.70, description_threshold=0.5, workers=1,
+                engine=None):
+    """Пары-дубликаты (рёбра) среди pairs в том же порядке, что и pairs.
+
+    Счётчики отсева пар накапливаются в engine (SimilarityEngine).
+    workers > 1 — пары делятся на непрерывные части, которые сравниваются в
+    пуле процессов; результаты частей склеиваются по порядку, поэтому рёбра
+    (и группы) не зависят от числа процессов.
+    """
+    engine = engine if engine is not None else SimilarityEngine()
+    workers = max(int(workers), 1)
+    if workers == 1 or len(pairs) < 2:
+        edges = []
+        for k, (i, j) in enumerate(pairs):
+            if k % 10000 == 0:
+                print(f"    Сравнено {k}/{len(pairs)} пар...")
+            if is_duplicate(normalized_data[i], normalized_data[j], title_threshold, description_threshold, engine):
+                edges.append((i, j))
+        return edges
+
+    # Несколько частей на процесс — чтобы процессы не простаивали из-за неравных частей
+    shard_count = min(len(pairs), workers * 4)
+    shard_size = -(-len(pairs) // shard_count)
+    shards = [pairs[k:k + shard_size] for k in range(0, len(pairs), shard_size)]
+    edges = []
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(normalized_data, title_threshold, description_threshold),
+    ) as executor:
+        for done, (shard_edges, counters) in enumerate(executor.map(_score_shard, shards), 1):
+            edges.extend(shard_edges)
+            engine.merge(counters)
+            print(f"    Сравнено частей: {done}/{len(shards)}")
+    return edges
+
+def find_duplicates(tasks, title_threshold=0.70, description_threshold=0.5, brute_force=False, workers=1,
+                    state_path=None):
+    """Поиск дубликатов задач.
+
+    Сравниваются только пары-кандидаты из индекса заголовков;
+    brute_force=True — сравнение всех пар (для сверки результатов);
+    workers — число процессов для сравнения пар;
+    state_path — файл состояния (dedup_state): пары неизменных с прошлого
+    запуска задач не сравниваются заново, а состояние обновляется.
+    """
     n = len(tasks)
     # Массив для отслеживания, к какой группе принадлежит задача
     group_id = list(range(n))
@@ -91,54 +225,63 @@ def find_duplicates(tasks, title_threshold=0.70, description_threshold=0.5):
         title = normalize_text(task.get('Заголовок', ''))
         desc = normalize_text(task.get('Описание', ''))
         normalized_data.append((title, desc))
-    
-    # Сравниваем каждую пару задач
-    print("  Сравнение задач...")
-    comparisons = 0
-    for i in range(n):
-        if i % 50 == 0:
-            print(f"    Обработано {i}/{n} задач...")
-        
-        title1, desc1 = normalized_data[i]
-        if not title1:
-            continue
-        
-        for j in range(i + 1, n):
-            title2, desc2 = normalized_data[j]
-            if not title2:
-                continue
-            
-            comparisons += 1
-            
-            # Проверяем схожесть заголовков
-            title_sim = similarity(title1, title2)
-            
-            # Проверяем, является ли один заголовок подстрокой другого
-            # (для случаев типа "Добавить настройку..." и "Добавить настройку... в Галерее")
-            is_substring = False
-            if len(title1) > 20 and len(title2) > 20:  # Только для достаточно длинных заголовков
-                shorter = title1 if len(title1) < len(title2) else title2
-                longer = title1 if len(title1) >= len(title2) else title2
-                # Если более короткий заголовок составляет большую часть длинного
-                if shorter in longer or longer.startswith(shorter[:int(len(shorter) * 0.8)]):
-                    is_substring = True
-            
-            # Если заголовки очень похожи (высокий порог) или один является подстрокой другого
-            if title_sim >= 0.9 or is_substring:
+
+    # Сохранённое состояние прошлого запуска (по ID задачи)
+    settings = dedup_settings(title_threshold, description_threshold, brute_force)
+    ids = None
+    state = None
+    kept_edges = []
+    only = None
+    if state_path:
+        ids = [task.get('ID задачи', '').strip() for task in tasks]
+        if not all(ids) or len(set(ids)) != n:
+            print("  Предупреждение: ID задач пустые или повторяются, состояние не используется")
+            ids = None
+        else:
+            state = DedupState.load(state_path, settings)
+    if state is not None:
+        unchanged, changed, added, removed = state.diff(dict(zip(ids, normalized_data)))
+        print(f"  Задач без изменений: {len(unchanged)}, изменённых: {len(changed)}, "
+              f"новых: {len(added)}, удалённых: {len(removed)}")
+        position = {task_id: i for i, task_id in enumerate(ids)}
+        # Пары неизменных задач уже сравнивались — их дубликаты берём из состояния
+        kept_edges = sorted(tuple(sorted((position[a], position[b]))) for a, b in state.edges
+                            if a in unchanged and b in unchanged)
+        if not changed and not removed:
+            # Задачи только добавились — прошлые группы не распадаются, берём их корни
+            for task_id, root in state.parents.items():
+                group_id[position[task_id]] = position[root]
+        else:
+            for i, j in kept_edges:
                 union(i, j)
-            # Если заголовки похожи (средний порог) и есть описание
-            elif title_sim >= title_threshold:
-                # Проверяем описание, если оно есть
-                if desc1 and desc2:
-                    desc_sim = similarity(desc1, desc2)
-                    # Если и заголовки, и описания похожи
-                    if desc_sim >= description_threshold:
-                        union(i, j)
-                # Если описания нет, но заголовки очень похожи
-                elif title_sim >= 0.80:
-                    union(i, j)
+        only = sorted(position[task_id] for task_id in changed | added)
+    
+    # Отбираем пары-кандидаты
+    pairs = candidate_pairs(normalized_data, brute_force, only)
+    with_title = sum(1 for title, _ in normalized_data if title)
+    print(f"  Пар-кандидатов: {len(pairs)} из {with_title * (with_title - 1) // 2}")
+
+    # Сравниваем пары-кандидаты и объединяем дубликаты в порядке пар
+    print("  Сравнение задач..." if workers <= 1 else f"  Сравнение задач в {workers} процессах...")
+    engine = SimilarityEngine()
+    edges = score_pairs(normalized_data, pairs, title_threshold, description_threshold, workers, engine)
+    for i, j in edges:
+        union(i, j)
     
-    print(f"  Всего сравнений: {comparisons}")
+    print(f"  Всего сравнений: {len(pairs)}")
+    print(f"  Отсеяно по уровням похожести: {engine.summary()}")
+
+    if ids is not None:
+        new_state = DedupState(
+            settings,
+            texts=dict(zip(ids, normalized_data)),
+            edges=[(ids[i], ids[j]) for i, j in sorted(kept_edges + edges)],
+            parents={ids[i]: ids[find_group(i)] for i in range(n)},
+        )
+        try:
+            new_state.save(state_path)
+        except OSError as e:
+            print(f"  Предупреждение: не удалось сохранить состояние {state_path}: {e}")
     
     # Группируем задачи по их корневым группам
     groups_dict = defaultdict(list)
@@ -206,15 +349,34 @@ def merge_group_info(tasks, group_indices):
     }
 
 def main():
-    input_file = '/Users/annarybkina/Downloads/Задачи.csv'
-    output_file = '/Users/annarybkina/Desktop/Allio/ИИ Цены/Объединенные_задачи.md'
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Поиск и объединение дубликатов задач техподдержки')
+    parser.add_argument('--input', default='/Users/annarybkina/Downloads/Задачи.csv',
+                        help='выгрузка задач (CSV)')
+    parser.add_argument('--output-dir', default='/Users/annarybkina/Desktop/Allio/ИИ Цены',
+                        help='папка для Объединенные_задачи.md и .csv')
+    parser.add_argument('--state',
+                        help='файл состояния поиска дубликатов (по умолчанию .<имя CSV>.dedup.json рядом с выгрузкой)')
+    parser.add_argument('--no-state', action='store_true',
+                        help='сравнить все задачи заново, не читая и не сохраняя состояние')
+    parser.add_argument('--brute-force', action='store_true',
+                        help='сравнивать все пары задач, без индекса заголовков (для сверки)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='число процессов для сравнения пар (0 — по числу ядер; по умолчанию 1)')
+    args = parser.parse_args()
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+
+    input_file = args.input
+    output_file = os.path.join(args.output_dir, 'Объединенные_задачи.md')
+    state_file = None if args.no_state else (args.state or dedup_state_path(input_file))
     
     print("Чтение CSV файла...")
     tasks = read_csv_file(input_file)
     print(f"Прочитано задач: {len(tasks)}")
     
     print("Поиск дубликатов...")
-    groups = find_duplicates(tasks)
+    groups = find_duplicates(tasks, brute_force=args.brute_force, workers=workers, state_path=state_file)
     print(f"Найдено групп: {len(groups)}")
     
     print("Объединение информации...")
@@ -253,7 +415,7 @@ def main():
     print(f"\nРезультат сохранен в: {output_file}")
     
     # Также создаем CSV версию
-    csv_output = '/Users/annarybkina/Desktop/Allio/ИИ Цены/Объединенные_задачи.csv'
+    csv_output = os.path.join(args.output_dir, 'Объединенные_задачи.csv')
     with open(csv_output, 'w', encoding='utf-8', newline='') as f:
         writer = csv.writer(f)
         writer.writerow(['№', 'Заголовок', 'Застройщик', 'Приоритет застройщика', 
@@ -1,4 +1,5 @@
 let groupsData = [];
+let groupsResultId = null; // id результата группировки на сервере (для /api/compare_groups)
 let boxplotsData = null;
 let mainFiles = [];
 let competitorFiles = [];
@@ -322,6 +323,7 @@ function initButtons() {
             }
             
         groupsData = data.groups;
+        groupsResultId = data.result_id || null;
         boxplotsData = data.boxplot || null;
         characteristicsData = data.characteristics || [];
         
@@ -341,9 +343,14 @@ function initButtons() {
             groupingMode = 'object';
         }
         displayGroups(groupsData, groupingMode);
-        
+
+        // Сравнение сопоставимых групп (пары основной ЖК — конкурент и т.д.)
+        if (checkComparableGroups(groupsData)) {
+            displayComparisons(await compareGroups(groupsData));
+        }
+
         showLoading(false);
-            
+
         } catch (error) {
             console.error('Ошибка при создании групп:', error);
             showError(error.message);
@@ -1965,6 +1972,43 @@ function checkComparableGroups(groups) {
     return false;
 }
 
+// Запрос сравнения групп: группы уже на сервере, отправляем только id результата и id групп.
+// Если результат на сервере устарел (404) — отправляем группы целиком
+async function compareGroups(groups) {
+    const url = `${getApiPrefix()}/api/compare_groups`;
+    const post = body => fetch(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    });
+
+    let response = null;
+    if (groupsResultId) {
+        response = await post({ result_id: groupsResultId, group_ids: groups.map(group => group.id) });
+    }
+    if (!response || response.status === 404) {
+        response = await post({ groups: groups });
+    }
+
+    const data = await response.json();
+    if (!response.ok) {
+        throw new Error(data.error || 'Ошибка при сравнении групп');
+    }
+    return data.comparisons || [];
+}
+
+// Картинка графика сравнения: по ссылке (браузер загружает и кэширует PNG сам),
+// base64 — только для ответа со встроенными картинками (inline_images)
+function chartImage(url, base64, alt) {
+    if (url) {
+        return `<img src="${url}" alt="${alt}" loading="lazy">`;
+    }
+    if (base64) {
+        return `<img src="data:image/png;base64,${base64}" alt="${alt}">`;
+    }
+    return '<p>График недоступен</p>';
+}
+
 // Отображение результатов сравнения
 function displayComparisons(comparisons) {
     const comparisonsList = document.getElementById('comparisonsList');
@@ -2062,11 +2106,11 @@ function displayComparisons(comparisons) {
             <div class="charts-container">
                 <div class="chart-box">
                     <h4>Boxplot</h4>
-                    ${comparison.boxplot ? `<img src="data:image/png;base64,${comparison.boxplot}" alt="Boxplot">` : '<p>График недоступен</p>'}
+                    ${chartImage(comparison.boxplot_url, comparison.boxplot, 'Boxplot')}
                 </div>
                 <div class="chart-box">
                     <h4>Гистограмма</h4>
-                    ${comparison.histogram ? `<img src="data:image/png;base64,${comparison.histogram}" alt="Histogram">` : '<p>График недоступен</p>'}
+                    ${chartImage(comparison.histogram_url, comparison.histogram, 'Histogram')}
                 </div>
             </div>
         `;
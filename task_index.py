@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Индекс заголовков задач для поиска кандидатов в дубликаты (process_tasks).
+
+Сравнивать SequenceMatcher каждую пару задач — O(n²) дорогих сравнений.
+Индекс отбирает только пары, которые могут оказаться дубликатами:
+- пары с большой долей общих символьных 3-грамм: не меньше MIN_OVERLAP
+  от числа 3-грамм более короткого заголовка. Пары с похожестью 0.70 и
+  выше на практике делят заметно больше 3-грамм (на выгрузках задач и на
+  заголовках с опечатками — не меньше 35%);
+- пары длинных заголовков с одинаковым началом — правило «один заголовок
+  начинается так же, как другой» в find_duplicates.
+
+Кандидаты ищутся через инвертированный индекс (3-грамма -> задачи) с
+фильтрацией по префиксу: 3-граммы заголовка упорядочиваются от редких к
+частым, и если у пары не меньше t общих 3-грамм, то среди первых
+(размер - t + 1) 3-грамм меньшего заголовка есть общая. Поэтому достаточно
+просмотреть списки задач только для этих редких 3-грамм, а число общих
+3-грамм проверяется точно. Отбор эвристический только в выборе MIN_OVERLAP;
+полный перебор пар остаётся в find_duplicates(brute_force=True) для сверки.
+"""
+
+import math
+from collections import Counter, defaultdict
+from itertools import combinations
+
+
+NGRAM_SIZE = 3
+
+# Минимальная доля общих 3-грамм (от меньшего заголовка) у пары-кандидата
+MIN_OVERLAP = 0.3
+
+
+def ngrams(text, size=NGRAM_SIZE):
+    """Множество символьных n-грамм текста (с границами начала и конца строки)"""
+    if not text:
+        return set()
+    padded = '\0' * (size - 1) + text + '\0'
+    return {padded[i:i + size] for i in range(len(padded) - size + 1)}
+
+
+class TitleIndex:
+    """Инвертированный индекс 3-грамм нормализованных заголовков.
+
+    prefix_length и prefix_min_length задают второй источник кандидатов:
+    заголовки длиннее prefix_min_length с одинаковыми первыми prefix_length
+    символами.
+    """
+
+    def __init__(self, titles, min_overlap=MIN_OVERLAP, prefix_length=None, prefix_min_length=0):
+        self.titles = list(titles)
+        self.min_overlap = min_overlap
+        self.prefix_length = prefix_length
+        self.prefix_min_length = prefix_min_length
+
+        self.grams = [ngrams(title) for title in self.titles]
+        self.frequency = Counter(gram for grams in self.grams for gram in grams)
+        self.postings = defaultdict(list)
+        for i, grams in enumerate(self.grams):
+            for gram in grams:
+                self.postings[gram].append(i)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def required_overlap(self, size):
+        """Сколько общих 3-грамм нужно паре, у которой меньший заголовок содержит size 3-грамм"""
+        return max(1, math.ceil(self.min_overlap * size))
+
+    def _overlap_pairs(self):
+        pairs = set()
+        for i, grams in enumerate(self.grams):
+            if not grams:
+                continue
+            size = len(grams)
+            need = self.required_overlap(size)
+            # Пару ищет меньший заголовок (при равенстве — с меньшим номером) по своим редким 3-граммам
+            probe = sorted(grams, key=lambda gram: (self.frequency[gram], gram))[:size - need + 1]
+            seen = {i}
+            for gram in probe:
+                for j in self.postings[gram]:
+                    if j in seen:
+                        continue
+                    seen.add(j)
+                    other = self.grams[j]
+                    if (len(other), j) < (size, i):
+                        continue
+                    if len(grams & other) >= need:
+                        pairs.add((i, j) if i < j else (j, i))
+        return pairs
+
+    def _overlap_pairs_of(self, indices):
+        """Пары-кандидаты по 3-граммам с участием задач indices.
+
+        Задача из indices может оказаться в паре и большим заголовком, поэтому
+        просматриваются все её 3-граммы, а общие 3-граммы считаются по спискам задач.
+        """
+        pairs = set()
+        for i in indices:
+            grams = self.grams[i]
+            if not grams:
+                continue
+            shared = Counter()
+            for gram in grams:
+                shared.update(self.postings[gram])
+            for j, count in shared.items():
+                if j != i and count >= self.required_overlap(min(len(grams), len(self.grams[j]))):
+                    pairs.add((i, j) if i < j else (j, i))
+        return pairs
+
+    def _prefix_pairs(self):
+        pairs = set()
+        if not self.prefix_length:
+            return pairs
+        buckets = defaultdict(list)
+        for i, title in enumerate(self.titles):
+            if len(title) > self.prefix_min_length:
+                buckets[title[:self.prefix_length]].append(i)
+        for members in buckets.values():
+            pairs.update(combinations(members, 2))
+        return pairs
+
+    def candidate_pairs(self, only=None):
+        """Пары-кандидаты (i, j), i < j, по возрастанию.
+
+        only — номера задач: только пары, в которых участвует хотя бы одна из
+        них (те же пары, что в полном списке).
+        """
+        if only is None:
+            return sorted(self._overlap_pairs() | self._prefix_pairs())
+        only = set(only)
+        prefix_pairs = {(i, j) for i, j in self._prefix_pairs() if i in only or j in only}
+        return sorted(self._overlap_pairs_of(sorted(only)) | prefix_pairs)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Похожесть текстов задач (SequenceMatcher.ratio) с каскадом дешёвых оценок.
+
+Решение о дубликате зависит только от того, достигает ли ratio порога, а
+полный ratio() — самое дорогое место поиска дубликатов. Перед ним пара
+проходит верхние оценки ratio, от дешёвой к дорогой:
+- length — по длинам строк: 2·min(len) / (len1 + len2). Совпадает с
+  SequenceMatcher.real_quick_ratio(), но не требует создавать SequenceMatcher;
+- quick_ratio — по общему мультимножеству символов (SequenceMatcher.quick_ratio);
+- ratio — полное сравнение.
+Если оценка меньше порога, ratio тоже меньше порога, и пара отсеивается без
+дальнейших вычислений. Счётчики показывают, сколько пар отсеял каждый уровень.
+"""
+
+from collections import Counter
+from difflib import SequenceMatcher
+
+
+# Уровни каскада в порядке проверки
+TIERS = ('length', 'quick_ratio', 'ratio')
+
+
+class SimilarityEngine:
+    """Похожесть строк с отсевом по верхним оценкам и счётчиками отсева"""
+
+    def __init__(self):
+        self.counters = Counter()  # уровень -> отсеяно пар; 'passed' — дошли до порога
+
+    def ratio_at_least(self, text1, text2, threshold):
+        """SequenceMatcher(None, text1, text2).ratio(), если он не меньше threshold, иначе None"""
+        len1, len2 = len(text1), len(text2)
+        if not len1 or not len2 or 2.0 * min(len1, len2) / (len1 + len2) < threshold:
+            self.counters['length'] += 1
+            return None
+        matcher = SequenceMatcher(None, text1, text2)
+        if matcher.quick_ratio() < threshold:
+            self.counters['quick_ratio'] += 1
+            return None
+        value = matcher.ratio()
+        if value < threshold:
+            self.counters['ratio'] += 1
+            return None
+        self.counters['passed'] += 1
+        return value
+
+    def merge(self, counters):
+        """Добавляет счётчики другого движка (например, из процесса пула)"""
+        self.counters.update(counters)
+        return self
+
+    def summary(self):
+        """Строка со счётчиками: сколько пар отсеял каждый уровень и сколько прошло"""
+        parts = [f"{tier}: {self.counters[tier]}" for tier in TIERS]
+        parts.append(f"прошли: {self.counters['passed']}")
+        return ', '.join(parts)
@@ -19,6 +19,9 @@ import csv
 import re
 from typing import List, Dict
 
+from csv_sniff import open_csv
+from keyword_matcher import ALWAYS, AllOf, AnyOf, Contains, Not, Rule, RuleTable
+
 
 INPUT_FILE = "/Users/annarybkina/Downloads/Задачи.csv"
 OUTPUT_FILE = "/Users/annarybkina/Desktop/Allio/ИИ Цены/Задачи_по_темам.csv"
@@ -35,277 +38,239 @@ def norm(text: str) -> str:
     return text.strip()
 
 
+def in_text(*keywords: str) -> Contains:
+    """Хотя бы одно из слов есть в общем тексте задачи (заголовок, описание, модуль, теги)"""
+    return Contains("text", *keywords)
+
+
+def in_module(*keywords: str) -> Contains:
+    """Хотя бы одно из слов есть в модуле задачи"""
+    return Contains("module", *keywords)
+
+
+# Правила тем в порядке приоритета: побеждает первое подходящее правило,
+# внутри темы — первое подходящее уточнение (последнее уточнение — общее).
+THEME_RULES = RuleTable(
+    [
+        # 1. Узкие темы по фидам и агрегаторам (приоритет - проверяем сначала конкретные)
+        Rule(in_text("авито"), "Фиды: Авито"),
+        Rule(in_text("циан", "цян"), "Фиды: ЦИАН"),
+        Rule(in_text("домклик", "дом.клик"), "Фиды: ДомКлик"),
+        Rule(AllOf(in_text("яндекс"), in_text("директ", "недвижимость")), "Фиды: Яндекс (Директ/Недвижимость)"),
+        Rule(in_text("яндекс"), "Фиды: Яндекс"),
+        Rule(in_text("wb", "wildberries"), "Фиды: Wildberries"),
+        Rule(in_text("2гис", "2gis"), "Фиды: 2ГИС"),
+        Rule(in_text("нмаркет", "nmarket"), "Фиды: НмаркетПро"),
+        Rule(in_text("трендагент", "trendagent"), "Интеграции: ТрендАгент"),
+
+        # 2. Узкие темы по ПДКП/ДКП
+        Rule(in_text("пдкп"), "ПДКП"),
+        Rule(AllOf(in_text("дкп"), Not(in_text("пдкп"))), "ДКП"),
+
+        # 3. Узкие темы по EVA
+        Rule(in_text("eva", "подборщик"), [
+            Rule(in_text("акции"), "EVA: Акции в каталоге"),
+            Rule(in_text("заблокирован", "блокиров"), "EVA: Фильтрация помещений"),
+            Rule(in_text("доработк", "улучшен"), "EVA: Доработки интерфейса"),
+            Rule(ALWAYS, "EVA: Общие доработки"),
+        ]),
+
+        # 4. Узкие темы по бронированию
+        Rule(AllOf(in_text("устн"), in_text("брон")), [
+            Rule(in_text("контрол", "злоупотреблен"), "Устные брони: Контроль и ограничения"),
+            Rule(in_text("продлен"), "Устные брони: Продление"),
+            Rule(in_text("комментар"), "Устные брони: Комментарии"),
+            Rule(ALWAYS, "Устные брони: Общие"),
+        ]),
+        Rule(AllOf(in_text("платн"), in_text("брон")), [
+            Rule(in_text("график платежей"), "Платные брони: График платежей"),
+            Rule(in_text("продлен"), "Платные брони: Продление"),
+            Rule(in_text("договор"), "Платные брони: Договоры"),
+            Rule(ALWAYS, "Платные брони: Общие"),
+        ]),
+
+        # 5. Узкие темы по фиксации
+        Rule(in_text("фиксац"), [
+            Rule(in_text("агент"), "Фиксация: Агенты"),
+            Rule(in_text("продлен"), "Фиксация: Продление"),
+            Rule(in_text("уведомлен"), "Фиксация: Уведомления"),
+            Rule(in_text("crm", "битрикс"), "Фиксация: Интеграция с CRM"),
+            Rule(ALWAYS, "Фиксация: Общие"),
+        ]),
+
+        # 6. Узкие темы по агентствам
+        Rule(in_module("агентств", "cashback"), [
+            Rule(AllOf(in_text("регистрац"), in_text("самозанят")), "Агентства: Регистрация самозанятых"),
+            Rule(in_text("чат"), "Агентства: Чат с застройщиком"),
+            Rule(AllOf(in_text("бронирован"), in_text("замен")), "Агентства: Перебронирование"),
+            Rule(in_text("вознагражден"), "Агентства: Вознаграждения"),
+            Rule(in_text("права", "доступ"), "Агентства: Права доступа"),
+            Rule(ALWAYS, "Агентства: Общие"),
+        ]),
+
+        # 7. Узкие темы по контрагентам
+        Rule(AnyOf(in_module("контрагент"), in_text("контрагент")), [
+            Rule(in_text("дубликат", "дубл"), "Контрагенты: Дубликаты"),
+            Rule(in_text("объединен"), "Контрагенты: Объединение"),
+            Rule(in_text("паспорт"), "Контрагенты: Паспортные данные"),
+            Rule(in_text("ип", "ипо"), "Контрагенты: ИП"),
+            Rule(ALWAYS, "Контрагенты: Общие"),
+        ]),
+
+        # 8. Узкие темы по шаблонам договоров
+        Rule(in_module("конструктор документов", "управление шаблонами"), [
+            Rule(in_text("дду"), "Шаблоны: ДДУ"),
+            Rule(in_text("дкп"), "Шаблоны: ДКП"),
+            Rule(in_text("договор бронирован"), "Шаблоны: Договор бронирования"),
+            Rule(AllOf(in_text("дополнительн"), in_text("соглашен")), "Шаблоны: Дополнительные соглашения"),
+            Rule(AllOf(in_text("массов"), in_text("удален", "деактив")), "Шаблоны: Массовые операции"),
+            Rule(ALWAYS, "Шаблоны: Общие"),
+        ]),
+
+        # 9. Узкие темы по КП
+        Rule(AnyOf(in_module("кп ("), in_text("коммерческ", "веб-кп")), [
+            Rule(in_text("кастомизац", "персонализ"), "КП: Кастомизация"),
+            Rule(in_text("отделка"), "КП: Отделка"),
+            Rule(in_text("стоимость", "цена"), "КП: Стоимость и ценообразование"),
+            Rule(in_text("изображен", "фото"), "КП: Изображения"),
+            Rule(ALWAYS, "КП: Общие"),
+        ]),
+
+        # 10. Узкие темы по API и интеграциям
+        Rule(AnyOf(in_module("внешнее api"), AllOf(in_text("api"), in_text("интеграц"))), [
+            Rule(in_text("трендагент"), "API: ТрендАгент"),
+            Rule(in_text("нмаркет"), "API: НмаркетПро"),
+            Rule(ALWAYS, "API: Общие интеграции"),
+        ]),
+        Rule(AnyOf(in_module("интеграции crm"), in_text("битрикс", "b24")), [
+            Rule(in_text("воронк"), "CRM: Фильтрация воронок"),
+            Rule(AllOf(in_text("статус"), in_text("брон")), "CRM: Статусы брони"),
+            Rule(ALWAYS, "CRM: Общие интеграции"),
+        ]),
+
+        # 11. Узкие темы по акциям
+        Rule(AnyOf(in_module("акции ("), in_text("акция")), [
+            Rule(in_text("комбо"), "Акции: Комбо-акции"),
+            Rule(AllOf(in_text("стоимость"), in_text("помещен")), "Акции: Установка стоимости"),
+            Rule(in_text("копирован"), "Акции: Копирование правил"),
+            Rule(ALWAYS, "Акции: Общие"),
+        ]),
+
+        # 12. Узкие темы по АЦО
+        Rule(AnyOf(in_text("ацо"), in_module("массовая смена цен")), [
+            Rule(in_text("частот", "срабатыван"), "АЦО: Частота срабатывания"),
+            Rule(in_text("уведомлен"), "АЦО: Уведомления"),
+            Rule(ALWAYS, "АЦО: Общие"),
+        ]),
+
+        # 13. Узкие темы по графикам платежей
+        Rule(in_text("график платежей"), [
+            Rule(in_text("скачиван", "выгрузк", "excel"), "Графики платежей: Выгрузка"),
+            Rule(in_text("изменен"), "Графики платежей: Изменение"),
+            Rule(ALWAYS, "Графики платежей: Общие"),
+        ]),
+
+        # 14. Узкие темы по отчетам
+        Rule(AnyOf(in_module("конфигуратор отчётов"), in_text("отчет")), [
+            Rule(in_text("выгрузк", "экспорт"), "Отчеты: Выгрузка"),
+            Rule(in_text("контрагент"), "Отчеты: По контрагентам"),
+            Rule(in_text("брон"), "Отчеты: По броням"),
+            Rule(ALWAYS, "Отчеты: Общие"),
+        ]),
+
+        # 15. Узкие темы по шахматке
+        Rule(AnyOf(in_module("шахматк"), in_text("шахматк")), [
+            Rule(in_text("статус"), "Шахматка: Статусы"),
+            Rule(in_text("перспектив"), "Шахматка: Перспектива"),
+            Rule(in_text("цвет", "легенд"), "Шахматка: Визуализация"),
+            Rule(ALWAYS, "Шахматка: Общие"),
+        ]),
+
+        # 16. Узкие темы по массовому редактору
+        Rule(in_module("массовый редактор"), [
+            Rule(in_text("пиб"), "Массовый редактор: ПИБ"),
+            Rule(in_text("описан"), "Массовый редактор: Описания"),
+            Rule(ALWAYS, "Массовый редактор: Общие"),
+        ]),
+
+        # 17. Узкие темы по карточкам сделок
+        Rule(in_module("карточки сделок"), [
+            Rule(in_text("график платежей"), "Карточка сделки: График платежей"),
+            Rule(in_text("эскроу"), "Карточка сделки: Эскроу-счета"),
+            Rule(AllOf(in_text("дополнительн"), in_text("соглашен")), "Карточка сделки: Доп. соглашения"),
+            Rule(ALWAYS, "Карточка сделки: Общие"),
+        ]),
+
+        # 18. Узкие темы по правам доступа
+        Rule(AnyOf(in_module("права ("), in_text("доступ")), [
+            Rule(in_text("объект"), "Права: Доступ к объектам"),
+            Rule(in_text("офис"), "Права: Доступ по офисам"),
+            Rule(in_text("реестр"), "Права: Доступ к реестрам"),
+            Rule(in_text("пожелан"), "Права: Пожелания застройщика"),
+            Rule(ALWAYS, "Права: Общие"),
+        ]),
+
+        # 19. Узкие темы по уведомлениям
+        Rule(AnyOf(in_module("уведомлен"), in_text("уведомлен")), [
+            Rule(in_text("telegram", "тг"), "Уведомления: Telegram"),
+            Rule(in_text("ассистент"), "Уведомления: Ассистент"),
+            Rule(ALWAYS, "Уведомления: Общие"),
+        ]),
+
+        # 20. Узкие темы по ПИБ
+        Rule(in_text("пиб"), [
+            Rule(in_text("замен"), "ПИБ: Замена площадей"),
+            Rule(in_text("массов"), "ПИБ: Массовое заполнение"),
+            Rule(ALWAYS, "ПИБ: Общие"),
+        ]),
+
+        # 21. Узкие темы по личному кабинету
+        Rule(in_text("личный кабинет", "лк "), [
+            Rule(in_text("блок"), "ЛК: Новые блоки"),
+            Rule(in_text("создан"), "ЛК: Создание ЛК"),
+            Rule(ALWAYS, "ЛК: Общие"),
+        ]),
+
+        # 22. Узкие темы по галерее
+        Rule(in_text("галере", "galere"), [
+            Rule(in_text("порядок", "корпус"), "Галерея: Порядок корпусов"),
+            Rule(ALWAYS, "Галерея: Общие"),
+        ]),
+
+        # 23. Узкие темы по заявкам на договор
+        Rule(in_module("заявки на договор"), [
+            Rule(in_text("согласован"), "Заявки на договор: Согласование"),
+            Rule(in_text("уведомлен"), "Заявки на договор: Уведомления"),
+            Rule(ALWAYS, "Заявки на договор: Общие"),
+        ]),
+
+        # 24. Фолбэк - общие темы
+        Rule(in_text("брон"), "Бронирование: Прочее"),
+        Rule(in_text("договор"), "Договоры: Прочее"),
+        Rule(in_text("отчет", "отчёт"), "Отчеты: Прочее"),
+    ],
+    default="Прочее",
+)
+
+
 def detect_theme(row: Dict[str, str]) -> str:
-    """Определяем тему задачи по заголовку, описанию, модулю и тегам."""
+    """Определяем тему задачи по заголовку, описанию, модулю и тегам.
+
+    Ключевые слова всех правил THEME_RULES ищутся за один проход по тексту
+    (автомат Ахо — Корасик), затем выбирается первое подходящее правило.
+    """
     title = norm(row.get("Заголовок", ""))
     desc = norm(row.get("Описание", ""))
     module = norm(row.get("Модуль", ""))
     tags = norm(row.get("Теги", ""))
     text = " ".join([title, desc, module, tags])
-
-    # 1. Узкие темы по фидам и агрегаторам (приоритет - проверяем сначала конкретные)
-    if "авито" in text:
-        return "Фиды: Авито"
-    if "циан" in text or "цян" in text:
-        return "Фиды: ЦИАН"
-    if "домклик" in text or "дом.клик" in text:
-        return "Фиды: ДомКлик"
-    if "яндекс" in text and ("директ" in text or "недвижимость" in text):
-        return "Фиды: Яндекс (Директ/Недвижимость)"
-    if "яндекс" in text:
-        return "Фиды: Яндекс"
-    if "wb" in text or "wildberries" in text:
-        return "Фиды: Wildberries"
-    if "2гис" in text or "2gis" in text:
-        return "Фиды: 2ГИС"
-    if "нмаркет" in text or "nmarket" in text:
-        return "Фиды: НмаркетПро"
-    if "трендагент" in text or "trendagent" in text:
-        return "Интеграции: ТрендАгент"
-    
-    # 2. Узкие темы по ПДКП/ДКП
-    if "пдкп" in text:
-        return "ПДКП"
-    if "дкп" in text and "пдкп" not in text:
-        return "ДКП"
-    
-    # 3. Узкие темы по EVA
-    if "eva" in text or "подборщик" in text:
-        if "акции" in text:
-            return "EVA: Акции в каталоге"
-        if "заблокирован" in text or "блокиров" in text:
-            return "EVA: Фильтрация помещений"
-        if "доработк" in text or "улучшен" in text:
-            return "EVA: Доработки интерфейса"
-        return "EVA: Общие доработки"
-    
-    # 4. Узкие темы по бронированию
-    if "устн" in text and "брон" in text:
-        if "контрол" in text or "злоупотреблен" in text:
-            return "Устные брони: Контроль и ограничения"
-        if "продлен" in text:
-            return "Устные брони: Продление"
-        if "комментар" in text:
-            return "Устные брони: Комментарии"
-        return "Устные брони: Общие"
-    
-    if "платн" in text and "брон" in text:
-        if "график платежей" in text:
-            return "Платные брони: График платежей"
-        if "продлен" in text:
-            return "Платные брони: Продление"
-        if "договор" in text:
-            return "Платные брони: Договоры"
-        return "Платные брони: Общие"
-    
-    # 5. Узкие темы по фиксации
-    if "фиксац" in text:
-        if "агент" in text:
-            return "Фиксация: Агенты"
-        if "продлен" in text:
-            return "Фиксация: Продление"
-        if "уведомлен" in text:
-            return "Фиксация: Уведомления"
-        if "crm" in text or "битрикс" in text:
-            return "Фиксация: Интеграция с CRM"
-        return "Фиксация: Общие"
-    
-    # 6. Узкие темы по агентствам
-    if "агентств" in module or "cashback" in module:
-        if "регистрац" in text and "самозанят" in text:
-            return "Агентства: Регистрация самозанятых"
-        if "чат" in text:
-            return "Агентства: Чат с застройщиком"
-        if "бронирован" in text and "замен" in text:
-            return "Агентства: Перебронирование"
-        if "вознагражден" in text:
-            return "Агентства: Вознаграждения"
-        if "права" in text or "доступ" in text:
-            return "Агентства: Права доступа"
-        return "Агентства: Общие"
-    
-    # 7. Узкие темы по контрагентам
-    if "контрагент" in module or "контрагент" in text:
-        if "дубликат" in text or "дубл" in text:
-            return "Контрагенты: Дубликаты"
-        if "объединен" in text:
-            return "Контрагенты: Объединение"
-        if "паспорт" in text:
-            return "Контрагенты: Паспортные данные"
-        if "ип" in text or "ипо" in text:
-            return "Контрагенты: ИП"
-        return "Контрагенты: Общие"
-    
-    # 8. Узкие темы по шаблонам договоров
-    if "конструктор документов" in module or "управление шаблонами" in module:
-        if "дду" in text:
-            return "Шаблоны: ДДУ"
-        if "дкп" in text:
-            return "Шаблоны: ДКП"
-        if "договор бронирован" in text:
-            return "Шаблоны: Договор бронирования"
-        if "дополнительн" in text and "соглашен" in text:
-            return "Шаблоны: Дополнительные соглашения"
-        if "массов" in text and ("удален" in text or "деактив" in text):
-            return "Шаблоны: Массовые операции"
-        return "Шаблоны: Общие"
-    
-    # 9. Узкие темы по КП
-    if "кп (" in module or "коммерческ" in text or "веб-кп" in text:
-        if "кастомизац" in text or "персонализ" in text:
-            return "КП: Кастомизация"
-        if "отделка" in text:
-            return "КП: Отделка"
-        if "стоимость" in text or "цена" in text:
-            return "КП: Стоимость и ценообразование"
-        if "изображен" in text or "фото" in text:
-            return "КП: Изображения"
-        return "КП: Общие"
-    
-    # 10. Узкие темы по API и интеграциям
-    if "внешнее api" in module or ("api" in text and "интеграц" in text):
-        if "трендагент" in text:
-            return "API: ТрендАгент"
-        if "нмаркет" in text:
-            return "API: НмаркетПро"
-        return "API: Общие интеграции"
-    
-    if "интеграции crm" in module or "битрикс" in text or "b24" in text:
-        if "воронк" in text:
-            return "CRM: Фильтрация воронок"
-        if "статус" in text and "брон" in text:
-            return "CRM: Статусы брони"
-        return "CRM: Общие интеграции"
-    
-    # 11. Узкие темы по акциям
-    if "акции (" in module or "акция" in text:
-        if "комбо" in text:
-            return "Акции: Комбо-акции"
-        if "стоимость" in text and "помещен" in text:
-            return "Акции: Установка стоимости"
-        if "копирован" in text:
-            return "Акции: Копирование правил"
-        return "Акции: Общие"
-    
-    # 12. Узкие темы по АЦО
-    if "ацо" in text or "массовая смена цен" in module:
-        if "частот" in text or "срабатыван" in text:
-            return "АЦО: Частота срабатывания"
-        if "уведомлен" in text:
-            return "АЦО: Уведомления"
-        return "АЦО: Общие"
-    
-    # 13. Узкие темы по графикам платежей
-    if "график платежей" in text:
-        if "скачиван" in text or "выгрузк" in text or "excel" in text:
-            return "Графики платежей: Выгрузка"
-        if "изменен" in text:
-            return "Графики платежей: Изменение"
-        return "Графики платежей: Общие"
-    
-    # 14. Узкие темы по отчетам
-    if "конфигуратор отчётов" in module or "отчет" in text:
-        if "выгрузк" in text or "экспорт" in text:
-            return "Отчеты: Выгрузка"
-        if "контрагент" in text:
-            return "Отчеты: По контрагентам"
-        if "брон" in text:
-            return "Отчеты: По броням"
-        return "Отчеты: Общие"
-    
-    # 15. Узкие темы по шахматке
-    if "шахматк" in module or "шахматк" in text:
-        if "статус" in text:
-            return "Шахматка: Статусы"
-        if "перспектив" in text:
-            return "Шахматка: Перспектива"
-        if "цвет" in text or "легенд" in text:
-            return "Шахматка: Визуализация"
-        return "Шахматка: Общие"
-    
-    # 16. Узкие темы по массовому редактору
-    if "массовый редактор" in module:
-        if "пиб" in text:
-            return "Массовый редактор: ПИБ"
-        if "описан" in text:
-            return "Массовый редактор: Описания"
-        return "Массовый редактор: Общие"
-    
-    # 17. Узкие темы по карточкам сделок
-    if "карточки сделок" in module:
-        if "график платежей" in text:
-            return "Карточка сделки: График платежей"
-        if "эскроу" in text:
-            return "Карточка сделки: Эскроу-счета"
-        if "дополнительн" in text and "соглашен" in text:
-            return "Карточка сделки: Доп. соглашения"
-        return "Карточка сделки: Общие"
-    
-    # 18. Узкие темы по правам доступа
-    if "права (" in module or "доступ" in text:
-        if "объект" in text:
-            return "Права: Доступ к объектам"
-        if "офис" in text:
-            return "Права: Доступ по офисам"
-        if "реестр" in text:
-            return "Права: Доступ к реестрам"
-        if "пожелан" in text:
-            return "Права: Пожелания застройщика"
-        return "Права: Общие"
-    
-    # 19. Узкие темы по уведомлениям
-    if "уведомлен" in module or "уведомлен" in text:
-        if "telegram" in text or "тг" in text:
-            return "Уведомления: Telegram"
-        if "ассистент" in text:
-            return "Уведомления: Ассистент"
-        return "Уведомления: Общие"
-    
-    # 20. Узкие темы по ПИБ
-    if "пиб" in text:
-        if "замен" in text:
-            return "ПИБ: Замена площадей"
-        if "массов" in text:
-            return "ПИБ: Массовое заполнение"
-        return "ПИБ: Общие"
-    
-    # 21. Узкие темы по личному кабинету
-    if "личный кабинет" in text or "лк " in text:
-        if "блок" in text:
-            return "ЛК: Новые блоки"
-        if "создан" in text:
-            return "ЛК: Создание ЛК"
-        return "ЛК: Общие"
-    
-    # 22. Узкие темы по галерее
-    if "галере" in text or "galere" in text:
-        if "порядок" in text or "корпус" in text:
-            return "Галерея: Порядок корпусов"
-        return "Галерея: Общие"
-    
-    # 23. Узкие темы по заявкам на договор
-    if "заявки на договор" in module:
-        if "согласован" in text:
-            return "Заявки на договор: Согласование"
-        if "уведомлен" in text:
-            return "Заявки на договор: Уведомления"
-        return "Заявки на договор: Общие"
-    
-    # 24. Фолбэк - общие темы
-    if "брон" in text:
-        return "Бронирование: Прочее"
-    if "договор" in text:
-        return "Договоры: Прочее"
-    if "отчет" in text or "отчёт" in text:
-        return "Отчеты: Прочее"
-    
-    return "Прочее"
+    return THEME_RULES.match({"text": text, "module": module})
 
 
 def process_file(input_file: str, output_file: str) -> None:
     """Обрабатывает один файл и создает выходной CSV с темами."""
-    with open(input_file, "r", encoding="utf-8-sig") as f:  # utf-8-sig убирает BOM
-        reader = csv.DictReader(f)
+    with open_csv(input_file) as (f, csv_format):  # кодировка и разделитель определяются по файлу, BOM отбрасывается
+        reader = csv.DictReader(f, delimiter=csv_format.delimiter)
         rows: List[Dict[str, str]] = list(reader)
 
     themed_rows = []
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Кэш результатов обработки загруженных файлов с вытеснением LRU по объёму.
+
+Ключи — содержимое-адресуемые: строятся из SHA-256 байтов загруженных файлов,
+поэтому повторная загрузка тех же прайс-листов (даже под другим именем)
+попадает в кэш. Первый элемент ключа — вид записи ('table', 'side', 'response'),
+по нему ведутся счётчики попаданий и промахов.
+"""
+
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+
+def file_digest(data):
+    """SHA-256 содержимого файла (hex)"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def stream_digest(stream, chunk_size=1024 * 1024):
+    """SHA-256 содержимого файлового потока (hex), читается кусками по chunk_size.
+
+    Поток перематывается в начало до и после чтения.
+    """
+    digest = hashlib.sha256()
+    stream.seek(0)
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def approx_size(value, _depth=0):
+    """Примерный объём памяти значения в байтах (для учёта размера кэша).
+
+    Учитывает вложенные списки/словари и массивы NumPy (через nbytes).
+    """
+    nbytes = getattr(value, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+    size = sys.getsizeof(value)
+    if _depth > 6:
+        return size
+    if isinstance(value, dict):
+        size += sum(approx_size(k, _depth + 1) + approx_size(v, _depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(approx_size(v, _depth + 1) for v in value)
+    return size
+
+
+class UploadCache:
+    """Потокобезопасный LRU-кэш с ограничением по суммарному объёму (байты)"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # ключ -> (значение, объём)
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = {}
+        self.misses = {}
+        self.evictions = 0
+
+    @staticmethod
+    def _kind(key):
+        return key[0] if isinstance(key, tuple) and key else 'other'
+
+    def get(self, key):
+        """Возвращает значение по ключу или None (и учитывает попадание/промах)"""
+        kind = self._kind(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses[kind] = self.misses.get(kind, 0) + 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits[kind] = self.hits.get(kind, 0) + 1
+            return entry[0]
+
+    def put(self, key, value, nbytes=None):
+        """Сохраняет значение; при превышении лимита вытесняет давно не использованные записи"""
+        if nbytes is None:
+            nbytes = approx_size(value)
+        if nbytes > self.max_bytes:
+            # Запись больше всего кэша — не сохраняем
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes and self._entries:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_bytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        """Счётчики кэша: попадания и промахи по видам записей, объём и вытеснения"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': dict(self.hits),
+                'misses': dict(self.misses),
+                'hits_total': sum(self.hits.values()),
+                'misses_total': sum(self.misses.values()),
+                'evictions': self.evictions,
+            }